@@ -38,6 +38,9 @@ class UserAdmin(BaseUserAdmin):
 
     search_fields = ("username", "email")
 
+    list_select_related = ("department",)
+    autocomplete_fields = ("department",)
+
     # إضافة الحقول الخاصة بنا داخل صفحة المستخدم
     fieldsets = BaseUserAdmin.fieldsets + (
         ("Organization Info", {
@@ -50,6 +53,10 @@ class UserAdmin(BaseUserAdmin):
 
     filter_horizontal = ("groups", "user_permissions")
 
+    def get_queryset(self, request):
+        # get_groups: one query for the page instead of one per row
+        return super().get_queryset(request).prefetch_related("groups")
+
     def get_groups(self, obj):
         return ", ".join(g.name for g in obj.groups.all())
-    get_groups.short_description = "Groups"
\ No newline at end of file
+    get_groups.short_description = "Groups"
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Lower
 from django.contrib.auth.models import AbstractUser
 
 
@@ -24,3 +25,16 @@ class User(AbstractUser):
         blank=True,
         related_name="users"
     )
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Reader autocomplete: case-insensitive prefix ranges (accounts.search)
+            models.Index(Lower("username"), name="user_username_lower_idx"),
+            models.Index(Lower("first_name"), name="user_first_name_lower_idx"),
+            models.Index(Lower("last_name"), name="user_last_name_lower_idx"),
+            # Department-scoped picker: ordered walk, stops at the page size
+            models.Index(
+                models.F("department"), Lower("username"),
+                name="user_dept_username_lower_idx",
+            ),
+        ]
@@ -0,0 +1,84 @@
+"""
+User lookup for the reader picker (search-as-you-type).
+
+Matching is a case-insensitive *prefix* on username, first name or last
+name. Each prefix becomes a range on ``LOWER(column)``
+(``>= 'ab' AND < 'ac'``), which the ``Lower()`` expression indexes on
+``User`` can serve; ``LIKE``/``istartswith`` cannot use them on SQLite.
+Results are ordered by ``(lower(username), id)`` and paged by cursor.
+"""
+
+import base64
+
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+
+User = get_user_model()
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 50
+
+
+def prefix_range(prefix):
+    """``(low, high)`` such that ``low <= s < high`` iff ``s`` starts with ``prefix``."""
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def reader_label(user):
+    full_name = user.get_full_name()
+    return f"{user.username} — {full_name}" if full_name else user.username
+
+
+def _encode_cursor(user):
+    return base64.urlsafe_b64encode(f"{user.username_lower}|{user.pk}".encode()).decode()
+
+
+def _decode_cursor(cursor):
+    try:
+        username, pk = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+        return username, int(pk)
+    except (TypeError, UnicodeError, ValueError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+def search_users(query="", department_id=None, exclude_id=None, cursor=None, limit=DEFAULT_LIMIT):
+    """
+    Active users matching ``query``. Returns ``(users, next_cursor)``;
+    ``next_cursor`` is ``None`` on the last page. Raises ``ValueError`` on
+    a bad cursor.
+    """
+    limit = max(1, min(limit, MAX_LIMIT))
+    users = User.objects.filter(is_active=True).annotate(username_lower=Lower("username"))
+
+    if department_id:
+        users = users.filter(department_id=department_id)
+    if exclude_id:
+        users = users.exclude(pk=exclude_id)
+
+    query = query.strip().lower()
+    if query:
+        low, high = prefix_range(query)
+        users = users.alias(
+            first_name_lower=Lower("first_name"),
+            last_name_lower=Lower("last_name"),
+        ).filter(
+            Q(username_lower__gte=low, username_lower__lt=high)
+            | Q(first_name_lower__gte=low, first_name_lower__lt=high)
+            | Q(last_name_lower__gte=low, last_name_lower__lt=high)
+        )
+
+    if cursor:
+        after_username, after_pk = _decode_cursor(cursor)
+        users = users.filter(
+            Q(username_lower__gt=after_username)
+            | Q(username_lower=after_username, pk__gt=after_pk)
+        )
+
+    rows = list(
+        users.only("id", "username", "first_name", "last_name")
+        .order_by("username_lower", "pk")[:limit + 1]
+    )
+    next_cursor = _encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
@@ -1,12 +1,18 @@
 from django.contrib import admin
-from .models import Notification, PrintRequest
+from django.core.exceptions import PermissionDenied
+from django.db.models import Avg, Count, Max, Sum
+from django.template.response import TemplateResponse
+from django.urls import path
+
+from .changelists import ScalableAdminMixin, month_filter
+from .models import Notification, PrintRequest, SlowQuery
 
 
 # =========================================================
 # Notifications Admin
 # =========================================================
 @admin.register(Notification)
-class NotificationAdmin(admin.ModelAdmin):
+class NotificationAdmin(ScalableAdminMixin, admin.ModelAdmin):
     list_display = (
         "recipient",
         "document",
@@ -19,6 +25,7 @@ class NotificationAdmin(admin.ModelAdmin):
         "type",
         "is_read",
         "created_at",
+        month_filter("created_at"),
     )
 
     search_fields = (
@@ -33,10 +40,13 @@ class NotificationAdmin(admin.ModelAdmin):
 
     list_select_related = (
         "recipient",
-        "document",
+        "document__department",
     )
 
-    date_hierarchy = "created_at"
+    raw_id_fields = (
+        "recipient",
+        "document",
+    )
 
 
 # =========================================================
@@ -66,9 +76,17 @@ class PrintRequestAdmin(admin.ModelAdmin):
     readonly_fields = (
         "created_at",
         "handled_at",
+        "package",
+        "package_error",
     )
 
     list_select_related = (
+        "user",
+        "document__department",
+        "handled_by",
+    )
+
+    raw_id_fields = (
         "user",
         "document",
         "handled_by",
@@ -76,3 +94,87 @@ class PrintRequestAdmin(admin.ModelAdmin):
 
     date_hierarchy = "created_at"
 
+
+
+# =========================================================
+# Slow Query Log Admin
+# =========================================================
+@admin.register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = (
+        "created_at",
+        "duration_ms",
+        "view",
+        "call_site",
+        "database",
+        "fingerprint",
+    )
+
+    list_filter = (
+        "database",
+        "view",
+        month_filter("created_at"),
+    )
+
+    search_fields = (
+        "=fingerprint",
+        "view",
+        "call_site",
+        "sql",
+    )
+
+    readonly_fields = (
+        "fingerprint",
+        "sql",
+        "params_shape",
+        "duration_ms",
+        "database",
+        "view",
+        "call_site",
+        "created_at",
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path(
+                "fingerprints/",
+                self.admin_site.admin_view(self.fingerprints_view),
+                name="core_slowquery_fingerprints",
+            ),
+        ] + super().get_urls()
+
+    def fingerprints_view(self, request):
+        """Samples grouped by fingerprint, most total time first."""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+
+        groups = list(
+            SlowQuery.objects.values("fingerprint")
+            .annotate(
+                count=Count("id"),
+                total_ms=Sum("duration_ms"),
+                avg_ms=Avg("duration_ms"),
+                max_ms=Max("duration_ms"),
+                last_seen=Max("created_at"),
+                latest_id=Max("id"),
+            )
+            .order_by("-total_ms")[:100]
+        )
+        # The newest sample of each group shows its SQL, view and call site
+        latest = SlowQuery.objects.in_bulk([group["latest_id"] for group in groups])
+        for group in groups:
+            group["sample"] = latest.get(group["latest_id"])
+
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "Slow queries by fingerprint",
+            "groups": groups,
+        }
+        return TemplateResponse(request, "admin/core/slowquery/fingerprints.html", context)
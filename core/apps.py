@@ -1,5 +1,45 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from django.contrib.auth.models import Group
+
+        from accounts.models import Department, User
+        from documents.models import Document
+        from documents.signals import documents_changed
+
+        from .inbox import recount_after_delete, remember_unread_recipients
+        from .notifications import notify_documents_changed
+        from .sqlite import configure_connection
+        from .versions import bump_departments, bump_documents, bump_users
+
+        connection_created.connect(configure_connection, dispatch_uid="qms_sqlite_pragmas")
+
+        # Cascaded notification deletes must not leave the bell counting them
+        pre_delete.connect(remember_unread_recipients, sender=Document,
+                           dispatch_uid="qms_unread_before_document_delete")
+        post_delete.connect(recount_after_delete, sender=Document,
+                            dispatch_uid="qms_unread_after_document_delete")
+
+        # Bulk actions: one event per operation, batched notifications
+        documents_changed.connect(notify_documents_changed, sender=Document,
+                                  dispatch_uid="qms_notify_documents_changed")
+
+        # Data versions behind the conditional-GET ETags (core.versions)
+        for name, signal in (("save", post_save), ("delete", post_delete)):
+            signal.connect(bump_documents, sender=Document, dispatch_uid=f"qms_version_document_{name}")
+            signal.connect(bump_departments, sender=Department, dispatch_uid=f"qms_version_department_{name}")
+            signal.connect(bump_users, sender=User, dispatch_uid=f"qms_version_user_{name}")
+            signal.connect(bump_users, sender=Group, dispatch_uid=f"qms_version_group_{name}")
+        m2m_changed.connect(bump_documents, sender=Document.readers.through,
+                            dispatch_uid="qms_version_document_readers")
+        m2m_changed.connect(bump_users, sender=User.groups.through,
+                            dispatch_uid="qms_version_user_groups")
+        documents_changed.connect(bump_documents, sender=Document,
+                                  dispatch_uid="qms_version_documents_changed")
@@ -0,0 +1,59 @@
+"""
+Minimal off-request execution.
+
+``submit`` hands a callable to the backend named by ``QMS_BACKGROUND_BACKEND``
+so the request returns without waiting for it:
+
+- ``"jobs"``: a ``Job`` row in the current transaction, run by
+  ``manage.py run_workers`` (survives restarts, retried on failure).
+  Arguments must be JSON-serializable and ``func`` a module-level function.
+- ``"threads"``: a small process-wide thread pool, after commit.
+
+Set ``QMS_BACKGROUND_EAGER = True`` to run inline after commit (tests, scripts).
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .jobs import enqueue
+
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, "QMS_BACKGROUND_WORKERS", 2),
+            thread_name_prefix="qms-bg",
+        )
+    return _executor
+
+
+def _run(func, args, kwargs):
+    close_old_connections()
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception("Background task %s failed", getattr(func, "__name__", func))
+    finally:
+        close_old_connections()
+
+
+def submit(func, *args, **kwargs):
+    """Run ``func(*args, **kwargs)`` off the request thread after commit."""
+    if getattr(settings, "QMS_BACKGROUND_EAGER", False):
+        transaction.on_commit(lambda: func(*args, **kwargs))
+        return
+
+    if getattr(settings, "QMS_BACKGROUND_BACKEND", "threads") == "jobs":
+        enqueue(func, args, kwargs)
+        return
+
+    transaction.on_commit(lambda: _get_executor().submit(_run, func, args, kwargs))
@@ -0,0 +1,229 @@
+"""
+View-level benchmarks: wall time, query count and peak memory per view,
+compared against a stored JSON baseline.
+
+Driven by ``manage.py bench_views``; see that command for usage.
+"""
+
+import json
+import statistics
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.contrib.sessions.backends.base import SessionBase
+from django.db import connection
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.models import Department, User
+from accounts.permissions import (
+    GROUP_EMPLOYEE,
+    GROUP_MANAGER,
+    GROUP_QUALITY,
+)
+from documents.models import Document, DocumentActivity
+from documents.views import quality_center
+
+
+KPI_RANGES = ("1", "7", "30", "90", "365")
+
+# Allowed growth before a metric counts as a regression
+DEFAULT_TOLERANCE = {
+    "time_ms": 0.25,
+    "queries": 0.0,
+    "peak_kb": 0.25,
+}
+
+# Ignore noise on very fast views / tiny allocations
+MIN_TIME_DELTA_MS = 10.0
+MIN_MEMORY_DELTA_KB = 256.0
+
+
+@dataclass
+class Scenario:
+    name: str
+    role: str
+    url_name: str = ""
+    url_kwargs: dict = field(default_factory=dict)
+    params: dict = field(default_factory=dict)
+    view: object = None  # called directly when the view is not routed
+
+
+# =========================================================
+# Scenarios
+# =========================================================
+def build_scenarios():
+    """
+    Resolve ids for the current database and return every benchmarked view.
+    """
+    document = (
+        Document.objects.filter(status=Document.Status.ACTIVE)
+        .order_by("id").only("id").first()
+    )
+    department = Department.objects.filter(users__isnull=False).order_by("id").first()
+
+    total_logs = DocumentActivity.objects.count()
+    last_page = max(1, (total_logs + 24) // 25)
+
+    scenarios = [
+        Scenario("document_list[employee]", GROUP_EMPLOYEE, "documents:list"),
+        Scenario("document_list[manager]", GROUP_MANAGER, "documents:list"),
+        Scenario("document_list[quality]", GROUP_QUALITY, "documents:list"),
+        Scenario("audit_dashboard[page=1]", GROUP_QUALITY, "documents:audit_dashboard"),
+        Scenario("audit_dashboard[page=mid]", GROUP_QUALITY, "documents:audit_dashboard",
+                 params={"page": max(1, last_page // 2)}),
+        Scenario("audit_dashboard[page=last]", GROUP_QUALITY, "documents:audit_dashboard",
+                 params={"page": last_page}),
+        Scenario("quality", GROUP_QUALITY, "core:quality"),
+        Scenario("quality_center", GROUP_QUALITY, view=quality_center),
+    ]
+
+    if document:
+        scenarios.append(Scenario(
+            "document_view", GROUP_QUALITY, "documents:view", {"pk": document.pk},
+        ))
+
+    if department:
+        scenarios.append(Scenario(
+            "get_department_users", GROUP_QUALITY, "documents:department_users",
+            params={"department_id": department.pk},
+        ))
+
+    scenarios.extend(
+        Scenario(f"kpi_enterprise_api[range={r}]", GROUP_QUALITY, "core:kpi_enterprise",
+                 params={"range": r})
+        for r in KPI_RANGES
+    )
+
+    return scenarios
+
+
+def user_for_role(role):
+    return (
+        User.objects.filter(groups__name=role, is_active=True, department__isnull=False)
+        .order_by("id").first()
+    )
+
+
+# =========================================================
+# Runner
+# =========================================================
+class ViewBenchmark:
+
+    def __init__(self, repeat=5, warmup=1):
+        self.repeat = repeat
+        self.warmup = warmup
+        self.factory = RequestFactory()
+        self._clients = {}
+
+    def _client(self, role):
+        if role not in self._clients:
+            user = user_for_role(role)
+            if user is None:
+                raise LookupError(f"No active user in group {role!r}; seed the database first.")
+            client = Client()
+            client.force_login(user)
+            self._clients[role] = (client, user)
+        return self._clients[role]
+
+    def _call(self, scenario):
+        client, user = self._client(scenario.role)
+
+        if scenario.view is not None:
+            request = self.factory.get("/", scenario.params)
+            request.user = user
+            request.session = SessionBase()
+            request._messages = FallbackStorage(request)
+            response = scenario.view(request)
+        else:
+            url = reverse(scenario.url_name, kwargs=scenario.url_kwargs)
+            response = client.get(url, scenario.params)
+
+        if response.status_code != 200:
+            raise AssertionError(f"{scenario.name}: HTTP {response.status_code}")
+        return response
+
+    def measure(self, scenario):
+        for _ in range(self.warmup):
+            self._call(scenario)
+
+        timings = []
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            self._call(scenario)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        # Separate pass: tracemalloc skews timings.
+        tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                self._call(scenario)
+            _current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            "time_ms": round(statistics.median(timings), 2),
+            "queries": len(queries),
+            "peak_kb": round(peak / 1024, 1),
+        }
+
+    def run(self, scenarios, log=None):
+        results = {}
+        for scenario in scenarios:
+            results[scenario.name] = self.measure(scenario)
+            if log:
+                r = results[scenario.name]
+                log(f"{scenario.name:<34} {r['time_ms']:>9.2f} ms {r['queries']:>5} q {r['peak_kb']:>10.1f} KB")
+        return results
+
+
+# =========================================================
+# Baseline
+# =========================================================
+def load_baseline(path):
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return None
+
+
+def save_baseline(path, results, meta=None):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as fh:
+        json.dump({"meta": meta or {}, "results": results}, fh, indent=2, sort_keys=True)
+        fh.write("\n")
+
+
+def compare(results, baseline, tolerance=None):
+    """
+    Return a list of human-readable regressions (empty list = pass).
+    """
+    tolerance = {**DEFAULT_TOLERANCE, **(tolerance or {})}
+    reference = (baseline or {}).get("results", {})
+    regressions = []
+
+    for name, current in results.items():
+        previous = reference.get(name)
+        if not previous:
+            continue
+
+        for metric, allowed in tolerance.items():
+            before, after = previous.get(metric), current.get(metric)
+            if before is None or after is None:
+                continue
+
+            limit = before * (1 + allowed)
+            if metric == "time_ms":
+                limit = max(limit, before + MIN_TIME_DELTA_MS)
+            elif metric == "peak_kb":
+                limit = max(limit, before + MIN_MEMORY_DELTA_KB)
+
+            if after > limit:
+                regressions.append(f"{name}: {metric} {before} -> {after} (limit {limit:.1f})")
+
+    return regressions
@@ -0,0 +1,15 @@
+from django.utils.functional import SimpleLazyObject
+
+from .inbox import unread_count
+
+
+def notifications(request):
+    """
+    ``unread_notifications`` for the header bell. Lazy: pages that do not
+    render the bell pay nothing, and the count itself is a cached lookup.
+    """
+    user = getattr(request, "user", None)
+    if user is None or not user.is_authenticated:
+        return {"unread_notifications": 0}
+
+    return {"unread_notifications": SimpleLazyObject(lambda: unread_count(user))}
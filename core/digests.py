@@ -0,0 +1,194 @@
+"""
+Email digests of unread notifications.
+
+Once per ``QMS_DIGEST_PERIOD_HOURS`` each user with pending (unread and not
+yet digested) notifications gets one email listing them. Users are handled
+in batches ordered by id. A batch is claimed in one transaction: its
+notifications get ``digested_at`` and the run's ``last_user_id`` moves
+forward. The batch is then sent over a single backend connection. A user
+whose send fails is released again, so the next run retries them. A
+crashed run resumes after ``last_user_id`` and never emails anyone twice.
+"""
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core import mail
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+from django.template.loader import get_template
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import DigestRun, Notification
+
+
+PENDING = Q(is_read=False, digested_at__isnull=True)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def period_start_for(now, hours):
+    """Start of the digest period containing ``now`` (UTC-aligned)."""
+    period = int(hours * 3600)
+    epoch = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+    elapsed = int((now - epoch).total_seconds())
+    return epoch + timedelta(seconds=elapsed - elapsed % period)
+
+
+def get_run(now=None):
+    """The current period's run, created on first use."""
+    now = now or timezone.now()
+    period_start = period_start_for(now, _setting("QMS_DIGEST_PERIOD_HOURS", 24))
+    try:
+        run, _ = DigestRun.objects.get_or_create(
+            period_start=period_start, defaults={"cutoff": now}
+        )
+    except IntegrityError:
+        # Another process created it concurrently
+        run = DigestRun.objects.get(period_start=period_start)
+    return run
+
+
+# =========================================================
+# Batches
+# =========================================================
+def _next_user_ids(run, batch_size):
+    return list(
+        Notification.objects.filter(
+            PENDING, created_at__lt=run.cutoff, recipient_id__gt=run.last_user_id,
+        )
+        .order_by("recipient_id")
+        .values_list("recipient_id", flat=True)
+        .distinct()[:batch_size]
+    )
+
+
+def _claim(run, user_ids, now):
+    """
+    Load and mark the batch's notifications. Returns ``{user: [notifications]}``.
+    """
+    with transaction.atomic():
+        pending = list(
+            Notification.objects.filter(
+                PENDING, created_at__lt=run.cutoff, recipient_id__in=user_ids,
+            )
+            .select_related("recipient", "document")
+            .only(
+                "id", "type", "message", "created_at", "document_id",
+                "document__title",
+                "recipient__username", "recipient__first_name", "recipient__email",
+                "recipient__is_active",
+            )
+            .order_by("recipient_id", "-created_at")
+        )
+        Notification.objects.filter(pk__in=[n.pk for n in pending]).update(digested_at=now)
+
+        run.last_user_id = max(user_ids)
+        DigestRun.objects.filter(pk=run.pk).update(
+            last_user_id=Greatest(F("last_user_id"), run.last_user_id)
+        )
+
+    grouped = {}
+    for notification in pending:
+        grouped.setdefault(notification.recipient, []).append(notification)
+    return grouped
+
+
+def _release(notifications):
+    Notification.objects.filter(pk__in=[n.pk for n in notifications]).update(digested_at=None)
+
+
+# =========================================================
+# Rendering
+# =========================================================
+class DigestRenderer:
+    """Templates are loaded once per run and reused for every user."""
+
+    subject = "QMS: {count} new notification(s)"
+
+    def __init__(self):
+        self.text = get_template("qms-templates/emails/notification_digest.txt")
+        self.html = get_template("qms-templates/emails/notification_digest.html")
+        self.site_url = _setting("QMS_SITE_URL", "http://localhost:8000").rstrip("/")
+        self.max_items = _setting("QMS_DIGEST_MAX_ITEMS", 20)
+        self.from_email = settings.DEFAULT_FROM_EMAIL
+
+    def message(self, user, notifications, connection):
+        items = [
+            {
+                "message": n.message or n.document.title,
+                "type": n.get_type_display(),
+                "created_at": n.created_at,
+                "url": self.site_url + reverse("documents:view", args=[n.document_id]),
+            }
+            for n in notifications[:self.max_items]
+        ]
+        context = {
+            "user": user,
+            "items": items,
+            "count": len(notifications),
+            "more": max(0, len(notifications) - self.max_items),
+            "site_url": self.site_url,
+        }
+
+        email = mail.EmailMultiAlternatives(
+            subject=self.subject.format(count=len(notifications)),
+            body=self.text.render(context),
+            from_email=self.from_email,
+            to=[user.email],
+            connection=connection,
+        )
+        email.attach_alternative(self.html.render(context), "text/html")
+        return email
+
+
+# =========================================================
+# Run
+# =========================================================
+def send_digests(now=None, batch_size=None, log=None):
+    """
+    Send (or resume) the current period's digests. Returns the ``DigestRun``.
+    """
+    now = now or timezone.now()
+    batch_size = batch_size or _setting("QMS_DIGEST_BATCH_SIZE", 200)
+    run = get_run(now)
+    if run.finished_at:
+        return run
+
+    renderer = DigestRenderer()
+
+    while True:
+        user_ids = _next_user_ids(run, batch_size)
+        if not user_ids:
+            break
+
+        batch = _claim(run, user_ids, now)
+        sent = 0
+
+        # One connection (SMTP session) for the whole batch
+        with mail.get_connection() as connection:
+            users = list(batch.items())
+            done = 0
+            try:
+                for user, notifications in users:
+                    if user.is_active and user.email:
+                        connection.send_messages([renderer.message(user, notifications, connection)])
+                        sent += 1
+                    done += 1
+            finally:
+                if done < len(users):
+                    # Unsent users go back to pending for the next run
+                    _release([n for _, notifications in users[done:] for n in notifications])
+                run.emails_sent += sent
+                DigestRun.objects.filter(pk=run.pk).update(emails_sent=F("emails_sent") + sent)
+
+        if log:
+            log(f"Digest batch up to user #{run.last_user_id}: {sent} email(s)")
+
+    run.finished_at = timezone.now()
+    DigestRun.objects.filter(pk=run.pk).update(finished_at=run.finished_at)
+    return run
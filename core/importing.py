@@ -0,0 +1,523 @@
+"""
+Bulk import of controlled documents (``manage.py import_documents`` and
+the Quality import page).
+
+The source is a ZIP archive or a directory with the PDFs and a manifest,
+``manifest.csv`` or ``manifest.json``, with one entry per file::
+
+    file,title,department,status,disabled_reason,description,readers
+    sop/SOP-001.pdf,Line clearance,PROD,active,,,jdoe;asmith
+
+- Metadata is resolved up front. Departments are matched by code or name
+  and readers by username. Readers must be active members of the
+  document's department, which is the same rule ``DocumentForm`` applies.
+- Files are hashed and checked as PDFs (``core.pdfcheck``) in a process
+  pool.
+- Results are written chunk by chunk. Documents, reader links, CREATE
+  activities and journal rows go in with ``bulk_create``, one
+  transaction per chunk.
+- Every manifest entry gets a journal row (``ImportedFile``) in the
+  transaction of its chunk. Re-running an interrupted import therefore
+  skips exactly the entries that were committed. A file whose content
+  (sha256) was already imported is recorded as a duplicate.
+"""
+
+import csv
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import re
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from itertools import islice, repeat
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import connection, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from accounts.models import Department, User
+from documents.forms import DocumentForm
+from documents.models import Document, DocumentActivity, DocumentRevision
+
+from .models import DocumentImport, ImportedFile
+from .pdfcheck import MB, inspect_bytes, limit_memory
+from .versions import DOCUMENTS, bump
+
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAMES = ("manifest.csv", "manifest.json")
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# =========================================================
+# Sources
+# =========================================================
+class DirectorySource:
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+
+    def open(self, name):
+        full = os.path.normpath(os.path.join(self.path, name))
+        if not full.startswith(self.path + os.sep):
+            raise FileNotFoundError(name)
+        return open(full, "rb")
+
+    def close(self):
+        pass
+
+
+class ZipSource:
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.archive = zipfile.ZipFile(self.path)
+
+    def open(self, name):
+        try:
+            return self.archive.open(name)
+        except KeyError:
+            raise FileNotFoundError(name) from None
+
+    def close(self):
+        self.archive.close()
+
+
+def open_source(path):
+    if os.path.isdir(path):
+        return DirectorySource(path)
+    if zipfile.is_zipfile(path):
+        return ZipSource(path)
+    raise ValueError(f"{path} is neither a directory nor a ZIP archive")
+
+
+# =========================================================
+# Manifest
+# =========================================================
+def read_manifest(source, manifest_path=None):
+    """
+    Return ``(raw_bytes, entries)``. ``manifest_path`` overrides the
+    manifest inside the source.
+    """
+    if manifest_path:
+        name = manifest_path
+        with open(manifest_path, "rb") as fh:
+            data = fh.read()
+    else:
+        for name in MANIFEST_NAMES:
+            try:
+                with source.open(name) as fh:
+                    data = fh.read()
+                break
+            except FileNotFoundError:
+                continue
+        else:
+            raise ValueError("No manifest.csv or manifest.json found in the import source")
+
+    try:
+        if name.lower().endswith(".json"):
+            entries = json.loads(data)
+            if isinstance(entries, dict):
+                entries = entries.get("documents", [])
+        else:
+            entries = list(csv.DictReader(io.StringIO(data.decode("utf-8-sig"))))
+    except (UnicodeDecodeError, ValueError, csv.Error) as exc:
+        raise ValueError(f"Unreadable manifest {name}: {exc}") from exc
+
+    if not isinstance(entries, list) or not all(isinstance(e, dict) for e in entries):
+        raise ValueError(f"Manifest {name} must be a list of entries")
+    return data, entries
+
+
+def import_key(source_path, manifest_data):
+    digest = hashlib.sha256(os.path.abspath(source_path).encode())
+    digest.update(b"\0")
+    digest.update(manifest_data)
+    return digest.hexdigest()
+
+
+def _split_readers(value):
+    if isinstance(value, (list, tuple)):
+        return [str(v).strip() for v in value if str(v).strip()]
+    return [v for v in re.split(r"[;,\s]+", value or "") if v]
+
+
+@dataclass
+class ImportRow:
+    path: str
+    title: str
+    department_id: int
+    status: str
+    disabled_reason: str = ""
+    description: str = ""
+    reader_ids: list = field(default_factory=list)
+
+
+def resolve_entries(entries):
+    """
+    Validate manifest entries against the database (one query for
+    departments, one per 500 usernames). Returns ``(rows, failures)``;
+    failures are ``(path, error)``.
+    """
+    departments = {}
+    for department in Department.objects.only("id", "name", "code"):
+        departments[department.name.lower()] = department.pk
+        if department.code:
+            departments[department.code.lower()] = department.pk
+
+    usernames = sorted({u for e in entries for u in _split_readers(e.get("readers"))})
+    members = {}
+    for start in range(0, len(usernames), 500):
+        members.update(
+            (username, (pk, department_id))
+            for pk, username, department_id in User.objects.filter(
+                username__in=usernames[start:start + 500], is_active=True
+            ).values_list("id", "username", "department_id")
+        )
+
+    rows, failures, seen = [], [], set()
+    for number, entry in enumerate(entries, start=1):
+        path = str(entry.get("file") or "").strip()
+        if not path:
+            failures.append((f"entry {number}", "no file given"))
+            continue
+        if path in seen:
+            # Journal paths are unique per import: label the repeat
+            failures.append((f"{path} (entry {number})", "listed twice in the manifest"))
+            continue
+        seen.add(path)
+
+        title = str(entry.get("title") or "").strip()
+        department_id = departments.get(str(entry.get("department") or "").strip().lower())
+        status = str(entry.get("status") or Document.Status.ACTIVE).strip().lower()
+        reason = str(entry.get("disabled_reason") or "").strip()
+
+        error = ""
+        if not path.lower().endswith(".pdf"):
+            error = "only PDF files are allowed"
+        elif not title or len(title) > 255:
+            error = "title is empty or longer than 255 characters"
+        elif not department_id:
+            error = f"unknown department {entry.get('department')!r}"
+        elif status not in Document.Status.values:
+            error = f"invalid status {status!r}"
+        elif status == Document.Status.DISABLED and not reason:
+            error = "disabled_reason is required when status is disabled"
+
+        reader_ids = []
+        for username in _split_readers(entry.get("readers")):
+            pk, reader_department = members.get(username, (None, None))
+            if pk is None or reader_department != department_id:
+                error = error or f"reader {username!r} is not an active member of the department"
+            reader_ids.append(pk)
+
+        if error:
+            failures.append((path, error))
+            continue
+
+        rows.append(ImportRow(
+            path=path,
+            title=title,
+            department_id=department_id,
+            status=status,
+            disabled_reason=reason[:255],
+            description=str(entry.get("description") or "").strip(),
+            reader_ids=sorted(set(reader_ids)),
+        ))
+
+    return rows, failures
+
+
+# =========================================================
+# File Checks (pool workers)
+# =========================================================
+_worker_source = None
+
+
+def _init_worker(source_path, memory_bytes=None):
+    global _worker_source
+    _worker_source = open_source(source_path)
+    if memory_bytes:
+        limit_memory(memory_bytes)
+
+
+def inspect_file(name, max_size, max_inflated):
+    """
+    Hash ``name`` and check it with ``core.pdfcheck``. Returns
+    ``(name, sha256, error)``; runs in a pool worker, no database access.
+    """
+    try:
+        with _worker_source.open(name) as fh:
+            data = fh.read(max_size + 1)
+    except FileNotFoundError:
+        return name, "", "file not found in the import source"
+    except Exception as exc:  # unreadable archive member, ...
+        return name, "", f"unreadable file: {exc}"[:255]
+
+    if len(data) > max_size:
+        return name, "", f"larger than {max_size // MB}MB"
+
+    problem = inspect_bytes(data, max_inflated)
+    if problem:
+        return name, "", problem[:255]
+    return name, hashlib.sha256(data).hexdigest(), ""
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+# =========================================================
+# Import
+# =========================================================
+def prepare_import(source_path, user, manifest_path=None):
+    """
+    The ``DocumentImport`` for this source + manifest: a new one, or the
+    existing one to resume. Raises ``ValueError`` on an unusable source.
+    """
+    source = open_source(source_path)
+    try:
+        data, _entries = read_manifest(source, manifest_path)
+    finally:
+        source.close()
+
+    document_import, _created = DocumentImport.objects.get_or_create(
+        key=import_key(source_path, data),
+        defaults={
+            "source": os.path.abspath(source_path),
+            "manifest": os.path.abspath(manifest_path) if manifest_path else "",
+            "created_by": user,
+        },
+    )
+    return document_import
+
+
+class DocumentImporter:
+
+    def __init__(self, document_import, workers=None, chunk_size=None, log=None):
+        self.document_import = document_import
+        self.user = document_import.created_by
+        if workers is None:
+            workers = _setting("QMS_IMPORT_WORKERS", None) or os.cpu_count() or 1
+        self.workers = workers
+        self.chunk_size = chunk_size or _setting("QMS_IMPORT_CHUNK_SIZE", 200)
+        self.max_size = DocumentForm.MAX_FILE_SIZE_MB * MB
+        self.max_inflated = _setting("QMS_PDF_MAX_INFLATED_MB", 256) * MB
+        self.log = log or (lambda message: None)
+
+        self.pdf_field = Document._meta.get_field("pdf_file")
+
+    def run(self):
+        document_import = self.document_import
+        if document_import.status == DocumentImport.Status.DONE:
+            return document_import
+
+        source = open_source(document_import.source)
+        try:
+            _data, entries = read_manifest(source, document_import.manifest or None)
+            rows, failures = resolve_entries(entries)
+
+            done = set(document_import.files.values_list("path", flat=True))
+            rows = [row for row in rows if row.path not in done]
+            failures = [(path, error) for path, error in failures if path not in done]
+
+            document_import.status = DocumentImport.Status.RUNNING
+            document_import.total = len(entries)
+            document_import.error = ""
+            document_import.save(update_fields=["status", "total", "error"])
+            if done:
+                self.log(f"Resuming import #{document_import.pk}: {len(done)} entries already done")
+
+            self._write(source, [], failures)
+            self._import_files(source, rows)
+        except Exception as exc:
+            DocumentImport.objects.filter(pk=document_import.pk).update(
+                status=DocumentImport.Status.FAILED, error=str(exc)[:2000]
+            )
+            raise
+        finally:
+            source.close()
+
+        DocumentImport.objects.filter(pk=document_import.pk).update(
+            status=DocumentImport.Status.DONE, finished_at=timezone.now()
+        )
+        document_import.refresh_from_db()
+        return document_import
+
+    def _import_files(self, source, rows):
+        by_path = {row.path: row for row in rows}
+        names = list(by_path)
+        started = time.monotonic()
+
+        if self.workers > 1 and len(names) > self.chunk_size:
+            # Children must not inherit an open database connection (they
+            # never touch the database); inside a test transaction keep it.
+            if not connection.in_atomic_block:
+                connections.close_all()
+            pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=_init_worker,
+                initargs=(source.path, _setting("QMS_PDF_CHECK_MEMORY_MB", 512) * MB),
+            )
+            results = pool.map(
+                inspect_file, names, repeat(self.max_size), repeat(self.max_inflated), chunksize=8
+            )
+        else:
+            pool = None
+            _init_worker(source.path)
+            results = map(inspect_file, names, repeat(self.max_size), repeat(self.max_inflated))
+
+        try:
+            for chunk in _chunks(results, self.chunk_size):
+                self._write(source, [(by_path[name], sha256) for name, sha256, error in chunk if not error],
+                            [(name, error) for name, _sha256, error in chunk if error])
+
+                current = DocumentImport.objects.get(pk=self.document_import.pk)
+                rate = current.processed / max(time.monotonic() - started, 1e-6)
+                self.log(
+                    f"  {current.processed}/{current.total}: {current.imported} imported, "
+                    f"{current.skipped} duplicate, {current.failed} failed ({rate:.0f}/s)"
+                )
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+    def _write(self, source, checked, failures):
+        """
+        Store one chunk: ``checked`` are ``(row, sha256)`` of valid files,
+        ``failures`` are ``(path, error)``.
+        """
+        if not checked and not failures:
+            return
+
+        journal = [
+            ImportedFile(path=path, outcome=ImportedFile.Outcome.FAILED, error=error[:255])
+            for path, error in failures
+        ]
+
+        known = set(
+            ImportedFile.objects.filter(
+                sha256__in={sha256 for _row, sha256 in checked},
+                outcome=ImportedFile.Outcome.IMPORTED,
+            ).values_list("sha256", flat=True)
+        )
+        new = []
+        for row, sha256 in checked:
+            if sha256 in known:
+                journal.append(ImportedFile(
+                    path=row.path, outcome=ImportedFile.Outcome.DUPLICATE, sha256=sha256
+                ))
+            else:
+                known.add(sha256)
+                new.append((row, sha256))
+
+        saved = []
+        try:
+            for row, _sha256 in new:
+                with source.open(row.path) as fh:
+                    name = self.pdf_field.generate_filename(None, os.path.basename(row.path))
+                    saved.append(self.pdf_field.storage.save(name, File(fh)))
+
+            with transaction.atomic():
+                documents = Document.objects.bulk_create([
+                    Document(
+                        title=row.title,
+                        description=row.description,
+                        department_id=row.department_id,
+                        pdf_file=name,
+                        status=row.status,
+                        disabled_reason=row.disabled_reason,
+                        created_by=self.user,
+                    )
+                    for (row, _sha256), name in zip(new, saved)
+                ])
+
+                revisions = DocumentRevision.objects.bulk_create([
+                    DocumentRevision(
+                        document=document, number=1, pdf_file=name, sha256=sha256,
+                        size=self.pdf_field.storage.size(name), uploaded_by=self.user,
+                    )
+                    for document, (_row, sha256), name in zip(documents, new, saved)
+                ])
+                for document, revision in zip(documents, revisions):
+                    document.current_revision = revision
+                Document.objects.bulk_update(documents, ["current_revision"])
+
+                Document.readers.through.objects.bulk_create([
+                    Document.readers.through(document_id=document.pk, user_id=user_id)
+                    for document, (row, _sha256) in zip(documents, new)
+                    for user_id in row.reader_ids
+                ])
+
+                DocumentActivity.objects.bulk_create([
+                    DocumentActivity(
+                        document=document,
+                        user=self.user,
+                        department_id=getattr(self.user, "department_id", None),
+                        action=DocumentActivity.Action.CREATE,
+                    )
+                    for document in documents
+                ])
+
+                journal.extend(
+                    ImportedFile(
+                        path=row.path, outcome=ImportedFile.Outcome.IMPORTED,
+                        sha256=sha256, document=document,
+                    )
+                    for document, (row, sha256) in zip(documents, new)
+                )
+                for entry in journal:
+                    entry.document_import = self.document_import
+                ImportedFile.objects.bulk_create(journal)
+                if documents:
+                    bump(DOCUMENTS)  # bulk_create sends no post_save
+
+                DocumentImport.objects.filter(pk=self.document_import.pk).update(
+                    imported=F("imported") + len(documents),
+                    skipped=F("skipped") + len(checked) - len(new),
+                    failed=F("failed") + len(failures),
+                )
+        except Exception:
+            # Nothing was journaled: drop the copies, the chunk is redone on resume
+            for name in saved:
+                self.pdf_field.storage.delete(name)
+            raise
+
+
+def upload_storage():
+    """
+    Where archives uploaded on the import page wait for their job: outside
+    ``MEDIA_ROOT``, so they are never served.
+    """
+    return FileSystemStorage(location=_setting(
+        "QMS_IMPORT_UPLOAD_ROOT", os.path.join(settings.BASE_DIR, "import_uploads")
+    ))
+
+
+def run_import(import_id, workers=None, chunk_size=None, log=None):
+    """Run (or resume) an import; background entry point for the upload view."""
+    document_import = DocumentImport.objects.select_related("created_by").get(pk=import_id)
+    document_import = DocumentImporter(
+        document_import, workers=workers, chunk_size=chunk_size, log=log or logger.info
+    ).run()
+
+    # A finished upload is not needed again (failed ones stay for the retry)
+    uploads = upload_storage()
+    if os.path.dirname(document_import.source) == os.path.abspath(uploads.location):
+        uploads.delete(os.path.basename(document_import.source))
+    return document_import
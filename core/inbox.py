@@ -0,0 +1,157 @@
+"""
+Notification inbox and the header bell's unread badge.
+
+- The unread count lives in ``NotificationCounter`` (one row per user),
+  changed with ``F()`` updates in the same transaction as the
+  notifications, and cached for ``QMS_UNREAD_CACHE_SECONDS``. Reading the
+  badge is a cache hit or a primary-key lookup, never a COUNT(*).
+- The inbox is paginated by keyset over ``(created_at, id)`` using the
+  ``(recipient, created_at)`` index, so page N costs the same as page 1.
+- "Mark all read" is one UPDATE plus resetting the counter.
+"""
+
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .keyset import keyset_page
+from .models import Notification, NotificationCounter
+
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 50
+
+
+def _cache_key(user_id):
+    return f"qms:unread:{user_id}"
+
+
+def _cache_timeout():
+    return getattr(settings, "QMS_UNREAD_CACHE_SECONDS", 30)
+
+
+def _forget(user_ids):
+    keys = [_cache_key(user_id) for user_id in user_ids]
+    cache.delete_many(keys)
+    # Again after commit, in case a concurrent reader re-cached the old value
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+# =========================================================
+# Unread Counter
+# =========================================================
+def unread_count(user):
+    key = _cache_key(user.pk)
+    count = cache.get(key)
+    if count is None:
+        # No row = never notified (existing users are backfilled by migration)
+        count = (
+            NotificationCounter.objects.filter(user_id=user.pk)
+            .values_list("unread", flat=True)
+            .first()
+        ) or 0
+        cache.set(key, count, _cache_timeout())
+    return count
+
+
+def add_unread(user_ids):
+    """
+    +1 unread per occurrence of a user id: one INSERT (missing rows) and
+    one UPDATE per distinct increment (a single one for plain fan-outs).
+    """
+    counts = Counter(user_ids)
+    if not counts:
+        return
+
+    by_increment = {}
+    for user_id, increment in counts.items():
+        by_increment.setdefault(increment, []).append(user_id)
+
+    with transaction.atomic():
+        NotificationCounter.objects.bulk_create(
+            [NotificationCounter(user_id=user_id) for user_id in counts],
+            ignore_conflicts=True,
+        )
+        for increment, ids in by_increment.items():
+            NotificationCounter.objects.filter(user_id__in=ids).update(
+                unread=F("unread") + increment
+            )
+    _forget(counts)
+
+
+def recount_unread(user_ids):
+    """
+    Recompute counters from the notifications table (after cascades that
+    removed unread rows). One UPDATE with a correlated subquery.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+
+    unread = (
+        Notification.objects.filter(recipient_id=OuterRef("user_id"), is_read=False)
+        .order_by()
+        .values("recipient_id")
+        .annotate(total=Count("id"))
+        .values("total")
+    )
+    NotificationCounter.objects.filter(user_id__in=user_ids).update(
+        unread=Coalesce(Subquery(unread), 0)
+    )
+    _forget(user_ids)
+
+
+# =========================================================
+# Mark Read
+# =========================================================
+def mark_all_read(user):
+    with transaction.atomic():
+        marked = Notification.objects.filter(recipient=user, is_read=False).update(is_read=True)
+        NotificationCounter.objects.filter(user_id=user.pk).update(unread=0)
+    _forget([user.pk])
+    return marked
+
+
+def mark_read(user, notification_ids):
+    with transaction.atomic():
+        marked = Notification.objects.filter(
+            recipient=user, pk__in=notification_ids, is_read=False
+        ).update(is_read=True)
+        if marked:
+            NotificationCounter.objects.filter(user_id=user.pk).update(
+                unread=Greatest(F("unread") - marked, 0)
+            )
+    _forget([user.pk])
+    return marked
+
+
+# =========================================================
+# Inbox Page
+# =========================================================
+def inbox_page(user, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Newest first. Returns ``(notifications, next_cursor)``; ``next_cursor``
+    is ``None`` on the last page.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    qs = Notification.objects.filter(recipient=user).select_related("document")
+    return keyset_page(qs, cursor, limit)
+
+
+# =========================================================
+# Document Deletion (cascade keeps counters honest)
+# =========================================================
+def remember_unread_recipients(sender, instance, **kwargs):
+    instance._qms_unread_recipients = list(
+        Notification.objects.filter(document_id=instance.pk, is_read=False)
+        .values_list("recipient_id", flat=True)
+        .distinct()
+    )
+
+
+def recount_after_delete(sender, instance, **kwargs):
+    recount_unread(getattr(instance, "_qms_unread_recipients", ()))
@@ -0,0 +1,203 @@
+"""
+Database-backed job queue.
+
+- ``enqueue`` inserts a ``Job`` row in the caller's transaction, so a job
+  exists if and only if the change that needs it was committed.
+- ``claim`` hands queued jobs to one worker atomically: a single
+  ``UPDATE ... WHERE id IN (SELECT ... LIMIT n) RETURNING id``. SQLite
+  serializes writers, so two workers never receive the same job.
+- A claimed job is leased until ``locked_until``. The worker extends the
+  lease while the job runs (``extend_leases``). ``requeue_expired``
+  returns jobs whose worker died to the queue, or fails them once they
+  used up ``max_attempts``.
+- Failures are retried with jittered exponential backoff until
+  ``max_attempts``.
+"""
+
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+from .slow_queries import record_slow_queries
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def task_path(func):
+    if isinstance(func, str):
+        return func
+    return f"{func.__module__}.{func.__qualname__}"
+
+
+def noop(*args, **kwargs):
+    """Does nothing; used to benchmark the queue itself."""
+
+
+# =========================================================
+# Enqueue
+# =========================================================
+def enqueue(func, args=(), kwargs=None, *, priority=0, delay=0, max_attempts=None):
+    """
+    Queue ``func(*args, **kwargs)``. ``func`` is a module-level function or
+    its dotted path. Visible to workers once the current transaction commits.
+    """
+    return Job.objects.create(
+        task=task_path(func),
+        args=list(args),
+        kwargs=kwargs or {},
+        priority=priority,
+        run_after=timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts or _setting("QMS_JOB_MAX_ATTEMPTS", 5),
+    )
+
+
+# =========================================================
+# Claim / Lease
+# =========================================================
+def claim(worker_id, limit=1, lease_seconds=None):
+    """
+    Lease up to ``limit`` runnable jobs to ``worker_id``; returns them.
+    """
+    now = timezone.now()
+    lease = lease_seconds or _setting("QMS_JOB_LEASE_SECONDS", 60)
+    table = connection.ops.quote_name(Job._meta.db_table)
+
+    sql = f"""
+        UPDATE {table}
+        SET status = %s, locked_by = %s, locked_until = %s, attempts = attempts + 1
+        WHERE id IN (
+            SELECT id FROM {table}
+            WHERE status = %s AND run_after <= %s
+            ORDER BY priority DESC, run_after, id
+            LIMIT %s
+        )
+        RETURNING id
+    """
+    adapt = connection.ops.adapt_datetimefield_value  # as the ORM stores them
+    params = [
+        str(Job.Status.RUNNING), worker_id, adapt(now + timedelta(seconds=lease)),
+        str(Job.Status.QUEUED), adapt(now), limit,
+    ]
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            ids = [row[0] for row in cursor.fetchall()]
+
+    if not ids:
+        return []
+    return list(Job.objects.filter(pk__in=ids).order_by("-priority", "run_after", "id"))
+
+
+def extend_leases(job_ids, worker_id, lease_seconds=None):
+    lease = lease_seconds or _setting("QMS_JOB_LEASE_SECONDS", 60)
+    return Job.objects.filter(
+        pk__in=job_ids, status=Job.Status.RUNNING, locked_by=worker_id
+    ).update(locked_until=timezone.now() + timedelta(seconds=lease))
+
+
+def release(job_ids, worker_id):
+    """Give claimed-but-unstarted jobs back (graceful shutdown)."""
+    if not job_ids:
+        return 0
+    return Job.objects.filter(
+        pk__in=job_ids, status=Job.Status.RUNNING, locked_by=worker_id
+    ).update(status=Job.Status.QUEUED, locked_by="", locked_until=None)
+
+
+def requeue_expired():
+    """
+    Jobs whose worker stopped extending the lease go back to the queue,
+    unless they used up ``max_attempts``: a job that kills its worker
+    every time (OOM, segfault) fails instead of running forever.
+    Returns the number requeued.
+    """
+    now = timezone.now()
+    expired = Job.objects.filter(status=Job.Status.RUNNING, locked_until__lt=now)
+    expired.filter(attempts__gte=F("max_attempts")).update(
+        status=Job.Status.FAILED, locked_by="", locked_until=None, finished_at=now,
+        last_error="Lease expired: the worker died while running the job.",
+    )
+    return expired.filter(attempts__lt=F("max_attempts")).update(
+        status=Job.Status.QUEUED, locked_by="", locked_until=None
+    )
+
+
+# =========================================================
+# Run
+# =========================================================
+def retry_delay(attempts):
+    base = _setting("QMS_JOB_RETRY_BASE_DELAY", 5)
+    cap = _setting("QMS_JOB_RETRY_MAX_DELAY", 3600)
+    return random.uniform(0.5, 1.0) * min(cap, base * (2 ** (attempts - 1)))
+
+
+def run_job(job, worker_id, record_success=True):
+    """
+    Execute one claimed job and record the outcome. Returns ``True`` on
+    success. With ``record_success=False`` the caller marks successes in
+    bulk (``mark_done``); failures are always recorded here.
+    """
+    try:
+        func = import_string(job.task)
+        with record_slow_queries(f"job:{job.task}"):
+            func(*job.args, **job.kwargs)
+    except Exception:
+        error = traceback.format_exc()[-4000:]
+        mine = Job.objects.filter(pk=job.pk, locked_by=worker_id)
+        if job.attempts >= job.max_attempts:
+            mine.update(
+                status=Job.Status.FAILED, last_error=error,
+                locked_by="", locked_until=None, finished_at=timezone.now(),
+            )
+        else:
+            mine.update(
+                status=Job.Status.QUEUED, last_error=error,
+                locked_by="", locked_until=None,
+                run_after=timezone.now() + timedelta(seconds=retry_delay(job.attempts)),
+            )
+        return False
+
+    if record_success:
+        mark_done([job.pk], worker_id)
+    return True
+
+
+def mark_done(job_ids, worker_id):
+    """One UPDATE for many finished jobs (still leased to ``worker_id``)."""
+    if not job_ids:
+        return 0
+    return Job.objects.filter(pk__in=job_ids, locked_by=worker_id).update(
+        status=Job.Status.DONE, locked_by="", locked_until=None, finished_at=timezone.now(),
+    )
+
+
+def run_pending(worker_id="inline", limit=100):
+    """
+    Claim and run jobs in this process until the queue is empty (tests,
+    scripts). Returns the number of jobs run.
+    """
+    count = 0
+    while True:
+        jobs = claim(worker_id, limit)
+        if not jobs:
+            return count
+        for job in jobs:
+            run_job(job, worker_id)
+            count += 1
+
+
+def purge_finished(older_than_hours=None):
+    hours = older_than_hours or _setting("QMS_JOB_RETENTION_HOURS", 72)
+    return Job.objects.filter(
+        status=Job.Status.DONE, finished_at__lt=timezone.now() - timedelta(hours=hours)
+    ).delete()[0]
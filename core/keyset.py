@@ -0,0 +1,46 @@
+"""
+Keyset ("seek") pagination over ``(created_at, id)``, newest first.
+
+The cursor is the last row's key, so every page is an index range scan
+whatever its depth (no OFFSET). Needs an index ending in ``created_at``
+after the equality filters of the queryset.
+"""
+
+import base64
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+def encode_cursor(obj):
+    raw = f"{obj.created_at.isoformat()}|{obj.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Return ``(created_at, id)``; raises ``ValueError`` on a bad cursor."""
+    try:
+        created_at, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        created_at = parse_datetime(created_at)
+        pk = int(pk)
+    except (TypeError, UnicodeError, ValueError) as exc:
+        raise ValueError("Invalid cursor") from exc
+    if created_at is None:
+        raise ValueError("Invalid cursor")
+    return created_at, pk
+
+
+def keyset_page(queryset, cursor=None, limit=20):
+    """
+    Returns ``(rows, next_cursor)``; ``next_cursor`` is ``None`` on the
+    last page.
+    """
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(created_at__lte=created_at).filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk)
+        )
+
+    rows = list(queryset.order_by("-created_at", "-pk")[:limit + 1])
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
@@ -0,0 +1,269 @@
+"""
+Concurrent load generator used by ``manage.py loadtest_qms``.
+
+Each simulated session logs in with its own cookie jar and loops over a
+role-specific behaviour until the deadline. Latencies are recorded per
+role and endpoint (URL name), so the report compares employee, manager
+and quality sessions and lines up with ``/metrics/``. Paths come from
+``reverse()``.
+"""
+
+import http.cookiejar
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+from django.urls import reverse
+
+from accounts.permissions import (
+    GROUP_EMPLOYEE,
+    GROUP_MANAGER,
+    GROUP_QUALITY,
+)
+
+
+# The viewer iframe's file=... (absolute URL of the document's PDF)
+PDF_LINK_RE = re.compile(r'[?&]file=(?:https?://[^/"&]+)?(/[^"&]+?\.pdf)')
+CSRF_INPUT_RE = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+KPI_RANGES = ("1", "7", "30", "90", "365")
+
+
+@lru_cache(maxsize=None)
+def view_link_re():
+    """``href`` of the document viewer links on the document list."""
+    sample = reverse("documents:view", args=[987654321])
+    return re.compile('href="(' + re.escape(sample).replace("987654321", r"\d+") + ')"')
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+# =========================================================
+# Stats
+# =========================================================
+@dataclass
+class EndpointStats:
+    latencies: list = field(default_factory=list)
+    statuses: dict = field(default_factory=dict)
+    errors: int = 0
+
+    def summary(self, duration):
+        values = sorted(self.latencies)
+        total = len(values)
+        return {
+            "requests": total,
+            "rps": round(total / duration, 2) if duration else 0.0,
+            "p50_ms": round(percentile(values, 50), 1),
+            "p95_ms": round(percentile(values, 95), 1),
+            "p99_ms": round(percentile(values, 99), 1),
+            "error_rate": round(self.errors / total, 4) if total else 0.0,
+            "statuses": dict(sorted(self.statuses.items())),
+        }
+
+
+    def merge(self, other):
+        self.latencies.extend(other.latencies)
+        for status, count in other.statuses.items():
+            self.statuses[status] = self.statuses.get(status, 0) + count
+        self.errors += other.errors
+
+
+class LoadStats:
+    """Latencies keyed by ``(role, endpoint)``."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.endpoints = {}
+
+    def record(self, role, endpoint, latency_ms, status):
+        with self._lock:
+            stats = self.endpoints.setdefault((role, endpoint), EndpointStats())
+            stats.latencies.append(latency_ms)
+            key = str(status)
+            stats.statuses[key] = stats.statuses.get(key, 0) + 1
+            if not isinstance(status, int) or status >= 500:
+                stats.errors += 1
+
+    def report(self, duration):
+        roles = {}
+        endpoints = {}
+        with self._lock:
+            for (role, endpoint), stats in sorted(self.endpoints.items()):
+                roles.setdefault(role, {})[endpoint] = stats
+                endpoints.setdefault(endpoint, EndpointStats()).merge(stats)
+
+        by_role = {}
+        for role, per_endpoint in roles.items():
+            total = EndpointStats()
+            for stats in per_endpoint.values():
+                total.merge(stats)
+            by_role[role] = dict(
+                total.summary(duration),
+                endpoints={name: s.summary(duration) for name, s in per_endpoint.items()},
+            )
+
+        endpoints = {name: s.summary(duration) for name, s in sorted(endpoints.items())}
+        total = sum(e["requests"] for e in endpoints.values())
+        errors = sum(round(e["error_rate"] * e["requests"]) for e in endpoints.values())
+        return {
+            "duration_s": round(duration, 1),
+            "requests": total,
+            "throughput_rps": round(total / duration, 2) if duration else 0.0,
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            "roles": by_role,
+            "endpoints": endpoints,
+        }
+
+
+# =========================================================
+# Simulated Session
+# =========================================================
+class Session:
+    """
+    One logged-in browser. ``behaviour`` decides what it requests next.
+    """
+
+    def __init__(self, base_url, username, password, role, stats, rng, think_time):
+        self.base_url = base_url.rstrip("/")
+        self.username = username
+        self.password = password
+        self.role = role
+        self.stats = stats
+        self.rng = rng
+        self.think_time = think_time
+        self.jar = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.jar))
+
+    def request(self, endpoint, path, data=None, text=True):
+        url = self.base_url + path
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        headers = {"Referer": self.base_url + reverse("core:login")}
+
+        start = time.perf_counter()
+        try:
+            with self.opener.open(urllib.request.Request(url, data=body, headers=headers), timeout=60) as resp:
+                content = resp.read()
+                status = resp.status
+        except urllib.error.HTTPError as exc:
+            content = exc.read()
+            status = exc.code
+        except (urllib.error.URLError, OSError) as exc:
+            content = b""
+            status = type(exc).__name__
+        latency = (time.perf_counter() - start) * 1000
+
+        self.stats.record(self.role, endpoint, latency, status)
+        return status, content.decode("utf-8", "replace") if text else content
+
+    def login(self):
+        login_url = reverse("core:login")
+        _status, html = self.request("core:login[GET]", login_url)
+        match = CSRF_INPUT_RE.search(html)
+        if not match:
+            return False
+        status, _html = self.request("core:login[POST]", login_url, {
+            "csrfmiddlewaretoken": match.group(1),
+            "username": self.username,
+            "password": self.password,
+        })
+        return status == 200 and any(c.name == "sessionid" for c in self.jar)
+
+    def think(self):
+        if self.think_time > 0:
+            time.sleep(self.rng.expovariate(1 / self.think_time))
+
+    # =====================================================
+    # Behaviours
+    # =====================================================
+    def browse_documents(self):
+        """Employees / managers: list, then open a few PDFs."""
+        _status, html = self.request("documents:list", reverse("documents:list"))
+        links = view_link_re().findall(html)
+        for _ in range(self.rng.randint(0, 3)):
+            if not links:
+                break
+            self.think()
+            self.open_document(self.rng.choice(links))
+        self.think()
+
+    def open_document(self, link):
+        """The viewer page, then the PDF bytes its iframe loads."""
+        _status, html = self.request("documents:view", link)
+        match = PDF_LINK_RE.search(html)
+        if match:
+            self.request("documents:pdf", match.group(1), text=False)
+
+    def watch_dashboard(self):
+        """Quality staff: dashboard open, KPI/security widgets refreshing."""
+        self.request("core:quality", reverse("core:quality"))
+        for _ in range(self.rng.randint(3, 6)):
+            self.think()
+            range_key = self.rng.choice(KPI_RANGES)
+            self.request("core:kpi_enterprise", f"{reverse('core:kpi_enterprise')}?range={range_key}")
+            self.request("core:security_metrics", reverse("core:security_metrics"))
+        if self.rng.random() < 0.3:
+            self.request("documents:audit_dashboard", reverse("documents:audit_dashboard"))
+
+    def run(self, deadline):
+        if not self.login():
+            return
+        behaviour = self.watch_dashboard if self.role == GROUP_QUALITY else self.browse_documents
+        while time.monotonic() < deadline:
+            behaviour()
+
+
+# =========================================================
+# Driver
+# =========================================================
+ROLE_ORDER = (GROUP_EMPLOYEE, GROUP_MANAGER, GROUP_QUALITY)
+
+
+def plan_sessions(users_by_role, mix, sessions, rng):
+    """
+    Spread ``sessions`` over roles according to ``mix`` (role -> share).
+    Returns a list of ``(role, username)``.
+    """
+    plan = []
+    for role in ROLE_ORDER:
+        usernames = users_by_role.get(role) or []
+        count = round(sessions * mix.get(role, 0))
+        if not usernames:
+            continue
+        plan.extend((role, rng.choice(usernames)) for _ in range(count))
+    return plan
+
+
+def run_load(base_url, plan, password, duration, think_time=1.0, ramp_up=5.0, seed=1):
+    stats = LoadStats()
+    deadline = time.monotonic() + duration
+    threads = []
+
+    for index, (role, username) in enumerate(plan):
+        session = Session(
+            base_url, username, password, role, stats,
+            random.Random(seed + index), think_time,
+        )
+        thread = threading.Thread(target=session.run, args=(deadline,), daemon=True)
+        threads.append(thread)
+
+    started = time.monotonic()
+    for index, thread in enumerate(threads):
+        thread.start()
+        if ramp_up and len(threads) > 1:
+            time.sleep(ramp_up / len(threads))
+
+    for thread in threads:
+        thread.join(timeout=max(0.0, deadline - time.monotonic()) + 60)
+
+    return stats.report(time.monotonic() - started)
@@ -0,0 +1,107 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from accounts.models import User
+from core.benchmarks import (
+    ViewBenchmark,
+    build_scenarios,
+    compare,
+    load_baseline,
+    save_baseline,
+)
+from core.seeding import QMSSeeder, SEED_PREFIX
+
+
+SCALES = {
+    "small": dict(departments=10, users=500, documents=2000,
+                  activities=50000, notifications=20000),
+    "medium": dict(departments=20, users=5000, documents=20000,
+                   activities=500000, notifications=200000),
+    "large": dict(departments=40, users=20000, documents=100000,
+                  activities=2000000, notifications=1000000),
+}
+
+BENCH_DIR = settings.BASE_DIR / "benchmarks"
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the main views against a seeded test database and fail "
+        "when wall time, query count or peak memory regress vs. the baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", choices=SCALES, default="small")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--baseline", default=None,
+                            help="Baseline JSON (default: benchmarks/views_<scale>.json).")
+        parser.add_argument("--update-baseline", action="store_true",
+                            help="Store this run as the new baseline instead of comparing.")
+        parser.add_argument("--keepdb", action="store_true",
+                            help="Keep the seeded benchmark database between runs.")
+        parser.add_argument("--time-tolerance", type=float, default=None,
+                            help="Allowed relative wall-time growth (default 0.25).")
+
+    def handle(self, *args, **options):
+        scale = options["scale"]
+        if options["baseline"]:
+            baseline_path = Path(options["baseline"])
+        else:
+            baseline_path = BENCH_DIR / f"views_{scale}.json"
+
+        baseline = None
+        if not options["update_baseline"]:
+            baseline = load_baseline(baseline_path)
+            if baseline is None:
+                raise CommandError(
+                    f"No baseline at {baseline_path}; run with --update-baseline to create one."
+                )
+
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        if options["keepdb"]:
+            BENCH_DIR.mkdir(exist_ok=True)
+            connection.settings_dict["TEST"]["NAME"] = str(BENCH_DIR / f"bench_{scale}.sqlite3")
+
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=options["keepdb"], serialize=False,
+        )
+        try:
+            # The replica alias still names the real db-replica.sqlite3:
+            # analytics views must read the seeded test database instead.
+            with override_settings(QMS_ANALYTICS_DB=None):
+                results = self._run(scale, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options["keepdb"])
+            teardown_test_environment()
+
+        if options["update_baseline"]:
+            save_baseline(baseline_path, results, meta={"scale": scale, "seed": options["seed"]})
+            self.stdout.write(self.style.SUCCESS(f"Baseline written to {baseline_path}"))
+            return
+
+        tolerance = {}
+        if options["time_tolerance"] is not None:
+            tolerance["time_ms"] = options["time_tolerance"]
+
+        regressions = compare(results, baseline, tolerance)
+        if regressions:
+            for line in regressions:
+                self.stderr.write(line)
+            raise CommandError(f"{len(regressions)} performance regression(s) vs. {baseline_path}")
+
+        self.stdout.write(self.style.SUCCESS("No regressions vs. baseline."))
+
+    def _run(self, scale, options):
+        if not User.objects.filter(username__startswith=f"{SEED_PREFIX}_user_").exists():
+            self.stdout.write(f"Seeding '{scale}' dataset ...")
+            QMSSeeder(seed=options["seed"], log=self.stdout.write).run(**SCALES[scale])
+
+        self.stdout.write("")
+        benchmark = ViewBenchmark(repeat=options["repeat"])
+        return benchmark.run(build_scenarios(), log=self.stdout.write)
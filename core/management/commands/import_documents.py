@@ -0,0 +1,67 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import User
+from core.importing import DocumentImporter, prepare_import
+from core.models import DocumentImport, ImportedFile
+
+
+class Command(BaseCommand):
+    help = (
+        "Import PDFs from a ZIP archive or directory described by a manifest "
+        "(manifest.csv / manifest.json). Re-running the same import resumes "
+        "it; entries already committed are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("source", help="ZIP archive or directory.")
+        parser.add_argument("--manifest", default=None,
+                            help="Manifest path (default: manifest.csv/.json inside the source).")
+        parser.add_argument("--user", required=True,
+                            help="Username recorded as creator of the documents.")
+        parser.add_argument("--workers", type=int,
+                            default=getattr(settings, "QMS_IMPORT_WORKERS", None),
+                            help="Processes hashing/checking PDFs (default: CPU count).")
+        parser.add_argument("--chunk-size", type=int,
+                            default=getattr(settings, "QMS_IMPORT_CHUNK_SIZE", 200),
+                            help="Files per bulk insert / transaction.")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"Unknown user {options['user']!r}")
+
+        try:
+            document_import = prepare_import(options["source"], user, options["manifest"])
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        if document_import.status == DocumentImport.Status.DONE:
+            raise CommandError(f"{document_import} already finished.")
+
+        started = time.monotonic()
+        try:
+            document_import = DocumentImporter(
+                document_import,
+                workers=options["workers"],
+                chunk_size=options["chunk_size"],
+                log=self.stdout.write,
+            ).run()
+        except KeyboardInterrupt:
+            raise CommandError(
+                f"Interrupted. Run the same command again to resume import #{document_import.pk}."
+            )
+        elapsed = time.monotonic() - started
+
+        failures = document_import.files.filter(outcome=ImportedFile.Outcome.FAILED)[:50]
+        for failure in failures:
+            self.stdout.write(self.style.WARNING(f"  {failure.path}: {failure.error}"))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Import #{document_import.pk}: {document_import.imported} imported, "
+            f"{document_import.skipped} duplicate, {document_import.failed} failed "
+            f"of {document_import.total} in {elapsed:.1f}s"
+        ))
@@ -0,0 +1,170 @@
+import json
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from accounts.models import User
+from core.loadtest import ROLE_ORDER, plan_sessions, run_load
+
+
+LOCK_MARKERS = ("database is locked", "database table is locked")
+
+DEFAULT_MIX = "Employees=0.65,Managers=0.25,Quality=0.10"
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Start the app locally and drive it with concurrent role-based sessions. "
+        "Reports throughput, p50/p95/p99 latency and error rate per role and endpoint, "
+        "plus SQLite lock errors seen by the server."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sessions", type=int, default=50)
+        parser.add_argument("--duration", type=float, default=60, help="Seconds.")
+        parser.add_argument("--ramp-up", type=float, default=5, help="Seconds to start all sessions.")
+        parser.add_argument("--think-time", type=float, default=1.0,
+                            help="Mean pause between page actions, seconds.")
+        parser.add_argument("--mix", default=DEFAULT_MIX,
+                            help=f"Role shares, e.g. '{DEFAULT_MIX}'.")
+        parser.add_argument("--password", default="qms-seed",
+                            help="Password of the (seeded) users.")
+        parser.add_argument("--url", default=None,
+                            help="Target an already running server instead of starting one.")
+        parser.add_argument("--server", choices=("runserver", "gunicorn"), default="runserver")
+        parser.add_argument("--server-workers", type=int, default=4,
+                            help="gunicorn worker processes.")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--json", dest="json_path", default=None,
+                            help="Also write the report as JSON.")
+
+    # =====================================================
+    # Server lifecycle
+    # =====================================================
+    def _start_server(self, options, log_file):
+        port = _free_port()
+        address = f"127.0.0.1:{port}"
+        manage_py = str(settings.BASE_DIR / "manage.py")
+
+        if options["server"] == "gunicorn":
+            if not shutil.which("gunicorn"):
+                raise CommandError("gunicorn is not installed.")
+            cmd = [
+                "gunicorn", settings.WSGI_APPLICATION.rsplit(".", 1)[0] + ":application",
+                "--bind", address, "--workers", str(options["server_workers"]),
+                "--chdir", str(settings.BASE_DIR),
+            ]
+        else:
+            cmd = [sys.executable, manage_py, "runserver", address, "--noreload"]
+
+        process = subprocess.Popen(cmd, stdout=log_file, stderr=subprocess.STDOUT)
+        base_url = f"http://{address}"
+
+        for _ in range(100):
+            if process.poll() is not None:
+                raise CommandError("Server exited during start-up.")
+            try:
+                urllib.request.urlopen(base_url + reverse("core:login"), timeout=1).close()
+                return process, base_url
+            except OSError:
+                time.sleep(0.2)
+
+        process.terminate()
+        raise CommandError("Server did not become ready in time.")
+
+    # =====================================================
+    # Main
+    # =====================================================
+    def handle(self, *args, **options):
+        try:
+            mix = {
+                role.strip(): float(share)
+                for role, share in (part.split("=") for part in options["mix"].split(","))
+            }
+        except ValueError:
+            raise CommandError(f"Invalid --mix: {options['mix']!r}")
+
+        users_by_role = {
+            role: list(
+                User.objects.filter(groups__name=role, is_active=True)
+                .values_list("username", flat=True)[:500]
+            )
+            for role in ROLE_ORDER
+        }
+        plan = plan_sessions(users_by_role, mix, options["sessions"], random.Random(options["seed"]))
+        if not plan:
+            raise CommandError("No users to simulate. Run `manage.py seed_qms` first.")
+
+        log_file = tempfile.NamedTemporaryFile(prefix="qms-loadtest-", suffix=".log", delete=False)
+        process = None
+        try:
+            if options["url"]:
+                base_url = options["url"]
+            else:
+                process, base_url = self._start_server(options, log_file)
+
+            self.stdout.write(
+                f"Driving {base_url} with {len(plan)} sessions for {options['duration']:.0f}s ..."
+            )
+            report = run_load(
+                base_url, plan, options["password"], options["duration"],
+                think_time=options["think_time"], ramp_up=options["ramp_up"],
+                seed=options["seed"],
+            )
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait(timeout=30)
+            log_file.close()
+
+        with open(log_file.name, errors="replace") as fh:
+            server_log = fh.read()
+        report["sqlite_lock_errors"] = sum(server_log.count(marker) for marker in LOCK_MARKERS)
+        report["server_log"] = log_file.name
+
+        self._print(report)
+
+        if options["json_path"]:
+            with open(options["json_path"], "w") as fh:
+                json.dump(report, fh, indent=2)
+
+    def _row(self, name, e):
+        self.stdout.write(
+            f"{name:<30} {e['requests']:>7} {e['rps']:>8.2f} {e['p50_ms']:>8.1f} "
+            f"{e['p95_ms']:>8.1f} {e['p99_ms']:>8.1f} {e['error_rate'] * 100:>6.2f}%"
+        )
+
+    def _print(self, report):
+        header = f"{'role / endpoint':<30} {'reqs':>7} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'err%':>7}"
+        self.stdout.write("")
+        self.stdout.write(header)
+        self.stdout.write("-" * len(header))
+        for role, r in report["roles"].items():
+            self._row(role, r)
+            for name, e in r["endpoints"].items():
+                self._row(f"  {name}", e)
+        self.stdout.write("-" * len(header))
+        for name, e in report["endpoints"].items():
+            self._row(name, e)
+        self.stdout.write("-" * len(header))
+        self.stdout.write(
+            f"Total {report['requests']} requests in {report['duration_s']}s "
+            f"({report['throughput_rps']} req/s), error rate {report['error_rate'] * 100:.2f}%, "
+            f"SQLite lock errors: {report['sqlite_lock_errors']}"
+        )
+        self.stdout.write(f"Server log: {report['server_log']}")
@@ -0,0 +1,41 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.changelists import refresh_estimate
+from core.models import Notification
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete read notifications older than the retention period, in small "
+        "batches so web requests can write in between."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int,
+            default=getattr(settings, "QMS_NOTIFICATION_RETENTION_DAYS", 90),
+            help="Keep read notifications newer than this many days.",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        # Unread rows are never pruned, so unread counters stay valid.
+        expired = Notification.objects.filter(is_read=True, created_at__lt=cutoff)
+
+        deleted = 0
+        while True:
+            ids = list(expired.order_by().values_list("pk", flat=True)[:options["batch_size"]])
+            if not ids:
+                break
+            deleted += Notification.objects.filter(pk__in=ids).delete()[0]
+
+        if deleted:
+            # The admin shows the planner's row estimate for big tables
+            refresh_estimate(Notification)
+
+        self.stdout.write(f"Pruned {deleted} read notification(s) older than {cutoff:%Y-%m-%d}.")
@@ -0,0 +1,66 @@
+import json
+import os
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+
+from core.routers import analytics_alias, marker_path
+
+
+class Command(BaseCommand):
+    help = (
+        "Refresh the analytics read replica from the primary SQLite database "
+        "using the online backup API."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, default=0,
+                            help="Keep refreshing every N seconds (0 = once).")
+        parser.add_argument("--pages", type=int, default=4096,
+                            help="Pages copied per backup step (lets writers in between).")
+
+    def handle(self, *args, **options):
+        alias = analytics_alias()
+        if alias is None:
+            raise CommandError("QMS_ANALYTICS_DB is not configured.")
+
+        source = str(settings.DATABASES[DEFAULT_DB_ALIAS]["NAME"])
+        target = str(settings.DATABASES[alias]["NAME"])
+
+        while True:
+            started = time.monotonic()
+            self.refresh(source, target, alias, options["pages"])
+            self.stdout.write(
+                f"Replica {target} refreshed in {time.monotonic() - started:.1f}s"
+            )
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
+
+    def refresh(self, source, target, alias, pages):
+        snapshot_at = timezone.now()
+        tmp_path = f"{target}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+        src = sqlite3.connect(source)
+        dst = sqlite3.connect(tmp_path)
+        try:
+            src.backup(dst, pages=pages)
+            # Standalone file: no -wal/-shm to carry around
+            dst.execute("PRAGMA journal_mode = DELETE")
+        finally:
+            dst.close()
+            src.close()
+
+        # New connections see the new file; open ones keep the old inode.
+        os.replace(tmp_path, target)
+
+        marker = marker_path(alias)
+        with open(f"{marker}.tmp", "w") as fh:
+            json.dump({"snapshot_at": snapshot_at.isoformat()}, fh)
+        os.replace(f"{marker}.tmp", marker)
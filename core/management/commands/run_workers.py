@@ -0,0 +1,69 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.jobs import noop, task_path
+from core.models import Job
+from core.workers import WorkerOptions, WorkerPool
+
+
+class Command(BaseCommand):
+    help = (
+        "Run background job workers (database-backed queue). Stop with "
+        "SIGTERM/Ctrl-C; running jobs are finished first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int,
+                            default=getattr(settings, "QMS_JOB_WORKERS", 2))
+        parser.add_argument("--batch", type=int, default=10,
+                            help="Jobs claimed per round trip.")
+        parser.add_argument("--lease", type=float,
+                            default=getattr(settings, "QMS_JOB_LEASE_SECONDS", 60),
+                            help="Lease length in seconds (extended while a job runs).")
+        parser.add_argument("--poll", type=float, default=1.0,
+                            help="Seconds to sleep when the queue is empty.")
+        parser.add_argument("--grace", type=float, default=30,
+                            help="Seconds to wait for running jobs on shutdown.")
+        parser.add_argument("--burst", action="store_true",
+                            help="Exit once the queue is empty.")
+        parser.add_argument("--benchmark", type=int, default=0, metavar="N",
+                            help="Queue N no-op jobs, drain them in burst mode and "
+                                 "report jobs/second.")
+
+    def handle(self, *args, **options):
+        burst = options["burst"] or bool(options["benchmark"])
+        pool = WorkerPool(
+            processes=options["processes"],
+            options=WorkerOptions(
+                batch=options["batch"],
+                lease=options["lease"],
+                poll=options["poll"],
+                burst=burst,
+            ),
+            grace=options["grace"],
+            log=self.stdout.write,
+        )
+
+        if not options["benchmark"]:
+            done = pool.run()
+            self.stdout.write(f"Workers stopped after {done} job(s).")
+            return
+
+        total = options["benchmark"]
+        now = timezone.now()
+        Job.objects.bulk_create(
+            [Job(task=task_path(noop), run_after=now) for _ in range(total)],
+            batch_size=1000,
+        )
+
+        started = time.perf_counter()
+        done = pool.run()
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{done} job(s) in {elapsed:.2f}s with {options['processes']} process(es), "
+            f"batch {options['batch']}: {done / elapsed:.0f} jobs/s"
+        ))
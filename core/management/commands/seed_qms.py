@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import User
+from core.seeding import QMSSeeder, SEED_PREFIX
+
+
+class Command(BaseCommand):
+    help = "Bulk-generate a large, reproducible QMS dataset for scale testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--departments", type=int, default=20)
+        parser.add_argument("--users", type=int, default=5000)
+        parser.add_argument("--documents", type=int, default=20000)
+        parser.add_argument("--activities", type=int, default=2000000)
+        parser.add_argument("--notifications", type=int, default=1000000)
+        parser.add_argument("--days", type=int, default=365,
+                            help="Spread activity over the last N days.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--password", default="qms-seed",
+                            help="Password set on every generated user.")
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username__startswith=f"{SEED_PREFIX}_user_").exists():
+            raise CommandError(
+                "Seed data already exists in this database. Use a fresh database."
+            )
+
+        seeder = QMSSeeder(
+            seed=options["seed"],
+            batch_size=options["batch_size"],
+            days=options["days"],
+            password=options["password"],
+            log=self.stdout.write,
+        )
+
+        started = time.monotonic()
+        totals = seeder.run(
+            departments=options["departments"],
+            users=options["users"],
+            documents=options["documents"],
+            activities=options["activities"],
+            notifications=options["notifications"],
+        )
+        elapsed = time.monotonic() - started
+
+        summary = ", ".join(f"{name}={count}" for name, count in totals.items())
+        self.stdout.write(self.style.SUCCESS(f"Seeded {summary} in {elapsed:.1f}s"))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from core.digests import send_digests
+
+
+class Command(BaseCommand):
+    help = (
+        "Email each user one digest of their unread notifications for the "
+        "current period. Safe to re-run: a finished period is skipped and an "
+        "interrupted one resumes where it stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None,
+                            help="Users per batch / email connection.")
+
+    def handle(self, *args, **options):
+        run = send_digests(batch_size=options["batch_size"], log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(str(run)))
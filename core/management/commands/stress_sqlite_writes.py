@@ -0,0 +1,156 @@
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.sqlite import DEFAULT_PRAGMAS, apply_pragmas, backoff_delays, is_lock_error
+
+
+SCHEMA = """
+CREATE TABLE activity (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    document_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    action VARCHAR(30) NOT NULL,
+    timestamp DATETIME NOT NULL
+);
+CREATE INDEX activity_action_ts ON activity (action, timestamp);
+"""
+
+
+def _connect(path, tuned):
+    if tuned:
+        conn = sqlite3.connect(path, timeout=0, isolation_level=None)
+        apply_pragmas(conn.cursor(), getattr(settings, "QMS_SQLITE_PRAGMAS", DEFAULT_PRAGMAS))
+    else:
+        # Django defaults: rollback journal, 5s busy timeout, no retries.
+        conn = sqlite3.connect(path, timeout=5, isolation_level=None)
+    return conn
+
+
+def _writer(path, tuned, seconds, worker_id, results):
+    conn = _connect(path, tuned)
+    writes = errors = 0
+    lock_wait = 0.0
+    deadline = time.monotonic() + seconds
+    retries = getattr(settings, "QMS_SQLITE_WRITE_RETRIES", 5)
+    base_delay = getattr(settings, "QMS_SQLITE_RETRY_BASE_DELAY", 0.05)
+
+    while time.monotonic() < deadline:
+        delays = backoff_delays(retries if tuned else 0, base_delay)
+        while True:
+            start = time.perf_counter()
+            try:
+                conn.execute(
+                    "INSERT INTO activity (document_id, user_id, action, timestamp) "
+                    "VALUES (?, ?, 'view', datetime('now'))",
+                    (writes % 500, worker_id),
+                )
+                writes += 1
+                break
+            except sqlite3.OperationalError as exc:
+                lock_wait += time.perf_counter() - start
+                delay = next(delays, None) if is_lock_error(exc) else None
+                if delay is None:
+                    errors += 1
+                    break
+                time.sleep(delay)
+                lock_wait += delay
+
+    results.put(("writer", writes, errors, lock_wait))
+
+
+def _reader(path, tuned, seconds, results):
+    conn = _connect(path, tuned)
+    reads = errors = 0
+    deadline = time.monotonic() + seconds
+
+    while time.monotonic() < deadline:
+        try:
+            # Dashboard-style aggregate holding a shared lock for a while
+            conn.execute(
+                "SELECT action, COUNT(*) FROM activity GROUP BY action"
+            ).fetchall()
+            reads += 1
+        except sqlite3.OperationalError:
+            errors += 1
+
+    results.put(("reader", reads, errors, 0.0))
+
+
+class Command(BaseCommand):
+    help = (
+        "Stress concurrent SQLite writes from several processes, first with "
+        "Django's default SQLite setup and then with QMS_SQLITE_PRAGMAS + "
+        "retries, and print the write throughput of both."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, default=8)
+        parser.add_argument("--readers", type=int, default=2)
+        parser.add_argument("--seconds", type=float, default=10)
+        parser.add_argument("--seed-rows", type=int, default=200000,
+                            help="Rows present before the run (makes reads non-trivial).")
+
+    def _run(self, tuned, options):
+        fd, path = tempfile.mkstemp(prefix="qms-stress-", suffix=".sqlite3")
+        os.close(fd)
+        try:
+            conn = _connect(path, tuned)
+            conn.executescript(SCHEMA)
+            conn.execute("BEGIN")
+            conn.executemany(
+                "INSERT INTO activity (document_id, user_id, action, timestamp) "
+                "VALUES (?, ?, 'view', datetime('now'))",
+                ((i % 500, i % 50) for i in range(options["seed_rows"])),
+            )
+            conn.execute("COMMIT")
+            conn.close()
+
+            results = multiprocessing.Queue()
+            processes = [
+                multiprocessing.Process(target=_writer, args=(path, tuned, options["seconds"], i, results))
+                for i in range(options["writers"])
+            ] + [
+                multiprocessing.Process(target=_reader, args=(path, tuned, options["seconds"], results))
+                for _ in range(options["readers"])
+            ]
+            for process in processes:
+                process.start()
+            collected = [results.get() for _ in processes]
+            for process in processes:
+                process.join()
+        finally:
+            for suffix in ("", "-wal", "-shm", "-journal"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+        writes = sum(r[1] for r in collected if r[0] == "writer")
+        return {
+            "writes": writes,
+            "writes_per_s": writes / options["seconds"],
+            "write_errors": sum(r[2] for r in collected if r[0] == "writer"),
+            "lock_wait_s": sum(r[3] for r in collected),
+            "reads": sum(r[1] for r in collected if r[0] == "reader"),
+            "read_errors": sum(r[2] for r in collected if r[0] == "reader"),
+        }
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{options['writers']} writer / {options['readers']} reader processes, "
+            f"{options['seconds']:.0f}s per mode\n"
+        )
+        header = f"{'mode':<10} {'writes/s':>10} {'write err':>10} {'lock wait s':>12} {'reads':>8} {'read err':>9}"
+        self.stdout.write(header)
+        self.stdout.write("-" * len(header))
+
+        for label, tuned in (("default", False), ("tuned", True)):
+            r = self._run(tuned, options)
+            self.stdout.write(
+                f"{label:<10} {r['writes_per_s']:>10.1f} {r['write_errors']:>10} "
+                f"{r['lock_wait_s']:>12.2f} {r['reads']:>8} {r['read_errors']:>9}"
+            )
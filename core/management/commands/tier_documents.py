@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+
+from core.tiering import footprint, tier_archived
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the PDFs of long-archived documents to compressed cold storage. "
+        "They are restored automatically the next time they are opened."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=None,
+                            help="Only documents archived (last updated) more than this many days ago.")
+        parser.add_argument("--batch-size", type=int, default=None,
+                            help="Files per manifest write.")
+        parser.add_argument("--dry-run", action="store_true", help="List the files without moving them.")
+        parser.add_argument("--report", action="store_true", help="Only print the storage footprint.")
+
+    def handle(self, *args, **options):
+        if not options["report"]:
+            moved, saved = tier_archived(
+                older_than_days=options["days"], dry_run=options["dry_run"],
+                batch_size=options["batch_size"], log=self.stdout.write,
+            )
+            verb = "Would tier" if options["dry_run"] else "Tiered"
+            self.stdout.write(self.style.SUCCESS(f"{verb} {moved} file(s), saving {filesizeformat(saved)}."))
+
+        usage = footprint()
+        self.stdout.write(
+            f"Hot storage:  {usage['hot_files']} file(s), {filesizeformat(usage['hot_bytes'])}\n"
+            f"Cold storage: {usage['cold_files']} file(s), {filesizeformat(usage['cold_stored_bytes'])} "
+            f"({filesizeformat(usage['cold_original_bytes'])} uncompressed)\n"
+            f"Saved by compression: {filesizeformat(usage['saved_bytes'])}"
+        )
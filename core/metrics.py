@@ -0,0 +1,253 @@
+"""
+Prometheus-style request metrics.
+
+Each worker process aggregates its own counters in memory. When
+``QMS_METRICS_DIR`` is set, every process periodically dumps a snapshot
+to ``<dir>/metrics-<pid>.json`` and the ``/metrics/`` endpoint merges all
+snapshots, so the numbers stay correct behind a multi-process server.
+Snapshots of processes that no longer exist (restarted or recycled
+workers) are deleted when the endpoint reads them.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+
+# =========================================================
+# Defaults
+# =========================================================
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (1024, 10240, 102400, 512000, 1048576, 5242880, 10485760)
+
+HISTOGRAMS = {
+    "qms_http_request_duration_seconds": ("Request latency per view.", LATENCY_BUCKETS),
+    "qms_db_queries_per_request": ("Database queries executed per request.", QUERY_COUNT_BUCKETS),
+    "qms_http_response_size_bytes": ("Response body size per view.", SIZE_BUCKETS),
+}
+
+COUNTERS = {
+    "qms_http_requests_total": "Requests per view, method and status code.",
+    "qms_db_query_duration_seconds_total": "Time spent in database queries per view.",
+    "qms_sqlite_lock_wait_seconds_total": "Time spent waiting for the SQLite write lock.",
+    "qms_sqlite_lock_retries_total": "Statements retried after 'database is locked'.",
+    "qms_sqlite_lock_failures_total": "Statements that stayed locked after all retries.",
+}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# =========================================================
+# Registry
+# =========================================================
+class MetricsRegistry:
+    """
+    Thread-safe in-process store for counters and histograms.
+
+    Series are keyed by ``(metric_name, labels)`` where ``labels`` is a
+    sorted tuple of ``(name, value)`` pairs.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._counters = {}
+        self._histograms = {}
+        self._last_flush = 0.0
+
+    def _check_fork(self):
+        # A forked worker inherits the parent's numbers; start clean.
+        if self._pid != os.getpid():
+            self._reset()
+
+    def inc(self, name, labels, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._check_fork()
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        _help, buckets = HISTOGRAMS[name]
+        key = (name, tuple(sorted(labels.items())))
+
+        with self._lock:
+            self._check_fork()
+            series = self._histograms.get(key)
+            if series is None:
+                series = {"buckets": [0] * (len(buckets) + 1), "sum": 0.0, "count": 0}
+                self._histograms[key] = series
+            series["buckets"][bisect_left(buckets, value)] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            self._check_fork()
+            return {
+                "counters": [
+                    [name, list(map(list, labels)), value]
+                    for (name, labels), value in self._counters.items()
+                ],
+                "histograms": [
+                    [name, list(map(list, labels)), dict(series, buckets=list(series["buckets"]))]
+                    for (name, labels), series in self._histograms.items()
+                ],
+            }
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    # =====================================================
+    # Multi-process support
+    # =====================================================
+    def maybe_flush(self, force=False):
+        """
+        Persist this process' snapshot if ``QMS_METRICS_DIR`` is configured
+        and the flush interval has elapsed.
+        """
+        directory = _setting("QMS_METRICS_DIR", None)
+        if not directory:
+            return
+
+        now = time.monotonic()
+        interval = _setting("QMS_METRICS_FLUSH_INTERVAL", 5)
+        if not force and now - self._last_flush < interval:
+            return
+        self._last_flush = now
+
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".metrics-", suffix=".tmp")
+        with os.fdopen(fd, "w") as fh:
+            json.dump(self.snapshot(), fh)
+        # Atomic rename: readers never see a half-written file.
+        os.replace(tmp_path, os.path.join(directory, f"metrics-{os.getpid()}.json"))
+
+
+registry = MetricsRegistry()
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # exists, owned by another user
+        return True
+    return True
+
+
+# =========================================================
+# Aggregation + Exposition
+# =========================================================
+def collect():
+    """
+    Merge the live snapshot of this process with the snapshots written by
+    every other worker process.
+    """
+    snapshots = [registry.snapshot()]
+
+    directory = _setting("QMS_METRICS_DIR", None)
+    if directory and os.path.isdir(directory):
+        own_file = f"metrics-{os.getpid()}.json"
+        for filename in os.listdir(directory):
+            if not filename.startswith("metrics-") or filename == own_file:
+                continue
+            path = os.path.join(directory, filename)
+            pid = filename[len("metrics-"):-len(".json")]
+            if pid.isdigit() and not _pid_alive(int(pid)):
+                # A dead worker's counters would be added forever
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            try:
+                with open(path) as fh:
+                    snapshots.append(json.load(fh))
+            except (OSError, ValueError):
+                continue
+
+    counters = {}
+    histograms = {}
+
+    for snap in snapshots:
+        for name, labels, value in snap.get("counters", []):
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+
+        for name, labels, series in snap.get("histograms", []):
+            key = (name, tuple(map(tuple, labels)))
+            merged = histograms.get(key)
+            if merged is None or len(merged["buckets"]) != len(series["buckets"]):
+                histograms[key] = dict(series, buckets=list(series["buckets"]))
+                continue
+            merged["buckets"] = [a + b for a, b in zip(merged["buckets"], series["buckets"])]
+            merged["sum"] += series["sum"]
+            merged["count"] += series["count"]
+
+    return counters, histograms
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_number(value):
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+def render_text():
+    """
+    Render all metrics in the Prometheus text exposition format (0.0.4).
+    """
+    counters, histograms = collect()
+    lines = []
+
+    for name, help_text in COUNTERS.items():
+        series = sorted((k[1], v) for k, v in counters.items() if k[0] == name)
+        if not series:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for labels, value in series:
+            lines.append(f"{name}{_format_labels(labels)} {_format_number(value)}")
+
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        series = sorted((k[1], v) for k, v in histograms.items() if k[0] == name)
+        if not series:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for labels, data in series:
+            cumulative = 0
+            for bound, count in zip(list(buckets) + ["+Inf"], data["buckets"]):
+                cumulative += count
+                le = bound if bound == "+Inf" else _format_number(bound)
+                lines.append(
+                    f"{name}_bucket{_format_labels(labels, [('le', le)])} {cumulative}"
+                )
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_number(data['sum'])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {data['count']}")
+
+    return "\n".join(lines) + "\n"
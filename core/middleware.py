@@ -0,0 +1,304 @@
+import atexit
+import mimetypes
+import os
+import re
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import connections
+from django.http import FileResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+from .metrics import registry
+from .slow_queries import record_slow_queries
+from .staticfiles import VARIANT_SUFFIX, encodings
+
+
+# =========================================================
+# Request Metrics
+# =========================================================
+class MetricsMiddleware:
+    """
+    Record latency, DB query count/time and response size per URL name.
+
+    Keep it ahead of the session and auth middleware so their queries are
+    attributed to the view as well.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        atexit.register(registry.maybe_flush, force=True)
+
+    def __call__(self, request):
+        db_stats = {"queries": 0, "time": 0.0}
+
+        def record_query(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                db_stats["queries"] += 1
+                db_stats["time"] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(record_query))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        self._record(request, response, duration, db_stats)
+        return response
+
+    @staticmethod
+    def _view_name(request):
+        match = getattr(request, "resolver_match", None)
+        if match is None:
+            return "<unresolved>"
+        return match.view_name or "<unnamed>"
+
+    @staticmethod
+    def _response_size(response):
+        length = response.get("Content-Length")
+        if length and length.isdigit():
+            return int(length)
+        if getattr(response, "streaming", False):
+            return None
+        return len(response.content)
+
+    def _record(self, request, response, duration, db_stats):
+        view = self._view_name(request)
+        labels = {"view": view}
+
+        registry.inc("qms_http_requests_total", {
+            "view": view,
+            "method": request.method,
+            "status": str(response.status_code),
+        })
+        registry.observe("qms_http_request_duration_seconds", labels, duration)
+        registry.observe("qms_db_queries_per_request", labels, db_stats["queries"])
+        registry.inc("qms_db_query_duration_seconds_total", labels, db_stats["time"])
+
+        size = self._response_size(response)
+        if size is not None:
+            registry.observe("qms_http_response_size_bytes", labels, size)
+
+        registry.maybe_flush()
+
+
+# =========================================================
+# Slow Query Log
+# =========================================================
+class SlowQueryMiddleware:
+    """
+    Log the request's slow queries with their URL name and call site
+    (``core.slow_queries``).
+
+    Keep it first in ``MIDDLEWARE``: it writes the log after the response
+    is built, and only outer middleware would count those writes.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with record_slow_queries(lambda: MetricsMiddleware._view_name(request)):
+            return self.get_response(request)
+
+
+# =========================================================
+# Throttled Session Persistence
+# =========================================================
+class ThrottledSessionMiddleware(SessionMiddleware):
+    """
+    Drop-in replacement for ``SessionMiddleware`` with sliding expiry but
+    without a write per request.
+
+    The session is saved (and its cookie re-issued) only when its data
+    changed or when the last save is older than
+    ``QMS_SESSION_REFRESH_FRACTION`` of the expiry age. Keep
+    ``SESSION_SAVE_EVERY_REQUEST = False`` with this middleware.
+    """
+
+    REFRESHED_KEY = "_qms_refreshed_at"
+
+    def process_response(self, request, response):
+        session = getattr(request, "session", None)
+
+        if session is not None and session.accessed and not session.is_empty():
+            now = int(time.time())
+            fraction = getattr(settings, "QMS_SESSION_REFRESH_FRACTION", 0.1)
+            refreshed_at = session.get(self.REFRESHED_KEY, 0)
+
+            if session.modified or now - refreshed_at >= session.get_expiry_age() * fraction:
+                # Marks the session modified -> saved + cookie re-issued below
+                session[self.REFRESHED_KEY] = now
+
+        return super().process_response(request, response)
+
+
+# =========================================================
+# Response Compression (Brotli / gzip)
+# =========================================================
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "image/svg+xml")
+
+_accept_re = re.compile(r"\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?")
+
+
+def negotiate_encoding(accept_encoding, available):
+    """Best of ``available`` (in preference order) for an Accept-Encoding header."""
+    weights = {}
+    for item in accept_encoding.split(","):
+        match = _accept_re.match(item)
+        if match:
+            try:
+                weights[match[1].lower()] = float(match[2]) if match[2] else 1.0
+            except ValueError:
+                continue
+
+    best, best_q = None, 0.0
+    for coding in available:
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class CompressionMiddleware:
+    """
+    Compress text and JSON responses larger than ``QMS_COMPRESS_MIN_BYTES``
+    with Brotli when the ``brotli`` package is installed and the client
+    accepts it, else gzip. Like Django's ``GZipMiddleware``:
+    - strong ETags become weak, so conditional requests still match
+    - gzip output is padded randomly against BREACH
+
+    Place it right after ``MetricsMiddleware`` so the metrics record
+    the bytes actually sent.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if (
+            response.streaming
+            or response.status_code != 200
+            or response.has_header("Content-Encoding")
+            or not response.get("Content-Type", "").startswith(COMPRESSIBLE_TYPES)
+            or len(response.content) < getattr(settings, "QMS_COMPRESS_MIN_BYTES", 1024)
+        ):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        available = ("br", "gzip") if brotli is not None else ("gzip",)
+        coding = negotiate_encoding(request.headers.get("Accept-Encoding", ""), available)
+        if coding is None:
+            return response
+
+        if coding == "br":
+            content = brotli.compress(
+                response.content, quality=getattr(settings, "QMS_BROTLI_QUALITY", 5)
+            )
+        else:
+            content = compress_string(response.content, max_random_bytes=100)
+        if len(content) >= len(response.content):
+            return response
+
+        response.content = content
+        response["Content-Length"] = str(len(content))
+        response["Content-Encoding"] = coding
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        return response
+
+
+# =========================================================
+# Static Files (precompressed, fingerprinted)
+# =========================================================
+HASHED_NAME_RE = re.compile(r"\.[0-9a-f]{12}\.[\w]+$")
+
+
+class StaticAssetMiddleware:
+    """
+    Serve ``STATIC_URL`` from ``STATIC_ROOT`` (see ``core.staticfiles``)
+    without going through sessions, auth or the URLconf.
+    - The ``.br``/``.gz`` variant is chosen from ``Accept-Encoding``.
+    - Fingerprinted names (``name.<hash>.ext``) never change:
+      ``public, max-age=1 year, immutable``.
+    - Plain names (pdf.js loads its own files that way) are cached for
+      ``QMS_STATIC_MAX_AGE`` seconds, then revalidated with
+      ``Last-Modified``/``ETag``.
+
+    Paths not in ``STATIC_ROOT`` fall through (``runserver`` serves them
+    from the finders in development). Place it right after
+    ``SecurityMiddleware``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        static_url = settings.STATIC_URL or ""
+        if (
+            request.method not in ("GET", "HEAD")
+            or not static_url.startswith("/")
+            or not request.path_info.startswith(static_url)
+            or not settings.STATIC_ROOT
+        ):
+            return self.get_response(request)
+
+        name = request.path_info[len(static_url):]
+        try:
+            path = safe_join(settings.STATIC_ROOT, name)
+        except SuspiciousFileOperation:
+            return self.get_response(request)
+        if not os.path.isfile(path):
+            return self.get_response(request)
+        return self._serve(request, name, path)
+
+    @staticmethod
+    def _serve(request, name, path):
+        available = [coding for coding in encodings() if os.path.isfile(path + VARIANT_SUFFIX[coding])]
+        coding = negotiate_encoding(request.headers.get("Accept-Encoding", ""), available)
+        served = path + VARIANT_SUFFIX[coding] if coding else path
+
+        stat = os.stat(served)
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        last_modified = int(stat.st_mtime)
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            content_type, _encoding = mimetypes.guess_type(name)
+            response = FileResponse(
+                open(served, "rb"), content_type=content_type or "application/octet-stream"
+            )
+            if coding:
+                response["Content-Encoding"] = coding
+            # FileResponse names the file; a static asset is not a download
+            del response["Content-Disposition"]
+
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        if available:
+            patch_vary_headers(response, ("Accept-Encoding",))
+        if HASHED_NAME_RE.search(name):
+            patch_cache_control(response, public=True, max_age=31536000, immutable=True)
+        else:
+            patch_cache_control(
+                response, public=True, max_age=getattr(settings, "QMS_STATIC_MAX_AGE", 300)
+            )
+        return response
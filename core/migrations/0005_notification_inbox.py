@@ -0,0 +1,45 @@
+# Generated by Django 6.0.2 on 2026-10-19 10:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_counters(apps, schema_editor):
+    Notification = apps.get_model("core", "Notification")
+    NotificationCounter = apps.get_model("core", "NotificationCounter")
+
+    unread = (
+        Notification.objects.filter(is_read=False)
+        .values("recipient_id")
+        .annotate(total=models.Count("id"))
+    )
+    NotificationCounter.objects.bulk_create(
+        [NotificationCounter(user_id=row["recipient_id"], unread=row["total"]) for row in unread],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('core', '0004_notification_event_key'),
+        ('documents', '0006_query_plan_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='notification_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('unread', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient', 'created_at'], name='notif_recipient_created_idx'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
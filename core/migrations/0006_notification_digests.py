@@ -0,0 +1,40 @@
+# Generated by Django 6.0.2 on 2026-10-19 10:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_notification_inbox'),
+        ('documents', '0006_query_plan_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DigestRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateTimeField(unique=True)),
+                ('cutoff', models.DateTimeField()),
+                ('last_user_id', models.BigIntegerField(default=0)),
+                ('emails_sent', models.PositiveIntegerField(default=0)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-period_start'],
+            },
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='digested_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('digested_at__isnull', True), ('is_read', False)), fields=['recipient', 'created_at'], name='notif_digest_pending_idx'),
+        ),
+    ]
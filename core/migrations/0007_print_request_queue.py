@@ -0,0 +1,34 @@
+# Generated by Django 6.0.2 on 2026-10-19 10:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_notification_digests'),
+        ('documents', '0006_query_plan_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='printrequest',
+            name='package',
+            field=models.FileField(blank=True, upload_to='print_packages/'),
+        ),
+        migrations.AddField(
+            model_name='printrequest',
+            name='package_error',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='printrequest',
+            index=models.Index(fields=['status', 'created_at'], name='printreq_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='printrequest',
+            index=models.Index(fields=['user', 'created_at'], name='printreq_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 6.0.2 on 2026-10-19 10:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_job_queue'),
+        ('documents', '0006_query_plan_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('source', models.CharField(max_length=500)),
+                ('manifest', models.CharField(blank=True, max_length=500)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('imported', models.PositiveIntegerField(default=0)),
+                ('skipped', models.PositiveIntegerField(default=0)),
+                ('failed', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='document_imports', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ImportedFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=500)),
+                ('outcome', models.CharField(choices=[('imported', 'Imported'), ('duplicate', 'Duplicate'), ('failed', 'Failed')], max_length=10)),
+                ('sha256', models.CharField(blank=True, max_length=64)),
+                ('error', models.CharField(blank=True, max_length=255)),
+                ('document', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='import_records', to='documents.document')),
+                ('document_import', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='files', to='core.documentimport')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['sha256', 'outcome'], name='importedfile_sha_idx')],
+                'constraints': [models.UniqueConstraint(fields=('document_import', 'path'), name='importedfile_import_path_uniq')],
+            },
+        ),
+    ]
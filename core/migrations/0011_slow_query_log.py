@@ -0,0 +1,32 @@
+# Generated by Django 6.0.2 on 2026-10-19 10:59
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_data_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(db_index=True, max_length=16)),
+                ('sql', models.TextField()),
+                ('params_shape', models.CharField(blank=True, max_length=255)),
+                ('duration_ms', models.FloatField()),
+                ('database', models.CharField(max_length=50)),
+                ('view', models.CharField(blank=True, db_index=True, max_length=200)),
+                ('call_site', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name_plural': 'slow queries',
+                'ordering': ['-id'],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.0.2 on 2026-10-19 11:12
+
+import os
+
+import core.storage
+from django.conf import settings
+from django.db import migrations, models
+
+
+def move_packages(apps, schema_editor):
+    """Existing packages leave the public MEDIA_ROOT."""
+    PrintRequest = apps.get_model('core', 'PrintRequest')
+    storage = core.storage.private_storage
+
+    for name in PrintRequest.objects.exclude(package='').values_list('package', flat=True).iterator():
+        public = os.path.join(settings.MEDIA_ROOT, name)
+        if os.path.exists(public) and not storage.exists(name):
+            os.makedirs(os.path.dirname(storage.path(name)), exist_ok=True)
+            os.replace(public, storage.path(name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_slow_query_log'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='printrequest',
+            name='package',
+            field=models.FileField(blank=True, storage=core.storage.PrivateStorage(), upload_to='print_packages/'),
+        ),
+        migrations.RunPython(move_packages, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,12 @@
+import os
+
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from documents.models import Document
 
+from .storage import private_storage
+
 
 # =========================================================
 # Notifications
@@ -39,22 +44,101 @@ class Notification(models.Model):
 
     is_read = models.BooleanField(default=False, db_index=True)
 
+    # Identifies the change that produced this row (see core.notifications)
+    event_key = models.CharField(max_length=100, blank=True)
+
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
+    # Set when the notification was included in an email digest
+    digested_at = models.DateTimeField(blank=True, null=True)
+
     class Meta:
         ordering = ["-created_at"]
+        constraints = [
+            # One row per user per event: re-delivered fan-outs collapse
+            models.UniqueConstraint(
+                fields=["recipient", "event_key"],
+                condition=~models.Q(event_key=""),
+                name="notification_unique_event",
+            ),
+        ]
+        indexes = [
+            # Inbox keyset pagination: WHERE recipient=? ORDER BY created_at, id
+            models.Index(
+                fields=["recipient", "created_at"],
+                name="notif_recipient_created_idx",
+            ),
+            # Digest engine: only the (small) pending set is indexed
+            models.Index(
+                fields=["recipient", "created_at"],
+                condition=models.Q(is_read=False, digested_at__isnull=True),
+                name="notif_digest_pending_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"Notify {self.recipient} - {self.type} - {self.document}"
 
 
 # =========================================================
-# Print Request (Future Feature)
+# Unread Counter (header bell)
+# =========================================================
+class NotificationCounter(models.Model):
+    """
+    Denormalized unread count per user, kept in step with ``Notification``
+    by ``core.inbox`` so the bell never runs a COUNT(*).
+    """
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="notification_counter"
+    )
+
+    unread = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user} - {self.unread} unread"
+
+
+# =========================================================
+# Digest Runs
+# =========================================================
+class DigestRun(models.Model):
+    """
+    One email-digest pass per period. ``last_user_id`` is the resume point
+    after a crash; ``cutoff`` keeps a resumed run on the same notifications.
+    """
+
+    period_start = models.DateTimeField(unique=True)
+
+    cutoff = models.DateTimeField()
+
+    last_user_id = models.BigIntegerField(default=0)
+
+    emails_sent = models.PositiveIntegerField(default=0)
+
+    started_at = models.DateTimeField(auto_now_add=True)
+
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ["-period_start"]
+
+    def __str__(self):
+        state = "done" if self.finished_at else "in progress"
+        return f"Digest {self.period_start:%Y-%m-%d %H:%M} - {self.emails_sent} sent ({state})"
+
+
+# =========================================================
+# Print Request
 # =========================================================
 class PrintRequest(models.Model):
     """
-    Future feature:
-    Allow user to request printing a document with approval workflow.
+    User request to print a document, approved or rejected by Quality.
+    Approval pre-renders a controlled-copy PDF (``package``) in the
+    background (see ``core.printing``).
     """
 
     class Status(models.TextChoices):
@@ -95,10 +179,241 @@ class PrintRequest(models.Model):
 
     notes = models.TextField(blank=True)
 
+    # Controlled-copy PDF, ready to download once approved (private: only
+    # print_request_download serves it)
+    package = models.FileField(upload_to="print_packages/", storage=private_storage, blank=True)
+    package_error = models.CharField(max_length=255, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            # Approval queue: WHERE status=? ORDER BY created_at DESC, id DESC
+            models.Index(fields=["status", "created_at"], name="printreq_status_created_idx"),
+            # "My print requests"
+            models.Index(fields=["user", "created_at"], name="printreq_user_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"PrintRequest - {self.user} - {self.document} - {self.status}"
+
+
+# =========================================================
+# Background Jobs
+# =========================================================
+class Job(models.Model):
+    """
+    Database-backed background job (see ``core.jobs`` and
+    ``manage.py run_workers``). ``task`` is the dotted path of a
+    module-level function; ``args``/``kwargs`` must be JSON.
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = "queued", "Queued"
+        RUNNING = "running", "Running"
+        DONE = "done", "Done"
+        FAILED = "failed", "Failed"
+
+    task = models.CharField(max_length=200)
+
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.QUEUED
+    )
+
+    # Higher runs first
+    priority = models.SmallIntegerField(default=0)
+
+    run_after = models.DateTimeField(default=timezone.now)
+
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+
+    # Lease: the worker owns the job until locked_until (extended while running)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_until = models.DateTimeField(blank=True, null=True)
+
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            # Claim: WHERE status='queued' AND run_after<=now ORDER BY priority DESC, run_after
+            models.Index(fields=["status", "-priority", "run_after"], name="job_claim_idx"),
+            # Lease reaper: WHERE status='running' AND locked_until<now
+            models.Index(fields=["status", "locked_until"], name="job_lease_idx"),
+        ]
+
+    def __str__(self):
+        return f"Job #{self.pk} {self.task} ({self.status})"
+
+
+# =========================================================
+# Bulk Document Import
+# =========================================================
+class DocumentImport(models.Model):
+    """
+    One bulk import of a ZIP archive or directory plus its manifest (see
+    ``core.importing``). Progress is journaled per file in ``ImportedFile``,
+    so an interrupted import resumes where it stopped.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        RUNNING = "running", "Running"
+        DONE = "done", "Done"
+        FAILED = "failed", "Failed"
+
+    # sha256 of source path + manifest: the same import resumes, never repeats
+    key = models.CharField(max_length=64, unique=True)
+
+    source = models.CharField(max_length=500)
+    manifest = models.CharField(max_length=500, blank=True)
+
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.PENDING
+    )
+
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name="document_imports"
+    )
+
+    total = models.PositiveIntegerField(default=0)
+    imported = models.PositiveIntegerField(default=0)
+    skipped = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+
+    error = models.TextField(blank=True)
+
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
 
     class Meta:
         ordering = ["-created_at"]
 
+    @property
+    def processed(self):
+        return self.imported + self.skipped + self.failed
+
+    @property
+    def source_name(self):
+        return os.path.basename(self.source.rstrip("/"))
+
+    def __str__(self):
+        return f"Import #{self.pk} {self.source} ({self.status})"
+
+
+class ImportedFile(models.Model):
+    """
+    Journal row: one manifest entry handled by an import, written in the
+    same transaction as its document.
+    """
+
+    class Outcome(models.TextChoices):
+        IMPORTED = "imported", "Imported"
+        DUPLICATE = "duplicate", "Duplicate"
+        FAILED = "failed", "Failed"
+
+    document_import = models.ForeignKey(
+        DocumentImport,
+        on_delete=models.CASCADE,
+        related_name="files"
+    )
+
+    path = models.CharField(max_length=500)
+
+    outcome = models.CharField(max_length=10, choices=Outcome.choices)
+
+    sha256 = models.CharField(max_length=64, blank=True)
+
+    document = models.ForeignKey(
+        Document,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="import_records"
+    )
+
+    error = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["document_import", "path"], name="importedfile_import_path_uniq"
+            ),
+        ]
+        indexes = [
+            # Duplicate check: same content already imported
+            models.Index(fields=["sha256", "outcome"], name="importedfile_sha_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.path} ({self.outcome})"
+
+
+# =========================================================
+# Data Versions (conditional GET validators)
+# =========================================================
+class DataVersion(models.Model):
+    """
+    A counter per data set ("documents", "departments", "users") that is
+    bumped in the same transaction as every change to it. Pages built from
+    those data sets derive their ETag from the counters (``core.versions``).
+    """
+
+    key = models.CharField(max_length=50, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.key} v{self.version}"
+
+
+# =========================================================
+# Slow Query Log
+# =========================================================
+class SlowQuery(models.Model):
+    """
+    One query that took longer than ``QMS_SLOW_QUERY_MS`` (see
+    ``core.slow_queries``). ``fingerprint`` identifies the statement with
+    its literals removed, so repeats of one query group together. Only the
+    newest ``QMS_SLOW_QUERY_MAX_ROWS`` rows are kept.
+    """
+
+    fingerprint = models.CharField(max_length=16, db_index=True)
+
+    sql = models.TextField()
+
+    # Types and sizes of the parameters, never their values
+    params_shape = models.CharField(max_length=255, blank=True)
+
+    duration_ms = models.FloatField()
+
+    database = models.CharField(max_length=50)
+
+    # URL name of the request, or the management command / job
+    view = models.CharField(max_length=200, blank=True, db_index=True)
+
+    # First frame in project code: "core/views.py:120 in quality_center"
+    call_site = models.CharField(max_length=255, blank=True)
+
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        ordering = ["-id"]
+        verbose_name_plural = "slow queries"
+
     def __str__(self):
-        return f"PrintRequest - {self.user} - {self.document} - {self.status}"
\ No newline at end of file
+        return f"{self.duration_ms:.0f} ms - {self.view or '-'} - {self.call_site or '-'}"
@@ -0,0 +1,223 @@
+"""
+Notification fan-out for document changes.
+
+``notify_document_change`` is called from the request; the expensive part
+(``fan_out``) runs in the background and inserts one row per affected user
+with chunked ``bulk_create``. Bulk actions send one ``documents_changed``
+event, handled by ``fan_out_many`` per notification type, over chunks of
+document ids.
+
+Each event has an ``event_key``; the unique ``(recipient, event_key)``
+constraint collapses duplicate deliveries, and only newly delivered rows
+bump the unread counters (``core.inbox``).
+"""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+
+from documents.models import Document
+
+from .background import submit
+from .inbox import add_unread
+from .models import Notification
+
+
+User = get_user_model()
+
+DEFAULT_CHUNK_SIZE = 1000
+# Document ids per background fan-out (bound parameters per IN list)
+DOCUMENT_ID_CHUNK_SIZE = 500
+
+MESSAGES = {
+    Notification.Type.UPDATED: "A new version of '{title}' was published.",
+    Notification.Type.DISABLED: "'{title}' has been disabled.",
+    Notification.Type.REACTIVATED: "'{title}' is available again.",
+}
+
+
+# =========================================================
+# Event Detection
+# =========================================================
+def event_for_change(old_status, new_status, file_changed):
+    """
+    Map a document edit to a notification type (or ``None``).
+    """
+    if new_status == Document.Status.DISABLED and old_status != Document.Status.DISABLED:
+        return Notification.Type.DISABLED
+
+    if new_status == Document.Status.ACTIVE and old_status != Document.Status.ACTIVE:
+        return Notification.Type.REACTIVATED
+
+    if file_changed and new_status == Document.Status.ACTIVE:
+        return Notification.Type.UPDATED
+
+    return None
+
+
+def event_key_for(document, notification_type):
+    """Stable id of one change event (same edit -> same key)."""
+    return f"{document.pk}:{notification_type}:{document.updated_at.timestamp():.6f}"
+
+
+# =========================================================
+# Recipients
+# =========================================================
+def recipient_ids(document_id, department_id, exclude_user_id=None):
+    """
+    Active explicit readers plus everyone in the document's department
+    (employees and its managers), each user once.
+    """
+    readers = Document.readers.through.objects.filter(
+        document_id=document_id
+    ).values("user_id")
+
+    users = User.objects.filter(is_active=True).filter(
+        Q(department_id=department_id) | Q(pk__in=readers)
+    )
+    if exclude_user_id:
+        users = users.exclude(pk=exclude_user_id)
+
+    return users.order_by("pk").values_list("pk", flat=True)
+
+
+# =========================================================
+# Fan-out
+# =========================================================
+def fan_out(document_id, notification_type, event_key, message, exclude_user_id=None):
+    """
+    Insert one notification per recipient, in chunks. Safe to re-run for
+    the same ``event_key``.
+    """
+    document = Document.objects.only("id", "department_id").get(pk=document_id)
+    chunk_size = getattr(settings, "QMS_NOTIFICATION_CHUNK_SIZE", DEFAULT_CHUNK_SIZE)
+
+    recipients = recipient_ids(document.pk, document.department_id, exclude_user_id)
+
+    delivered = 0
+    chunk = []
+    for user_id in recipients.iterator(chunk_size):
+        chunk.append(Notification(
+            recipient_id=user_id,
+            document_id=document.pk,
+            type=notification_type,
+            message=message,
+            event_key=event_key,
+        ))
+        if len(chunk) >= chunk_size:
+            delivered += _insert_chunk(chunk)
+            chunk = []
+    if chunk:
+        delivered += _insert_chunk(chunk)
+
+    return delivered
+
+
+def fan_out_many(document_ids, notification_type, exclude_user_id=None):
+    """
+    ``fan_out`` for a set of documents changed together (bulk actions):
+    recipients of all of them are loaded in two queries and the rows are
+    inserted in shared chunks.
+    """
+    documents = list(
+        Document.objects.filter(pk__in=document_ids)
+        .only("id", "title", "department_id", "disabled_reason", "updated_at")
+        .order_by("pk")
+    )
+    chunk_size = getattr(settings, "QMS_NOTIFICATION_CHUNK_SIZE", DEFAULT_CHUNK_SIZE)
+
+    members = {}
+    for user_id, department_id in User.objects.filter(
+        is_active=True, department_id__in={d.department_id for d in documents}
+    ).values_list("pk", "department_id"):
+        members.setdefault(department_id, set()).add(user_id)
+
+    readers = {}
+    for document_id, user_id in Document.readers.through.objects.filter(
+        document_id__in=[d.pk for d in documents], user__is_active=True
+    ).values_list("document_id", "user_id"):
+        readers.setdefault(document_id, set()).add(user_id)
+
+    delivered = 0
+    chunk = []
+    for document in documents:
+        event_key = event_key_for(document, notification_type)
+        message = message_for(document, notification_type)
+        recipients = members.get(document.department_id, set()) | readers.get(document.pk, set())
+        recipients.discard(exclude_user_id)
+
+        for user_id in sorted(recipients):
+            chunk.append(Notification(
+                recipient_id=user_id,
+                document_id=document.pk,
+                type=notification_type,
+                message=message,
+                event_key=event_key,
+            ))
+            if len(chunk) >= chunk_size:
+                delivered += _insert_chunk(chunk)
+                chunk = []
+    if chunk:
+        delivered += _insert_chunk(chunk)
+
+    return delivered
+
+
+def _insert_chunk(notifications):
+    with transaction.atomic():
+        # Writes are serialized (BEGIN IMMEDIATE), so this check is exact
+        already = set(
+            Notification.objects.filter(
+                event_key__in={n.event_key for n in notifications},
+                recipient_id__in={n.recipient_id for n in notifications},
+            ).values_list("recipient_id", "event_key")
+        )
+        new = [n for n in notifications if (n.recipient_id, n.event_key) not in already]
+
+        Notification.objects.bulk_create(new, ignore_conflicts=True)
+        add_unread([n.recipient_id for n in new])
+    return len(new)
+
+
+def message_for(document, notification_type):
+    message = MESSAGES[notification_type].format(title=document.title)[:255]
+    if notification_type == Notification.Type.DISABLED and document.disabled_reason:
+        message = f"{message} Reason: {document.disabled_reason}"[:255]
+    return message
+
+
+def notify_document_change(document, notification_type, actor=None):
+    """
+    Schedule the fan-out for ``document`` after the current transaction
+    commits. Returns immediately.
+    """
+    submit(
+        fan_out,
+        document.pk,
+        notification_type,
+        event_key_for(document, notification_type),
+        message_for(document, notification_type),
+        exclude_user_id=getattr(actor, "pk", None),
+    )
+
+
+def notify_documents_changed(sender, document_ids, change, actor=None, **kwargs):
+    """
+    ``documents_changed`` receiver: background fan-outs per notification
+    type, ``DOCUMENT_ID_CHUNK_SIZE`` documents each.
+    """
+    if change != "status":
+        return
+
+    by_type = {}
+    for document_id, old_status in kwargs["old_statuses"].items():
+        notification_type = event_for_change(old_status, kwargs["new_status"], False)
+        if notification_type:
+            by_type.setdefault(notification_type, []).append(document_id)
+
+    for notification_type, ids in by_type.items():
+        ids.sort()
+        for start in range(0, len(ids), DOCUMENT_ID_CHUNK_SIZE):
+            submit(fan_out_many, ids[start:start + DOCUMENT_ID_CHUNK_SIZE], notification_type,
+                   exclude_user_id=getattr(actor, "pk", None))
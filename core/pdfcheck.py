@@ -0,0 +1,209 @@
+"""
+PDF validation outside the request process.
+
+Uploads are checked in two stages:
+
+1. While the upload streams in (``documents.uploads.PDFUploadHandler``):
+   the ``%PDF-`` magic bytes, the size limit, and a sha256 computed chunk
+   by chunk.
+2. After the upload, ``check_pdf`` runs ``inspect_file`` in a small
+   process pool.
+   - Each task gets a CPU-time limit: ``RLIMIT_CPU`` is set relative to
+     what the worker has used so far.
+   - The workers run under an address-space cap (``RLIMIT_AS``).
+   - A PDF that hangs the parser or exhausts memory kills only its
+     worker. The pool is then rebuilt and the file rejected.
+   - Rebuilding the pool also kills checks of other uploads that were
+     running at the same time. Those are retried once on the fresh pool,
+     so only a file that breaks the pool twice is rejected.
+
+``inspect_bytes`` rejects:
+- encrypted files
+- files without an ``%%EOF`` trailer
+- decompression bombs: every Flate stream is inflated in 1 MB steps
+  against a shared output budget, and the output is discarded
+- files that do not parse or have no pages, when pypdf is installed
+
+Pool workers are started with ``forkserver`` because request threads
+make ``fork`` unsafe. They import only this module, so it must not
+import Django models.
+"""
+
+import io
+import multiprocessing
+import re
+import threading
+import zlib
+from concurrent.futures import CancelledError, ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+try:
+    import resource
+except ImportError:  # not POSIX: checks run without rlimits
+    resource = None
+
+try:
+    import pypdf
+except ImportError:  # optional: raw structural checks only
+    pypdf = None
+
+
+MAGIC = b"%PDF-"
+MB = 1024 * 1024
+
+# "stream" keyword that starts stream data (not the tail of "endstream")
+STREAM_RE = re.compile(rb"(?<!end)stream\r?\n")
+ENCRYPT_RE = re.compile(rb"/Encrypt\b")
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# =========================================================
+# Checks (run in pool workers)
+# =========================================================
+def _inflate(raw, budget):
+    """Inflate ``raw`` without keeping the output; return bytes produced (<= budget + 1 MB)."""
+    inflater = zlib.decompressobj()
+    produced = 0
+    pending = raw
+    try:
+        while pending and not inflater.eof:
+            produced += len(inflater.decompress(pending, MB))
+            if produced > budget:
+                break
+            pending = inflater.unconsumed_tail
+    except zlib.error:
+        pass  # damaged streams are the parser's business, not a bomb
+    return produced
+
+
+def inspect_bytes(data, max_inflated):
+    """Return ``""`` if ``data`` looks like a safe PDF, else the problem."""
+    if not data.startswith(MAGIC):
+        return "not a PDF file"
+    if b"%%EOF" not in data[-1024:]:
+        return "truncated or corrupt PDF (no %%EOF marker)"
+    if ENCRYPT_RE.search(data):
+        return "encrypted PDFs are not accepted"
+
+    budget = max_inflated
+    for match in STREAM_RE.finditer(data):
+        start = match.end()
+        end = data.find(b"endstream", start)
+        if end < 0:
+            return "corrupt PDF (unterminated stream)"
+        header = data[max(0, data.rfind(b"obj", 0, match.start())):match.start()]
+        if b"/FlateDecode" in header:
+            budget -= _inflate(data[start:end], budget)
+            if budget < 0:
+                return f"decompresses to more than {max_inflated // MB}MB"
+
+    if pypdf is not None:
+        try:
+            reader = pypdf.PdfReader(io.BytesIO(data))
+            if reader.is_encrypted:
+                return "encrypted PDFs are not accepted"
+            if not len(reader.pages):
+                return "PDF has no pages"
+        except Exception as exc:
+            return f"corrupt PDF: {exc}"[:255]
+
+    return ""
+
+
+def inspect_file(path, max_inflated):
+    with open(path, "rb") as fh:
+        return inspect_bytes(fh.read(), max_inflated)
+
+
+def limit_memory(max_bytes):
+    """Pool initializer: cap the worker's address space."""
+    if resource is not None and max_bytes:
+        resource.setrlimit(resource.RLIMIT_AS, (max_bytes, max_bytes))
+
+
+def _inspect_limited(path, max_inflated, cpu_seconds):
+    """``inspect_file`` with a per-task CPU limit (SIGXCPU kills the worker)."""
+    if resource is None:
+        return inspect_file(path, max_inflated)
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    limit = int(usage.ru_utime + usage.ru_stime) + cpu_seconds
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (limit, hard))
+    try:
+        return inspect_file(path, max_inflated)
+    except MemoryError:
+        return "PDF needs too much memory to verify"
+    finally:
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+# =========================================================
+# Pool (request side)
+# =========================================================
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers, memory_bytes):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("forkserver"),
+                initializer=limit_memory,
+                initargs=(memory_bytes,),
+            )
+        return _pool
+
+
+def _discard_pool(pool):
+    """Drop a broken or stuck pool; the next check starts a fresh one."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    for process in list((getattr(pool, "_processes", None) or {}).values()):
+        process.kill()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _run_in_pool(func, *args, retry=True):
+    """``func(*args)`` in the checker pool, or the reason it failed."""
+    cpu_seconds = _setting("QMS_PDF_CHECK_CPU_SECONDS", 5)
+    pool = _get_pool(
+        _setting("QMS_PDF_CHECK_WORKERS", 2),
+        _setting("QMS_PDF_CHECK_MEMORY_MB", 512) * MB,
+    )
+    try:
+        future = pool.submit(func, *args)
+        return future.result(timeout=_setting("QMS_PDF_CHECK_TIMEOUT", cpu_seconds * 3))
+    except FutureTimeout:
+        _discard_pool(pool)
+        return "PDF took too long to verify"
+    except (BrokenProcessPool, CancelledError):
+        # A worker was killed (CPU limit) or crashed: on this file, or on
+        # a concurrent one whose check discarded the shared pool
+        _discard_pool(pool)
+        if retry:
+            return _run_in_pool(func, *args, retry=False)
+        return "PDF is too complex to verify"
+
+
+def check_pdf(path):
+    """
+    Structural check of the PDF at ``path`` in the pool. Returns ``""`` or
+    the reason to reject it.
+    """
+    return _run_in_pool(
+        _inspect_limited, str(path),
+        _setting("QMS_PDF_MAX_INFLATED_MB", 256) * MB, _setting("QMS_PDF_CHECK_CPU_SECONDS", 5),
+    )
@@ -0,0 +1,166 @@
+"""
+Print request workflow.
+
+- Quality works through a keyset-paginated queue and approves or rejects
+  many requests at once. Each decision is a single UPDATE that only
+  touches still-pending rows, so two reviewers cannot decide the same
+  request twice.
+- Approval schedules ``build_packages`` in the background. It writes a
+  controlled-copy PDF per request, stamped with pypdf, so the download
+  is a ready file. Without pypdf no package is built: the request shows
+  the error instead of handing out an unstamped copy.
+"""
+
+import io
+import logging
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+
+from .background import submit
+from .keyset import keyset_page
+from .models import PrintRequest
+
+try:
+    import pypdf
+    from pypdf.annotations import FreeText
+except ImportError:  # required for print packages, see render_package()
+    pypdf = None
+
+
+logger = logging.getLogger(__name__)
+
+QUEUE_PAGE_SIZE = 25
+
+
+# =========================================================
+# Requests
+# =========================================================
+def request_print(user, document, reason):
+    """
+    Create a pending request, or return the user's open one for the
+    same document. Returns ``(print_request, created)``.
+    """
+    existing = PrintRequest.objects.filter(
+        user=user, document=document, status=PrintRequest.Status.PENDING
+    ).first()
+    if existing:
+        return existing, False
+
+    return PrintRequest.objects.create(user=user, document=document, reason=reason), True
+
+
+def queue_page(status=PrintRequest.Status.PENDING, department_id=None, search="",
+               cursor=None, limit=QUEUE_PAGE_SIZE):
+    qs = PrintRequest.objects.select_related(
+        "user", "document", "document__department", "handled_by"
+    )
+    if status:
+        qs = qs.filter(status=status)
+    if department_id:
+        qs = qs.filter(document__department_id=department_id)
+    if search:
+        qs = qs.filter(document__title__icontains=search)
+
+    return keyset_page(qs, cursor, limit)
+
+
+# =========================================================
+# Bulk Transitions
+# =========================================================
+def transition(request_ids, status, handler, notes=""):
+    """
+    Move pending requests to ``status`` in one UPDATE. Returns the ids that
+    were actually changed (already-handled requests are skipped).
+    """
+    if status not in (PrintRequest.Status.APPROVED, PrintRequest.Status.REJECTED):
+        raise ValueError(f"Invalid target status: {status}")
+
+    fields = {"status": status, "handled_by": handler, "handled_at": timezone.now()}
+    if notes:
+        fields["notes"] = notes
+
+    with transaction.atomic():
+        # Write lock is held (BEGIN IMMEDIATE): the ids read here are exactly
+        # the rows the UPDATE changes.
+        pending = PrintRequest.objects.filter(
+            pk__in=request_ids, status=PrintRequest.Status.PENDING
+        )
+        changed = list(pending.values_list("pk", flat=True))
+        PrintRequest.objects.filter(pk__in=changed).update(**fields)
+
+    if changed and status == PrintRequest.Status.APPROVED:
+        submit(build_packages, changed)
+
+    return changed
+
+
+# =========================================================
+# Print Packages
+# =========================================================
+def copy_label(print_request):
+    holder = print_request.user.get_full_name() or print_request.user.username
+    issued = timezone.localtime(print_request.handled_at or timezone.now())
+    return (
+        f"CONTROLLED COPY PR-{print_request.pk} | Issued to {holder} "
+        f"on {issued:%Y-%m-%d} | Uncontrolled when copied"
+    )
+
+
+def render_package(source, label):
+    """
+    Return the controlled-copy PDF bytes for ``source`` (a file object).
+    Never returns an unstamped copy.
+    """
+    if pypdf is None:
+        raise ImproperlyConfigured("pypdf is not installed: controlled copies cannot be stamped.")
+
+    data = source.read()
+
+    writer = pypdf.PdfWriter(clone_from=pypdf.PdfReader(io.BytesIO(data)))
+    for number, page in enumerate(writer.pages):
+        box = page.mediabox
+        writer.add_annotation(
+            page_number=number,
+            annotation=FreeText(
+                text=label,
+                rect=(box.left + 18, box.bottom + 8, box.right - 18, box.bottom + 24),
+                font_size="8pt",
+                font_color="b00020",
+                border_color=None,
+                background_color=None,
+            ),
+        )
+    writer.add_metadata({"/Subject": label})
+
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+
+def build_package(print_request):
+    document = print_request.document
+    try:
+        with document.pdf_file.open("rb") as source:
+            content = render_package(source, copy_label(print_request))
+    except Exception as exc:  # missing file, unreadable PDF, ...
+        logger.exception("Print package for request %s failed", print_request.pk)
+        PrintRequest.objects.filter(pk=print_request.pk).update(package_error=str(exc)[:255])
+        return
+
+    print_request.package.save(
+        f"PR-{print_request.pk}-{document.pk}.pdf", ContentFile(content), save=False
+    )
+    PrintRequest.objects.filter(pk=print_request.pk).update(
+        package=print_request.package.name, package_error=""
+    )
+
+
+def build_packages(request_ids):
+    requests = PrintRequest.objects.filter(
+        pk__in=request_ids, status=PrintRequest.Status.APPROVED
+    ).select_related("user", "document")
+    for print_request in requests:
+        build_package(print_request)
@@ -0,0 +1,64 @@
+"""
+SQLite ``EXPLAIN QUERY PLAN`` helpers for query-plan regression tests.
+
+A hot path is a callable that runs ORM code; every query it executes is
+captured and explained, and the plan is checked for full table scans and
+temporary B-tree sorts.
+"""
+
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+# "SCAN t" or "SCAN t AS alias" without an index = full table scan
+FULL_SCAN_RE = re.compile(r"^SCAN (\S+)(?: AS \S+)?$")
+TEMP_BTREE_RE = re.compile(r"USE TEMP B-TREE FOR (.+)$")
+
+
+def explain(sql, using=DEFAULT_DB_ALIAS):
+    """Return the plan detail lines for an already-interpolated SQL string."""
+    with connections[using].cursor() as cursor:
+        cursor.execute("EXPLAIN QUERY PLAN " + sql)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def capture_plans(func, using=DEFAULT_DB_ALIAS):
+    """
+    Run ``func`` and return ``[(sql, plan_lines), ...]`` for every SELECT it
+    issued.
+    """
+    connection = connections[using]
+    with CaptureQueriesContext(connection) as captured:
+        func()
+
+    return [
+        (query["sql"], explain(query["sql"], using))
+        for query in captured.captured_queries
+        if query["sql"].lstrip().upper().startswith("SELECT")
+    ]
+
+
+def plan_problems(plan, allow_temp_btree=(), require_covering=False):
+    """
+    List what is wrong with one query plan.
+
+    ``allow_temp_btree`` names the temp B-tree uses that are inherent to
+    the query (e.g. ``"ORDER BY"`` of an aggregate); any other one fails.
+    ``require_covering`` demands that the main table is read index-only.
+    """
+    problems = []
+
+    for line in plan:
+        if FULL_SCAN_RE.match(line):
+            problems.append(f"full table scan: {line}")
+
+        match = TEMP_BTREE_RE.search(line)
+        if match and not any(match.group(1).endswith(kind) for kind in allow_temp_btree):
+            problems.append(f"temp b-tree sort: {line}")
+
+    if require_covering and not any("COVERING INDEX" in line for line in plan):
+        problems.append("not index-only: " + " | ".join(plan))
+
+    return problems
@@ -0,0 +1,138 @@
+"""
+Read-replica routing for analytics views.
+
+Views wrapped in ``@use_analytics_db`` send their reads to
+``QMS_ANALYTICS_DB`` (a SQLite copy refreshed by ``manage.py
+refresh_replica``) as long as the copy is younger than
+``QMS_REPLICA_MAX_LAG`` seconds. Otherwise, and for every write, the
+primary database is used.
+"""
+
+import json
+import os
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+
+_analytics_reads = ContextVar("qms_analytics_reads", default=False)
+
+# Permission/identity data is always read from the primary, so a lagging
+# replica can never grant stale access.
+PRIMARY_ONLY_APPS = {"auth", "accounts", "sessions", "contenttypes", "admin"}
+
+# Marker checks are cheap but not free; cache the answer briefly.
+_LAG_CACHE_SECONDS = 2.0
+_lag_cache = {"checked": 0.0, "lag": None}
+
+
+def analytics_alias():
+    alias = getattr(settings, "QMS_ANALYTICS_DB", None)
+    return alias if alias in settings.DATABASES else None
+
+
+def marker_path(alias):
+    return f"{settings.DATABASES[alias]['NAME']}.meta.json"
+
+
+# =========================================================
+# Replica Lag
+# =========================================================
+def replica_lag(alias=None):
+    """
+    Seconds since the replica snapshot was taken, or ``None`` when the
+    replica has never been refreshed.
+    """
+    alias = alias or analytics_alias()
+    if alias is None:
+        return None
+
+    now = time.monotonic()
+    if now - _lag_cache["checked"] < _LAG_CACHE_SECONDS:
+        return _lag_cache["lag"]
+
+    lag = None
+    try:
+        with open(marker_path(alias)) as fh:
+            snapshot_at = parse_datetime(json.load(fh)["snapshot_at"])
+        if snapshot_at is not None:
+            lag = max(0.0, (timezone.now() - snapshot_at).total_seconds())
+    except (OSError, ValueError, KeyError):
+        lag = None
+
+    _lag_cache.update(checked=now, lag=lag)
+    return lag
+
+
+def reset_lag_cache():
+    _lag_cache.update(checked=0.0, lag=None)
+
+
+def replica_is_fresh():
+    lag = replica_lag()
+    max_lag = getattr(settings, "QMS_REPLICA_MAX_LAG", 300)
+    return lag is not None and lag <= max_lag
+
+
+# =========================================================
+# Router
+# =========================================================
+class AnalyticsReplicaRouter:
+    """
+    Reads go to the replica only inside ``use_analytics_db``; writes and
+    migrations always target the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (
+            _analytics_reads.get()
+            and model._meta.app_label not in PRIMARY_ONLY_APPS
+            and replica_is_fresh()
+        ):
+            return analytics_alias()
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Same data on both aliases
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != analytics_alias()
+
+
+def read_source():
+    """
+    Which copy the current context's analytics reads see: ``"primary"``
+    or the replica snapshot (its marker's mtime). Part of the ETags of
+    replica-backed views, so a refresh invalidates them.
+    """
+    alias = analytics_alias()
+    if not (_analytics_reads.get() and alias and replica_is_fresh()):
+        return "primary"
+    try:
+        return f"replica:{os.stat(marker_path(alias)).st_mtime_ns}"
+    except OSError:
+        return "primary"
+
+
+def use_analytics_db(view_func):
+    """
+    Send the view's ORM reads to the analytics replica (when fresh).
+    """
+    @wraps(view_func)
+    def _wrapped(*args, **kwargs):
+        token = _analytics_reads.set(True)
+        try:
+            return view_func(*args, **kwargs)
+        finally:
+            _analytics_reads.reset(token)
+
+    return _wrapped
@@ -0,0 +1,350 @@
+"""
+Synthetic data generator used by ``manage.py seed_qms`` and the benchmarks.
+
+Everything is derived from one ``random.Random(seed)`` so a given seed and
+scale always produce the same dataset.
+"""
+
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import Department, User
+from accounts.permissions import (
+    GROUP_EMPLOYEE,
+    GROUP_MANAGER,
+    GROUP_QUALITY,
+    GROUP_ADMIN,
+)
+from documents.models import Document, DocumentActivity
+
+from .inbox import recount_unread
+from .models import Notification, NotificationCounter
+
+
+SEED_PREFIX = "seed"
+
+# Share of users per group (remainder goes to Employees)
+ROLE_MIX = (
+    (GROUP_MANAGER, 0.10),
+    (GROUP_QUALITY, 0.06),
+    (GROUP_ADMIN, 0.02),
+)
+
+STATUS_MIX = (
+    (Document.Status.ACTIVE, 0.80),
+    (Document.Status.DISABLED, 0.08),
+    (Document.Status.ARCHIVED, 0.12),
+)
+
+ACTION_MIX = (
+    (DocumentActivity.Action.VIEW, 0.92),
+    (DocumentActivity.Action.EDIT, 0.04),
+    (DocumentActivity.Action.ATTEMPT_DISABLED, 0.03),
+    (DocumentActivity.Action.CREATE, 0.01),
+)
+
+NOTIFICATION_MIX = (
+    (Notification.Type.UPDATED, 0.75),
+    (Notification.Type.DISABLED, 0.15),
+    (Notification.Type.REACTIVATED, 0.10),
+)
+
+DEPARTMENT_NAMES = (
+    "Production", "Maintenance", "Quality Control", "HSE", "Logistics",
+    "Procurement", "Finance", "HR", "IT", "Engineering", "Melt Shop",
+    "Rolling Mill", "Laboratory", "Warehouse", "Planning",
+)
+
+FIRST_NAMES = (
+    "Ahmed", "Mohammed", "Fatima", "Aisha", "Omar", "Ali", "Sara", "Khalid",
+    "Maryam", "Yousef", "Noura", "Hassan", "John", "Priya", "Rahul", "Maria",
+)
+
+LAST_NAMES = (
+    "Al Mansoori", "Al Hashimi", "Khan", "Saeed", "Rahman", "Nair", "Smith",
+    "Haddad", "Farouk", "Iyer", "Santos", "Qasim", "Al Ketbi", "Mathew",
+)
+
+DOCUMENT_KINDS = (
+    "Procedure", "Work Instruction", "Form", "Policy", "Checklist",
+    "Specification", "Manual", "Record",
+)
+
+
+@contextmanager
+def manual_timestamps(*fields):
+    """
+    Temporarily disable ``auto_now``/``auto_now_add`` so ``bulk_create``
+    keeps the generated timestamps.
+    """
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field, _auto_now, _auto_now_add in saved:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now = auto_now
+            field.auto_now_add = auto_now_add
+
+
+def _weighted(rng, mix):
+    values = [value for value, _weight in mix]
+    weights = [weight for _value, weight in mix]
+    return rng.choices(values, weights=weights)[0]
+
+
+class QMSSeeder:
+    """
+    Bulk-generate departments, users, documents, readers, activities and
+    notifications.
+    """
+
+    def __init__(self, seed=42, batch_size=5000, days=365, password="qms-seed", log=None):
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.days = days
+        self.password = password
+        self.now = timezone.now()
+        self.log = log or (lambda message: None)
+
+    # =====================================================
+    # Helpers
+    # =====================================================
+    def _random_moment(self, max_days=None):
+        """
+        Recent days are denser, most events land in working hours and
+        weekends (Sat/Sun) are quiet.
+        """
+        max_days = max_days or self.days
+        age = min(self.rng.expovariate(3.0 / max_days), max_days)
+        moment = timezone.localtime(self.now - timedelta(days=age))
+
+        if moment.weekday() >= 5 and self.rng.random() < 0.8:
+            moment -= timedelta(days=moment.weekday() - 4)
+
+        if self.rng.random() < 0.85:
+            hour = min(max(int(self.rng.gauss(11, 2.5)), 6), 19)
+            moment = moment.replace(hour=hour, minute=self.rng.randrange(60))
+
+        return min(moment, self.now)
+
+    def _bulk_create(self, model, objects, label, **kwargs):
+        created = 0
+        for start in range(0, len(objects), self.batch_size):
+            chunk = objects[start:start + self.batch_size]
+            with transaction.atomic():
+                model.objects.bulk_create(chunk, batch_size=self.batch_size, **kwargs)
+            created += len(chunk)
+        self.log(f"  {label}: {created}")
+        return created
+
+    def _stream_create(self, model, total, factory, label):
+        """
+        Build and insert ``total`` rows batch by batch so memory stays flat.
+        """
+        created = 0
+        while created < total:
+            size = min(self.batch_size, total - created)
+            batch = [factory() for _ in range(size)]
+            with transaction.atomic():
+                model.objects.bulk_create(batch, batch_size=self.batch_size)
+            created += size
+            if created % (self.batch_size * 20) == 0 or created == total:
+                self.log(f"  {label}: {created}/{total}")
+        return created
+
+    # =====================================================
+    # Entities
+    # =====================================================
+    def create_groups(self):
+        return {
+            name: Group.objects.get_or_create(name=name)[0]
+            for name in (GROUP_EMPLOYEE, GROUP_MANAGER, GROUP_QUALITY, GROUP_ADMIN)
+        }
+
+    def create_departments(self, count):
+        departments = [
+            Department(
+                name=f"{DEPARTMENT_NAMES[i % len(DEPARTMENT_NAMES)]} {SEED_PREFIX}-{i:03d}",
+                code=f"{SEED_PREFIX.upper()}{i:03d}",
+            )
+            for i in range(count)
+        ]
+        self._bulk_create(Department, departments, "departments")
+        return list(Department.objects.filter(code__startswith=SEED_PREFIX.upper()).order_by("id"))
+
+    def create_users(self, count, departments, groups):
+        password_hash = make_password(self.password)
+
+        users = []
+        for i in range(count):
+            users.append(User(
+                username=f"{SEED_PREFIX}_user_{i:06d}",
+                first_name=self.rng.choice(FIRST_NAMES),
+                last_name=self.rng.choice(LAST_NAMES),
+                email=f"{SEED_PREFIX}_user_{i:06d}@example.com",
+                password=password_hash,
+                department=self.rng.choice(departments),
+                is_active=self.rng.random() > 0.03,
+            ))
+        self._bulk_create(User, users, "users")
+
+        users = list(
+            User.objects.filter(username__startswith=f"{SEED_PREFIX}_user_")
+            .only("id", "department_id")
+            .order_by("id")
+        )
+
+        memberships = []
+        by_group = {name: [] for name in groups}
+        for user in users:
+            group_name = _weighted(self.rng, ROLE_MIX + ((GROUP_EMPLOYEE, 0.82),))
+            by_group[group_name].append(user)
+            memberships.append(
+                User.groups.through(user_id=user.id, group_id=groups[group_name].id)
+            )
+        self._bulk_create(User.groups.through, memberships, "group memberships")
+
+        return users, by_group
+
+    def create_documents(self, count, departments, authors):
+        created_at = Document._meta.get_field("created_at")
+        updated_at = Document._meta.get_field("updated_at")
+
+        documents = []
+        for i in range(count):
+            status = _weighted(self.rng, STATUS_MIX)
+            created = self._random_moment(max_days=self.days * 2)
+            updated = min(created + timedelta(days=self.rng.expovariate(1 / 30)), self.now)
+            documents.append(Document(
+                title=f"{self.rng.choice(DOCUMENT_KINDS)} QMS-{i:06d}",
+                description="Synthetic document generated by seed_qms.",
+                department=self.rng.choice(departments),
+                pdf_file=f"documents/pdfs/{SEED_PREFIX}/QMS-{i:06d}.pdf",
+                status=status,
+                disabled_reason="Superseded" if status == Document.Status.DISABLED else "",
+                created_by=self.rng.choice(authors),
+                created_at=created,
+                updated_at=updated,
+            ))
+
+        with manual_timestamps(created_at, updated_at):
+            self._bulk_create(Document, documents, "documents")
+
+        return list(
+            Document.objects.filter(pdf_file__startswith=f"documents/pdfs/{SEED_PREFIX}/")
+            .only("id", "department_id", "status")
+            .order_by("id")
+        )
+
+    def create_readers(self, documents, users, share_ratio=0.3, max_readers=25):
+        by_department = {}
+        for user in users:
+            by_department.setdefault(user.department_id, []).append(user.id)
+        all_ids = [user.id for user in users]
+
+        through = Document.readers.through
+        links = []
+        for document in documents:
+            if self.rng.random() > share_ratio:
+                continue
+            pool = by_department.get(document.department_id) or all_ids
+            size = min(len(pool), self.rng.randint(1, max_readers))
+            reader_ids = set(self.rng.sample(pool, size))
+            # A few cross-department readers
+            if self.rng.random() < 0.2:
+                reader_ids.add(self.rng.choice(all_ids))
+            links.extend(through(document_id=document.id, user_id=uid) for uid in reader_ids)
+
+        self._bulk_create(through, links, "reader links", ignore_conflicts=True)
+
+    def create_activities(self, total, documents, users):
+        # Zipf-like popularity: a small set of documents gets most views.
+        weights = [1.0 / (rank + 1) ** 0.9 for rank in range(len(documents))]
+        self.rng.shuffle(weights)
+        cum_weights = list(accumulate(weights))
+        disabled = [d for d in documents if d.status == Document.Status.DISABLED] or documents
+
+        def factory():
+            action = _weighted(self.rng, ACTION_MIX)
+            if action == DocumentActivity.Action.ATTEMPT_DISABLED:
+                document = self.rng.choice(disabled)
+            else:
+                document = self.rng.choices(documents, cum_weights=cum_weights)[0]
+            user = self.rng.choice(users)
+            return DocumentActivity(
+                document_id=document.id,
+                user_id=user.id,
+                department_id=user.department_id,
+                action=action,
+                timestamp=self._random_moment(),
+            )
+
+        with manual_timestamps(DocumentActivity._meta.get_field("timestamp")):
+            return self._stream_create(DocumentActivity, total, factory, "activities")
+
+    def create_notifications(self, total, documents, users):
+        read_after = timedelta(days=3)
+
+        def factory():
+            created = self._random_moment()
+            # Older notifications are much more likely to be read.
+            is_read = self.now - created > read_after and self.rng.random() < 0.9
+            return Notification(
+                recipient_id=self.rng.choice(users).id,
+                document_id=self.rng.choice(documents).id,
+                type=_weighted(self.rng, NOTIFICATION_MIX),
+                message="Synthetic notification",
+                is_read=is_read,
+                created_at=created,
+            )
+
+        with manual_timestamps(Notification._meta.get_field("created_at")):
+            created = self._stream_create(Notification, total, factory, "notifications")
+
+        # The header bell reads NotificationCounter, not the table
+        user_ids = [user.id for user in users]
+        NotificationCounter.objects.bulk_create(
+            [NotificationCounter(user_id=user_id) for user_id in user_ids],
+            batch_size=self.batch_size, ignore_conflicts=True,
+        )
+        recount_unread(user_ids)
+        return created
+
+    # =====================================================
+    # Entry Point
+    # =====================================================
+    def run(self, departments=20, users=2000, documents=10000, activities=100000,
+            notifications=50000):
+        self.log("Seeding groups/departments/users ...")
+        groups = self.create_groups()
+        department_objs = self.create_departments(departments)
+        user_objs, by_group = self.create_users(users, department_objs, groups)
+
+        authors = by_group[GROUP_QUALITY] + by_group[GROUP_ADMIN] or user_objs
+
+        self.log("Seeding documents ...")
+        document_objs = self.create_documents(documents, department_objs, authors)
+        self.create_readers(document_objs, user_objs)
+
+        self.log("Seeding activity log ...")
+        self.create_activities(activities, document_objs, user_objs)
+
+        self.log("Seeding notifications ...")
+        self.create_notifications(notifications, document_objs, user_objs)
+
+        return {
+            "departments": len(department_objs),
+            "users": len(user_objs),
+            "documents": len(document_objs),
+            "activities": activities,
+            "notifications": notifications,
+        }
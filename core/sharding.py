@@ -0,0 +1,200 @@
+"""
+Move PDFs from the flat ``documents/pdfs/`` directory into the sharded
+layout (``documents/pdfs/ab/cd/name.pdf``, see
+``documents.models.sharded_pdf_path``). Safe to run while the site is up.
+
+Each batch works one storage name at a time:
+1. Hard-link the file under its new name, or copy it across devices.
+2. Check the new file's sha256 against the revision, or against the old
+   file when there is no revision.
+3. In one transaction, rewrite every ``Document.pdf_file`` and
+   ``DocumentRevision.pdf_file`` that holds the old name, with
+   ``UPDATE ... WHERE pdf_file = old``.
+4. Delete the old files only after the batch has committed, so a
+   request that read the old name just before the commit still finds
+   its file.
+
+Files that are only in cold storage (``core.tiering``) keep their names.
+A file that was restored from cold storage is moved with its cold copy
+and manifest entry, so the cold copy is not orphaned.
+Missing files are reported and left alone. Re-running continues with
+whatever is still unsharded.
+"""
+
+import errno
+import hashlib
+import os
+import re
+import shutil
+import time
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from documents.models import PDF_DIR, Document, DocumentRevision, sharded_pdf_path
+
+from .tiering import cold_path, load_manifest, save_manifest
+
+
+SHARDED_RE = re.compile(rf"^{re.escape(PDF_DIR)}/[0-9a-f]{{2}}/[0-9a-f]{{2}}/")
+READ_BLOCK = 1024 * 1024
+
+
+def is_sharded(name):
+    return bool(SHARDED_RE.match(name))
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(READ_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _link_or_copy(source, target):
+    """
+    Hard-link ``source`` as ``target``, or copy it across devices. Never
+    replaces an existing ``target`` (``FileExistsError``).
+    """
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    try:
+        os.link(source, target)
+        return
+    except OSError as exc:
+        if exc.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+            raise
+
+    with open(source, "rb") as src, open(target, "xb") as dst:
+        try:
+            shutil.copyfileobj(src, dst, READ_BLOCK)
+        except BaseException:
+            dst.close()
+            os.remove(target)
+            raise
+
+
+def _move_cold_entries(renamed):
+    """
+    Rename the ``core.tiering`` entries (and ``.gz`` copies) of files that
+    were moved while restored to hot storage, so the cold copy keeps
+    matching its document.
+    """
+    if not renamed:
+        return
+    manifest = load_manifest()
+    renamed = {old: new for old, new in renamed.items() if old in manifest}
+    if not renamed:
+        return
+
+    entries = dict(manifest)
+    for old, new in renamed.items():
+        entry = entries.pop(old)
+        if cold_path(old).exists():
+            _link_or_copy(str(cold_path(old)), str(cold_path(new)))
+            entries[new] = entry
+        # else: the cold copy is lost, the hot file is the only one left
+    save_manifest(entries)
+    # Only once the manifest no longer lists them
+    for old in renamed:
+        if cold_path(old).exists():
+            os.remove(cold_path(old))
+
+
+def unsharded_names(limit, cursor):
+    """
+    Up to ``limit`` distinct storage names still in the flat layout, from
+    the rows after ``cursor`` (``{model: last pk}``, advanced in place).
+    Rows left behind (missing, cold, failed) are never read again.
+    """
+    names = {}
+    for model in (Document, DocumentRevision):
+        remaining = limit - len(names)
+        if remaining <= 0:
+            break
+        queryset = (
+            model.objects.exclude(pdf_file="")
+            .exclude(pdf_file__regex=SHARDED_RE.pattern)
+            .filter(pk__gt=cursor.get(model, 0))
+        )
+        if model is DocumentRevision:
+            # Names a document still holds are handled (or reported) with the document
+            queryset = queryset.exclude(pdf_file__in=Document.objects.values("pdf_file"))
+        rows = list(queryset.order_by("pk").values_list("pk", "pdf_file")[:remaining])
+        if rows:
+            cursor[model] = rows[-1][0]
+        names.update(dict.fromkeys(name for _pk, name in rows))
+    return list(names)
+
+
+def shard_media(batch_size=500, dry_run=False, pause=0.0, log=None):
+    """Returns ``{"moved", "cold", "missing", "failed"}`` counts."""
+    log = log or (lambda message: None)
+    storage = default_storage
+    stats = {"moved": 0, "cold": 0, "missing": 0, "failed": 0}
+    cursor = {}
+
+    while True:
+        names = unsharded_names(batch_size, cursor)
+        if not names:
+            break
+
+        cold = load_manifest()
+        moved = []  # old paths of this batch
+        renamed = {}  # old name -> new name
+        for name in names:
+            old_path = storage.path(name)
+
+            if not os.path.exists(old_path):
+                key = "cold" if name in cold else "missing"
+                stats[key] += 1
+                if key == "missing":
+                    log(f"Missing file: {name}")
+                continue
+
+            if dry_run:
+                new_name = storage.get_available_name(sharded_pdf_path(None, name))
+                log(f"{name} -> {new_name}")
+                stats["moved"] += 1
+                continue
+
+            for _attempt in range(5):
+                new_name = storage.get_available_name(sharded_pdf_path(None, name))
+                new_path = storage.path(new_name)
+                try:
+                    _link_or_copy(old_path, new_path)
+                    break
+                except FileExistsError:
+                    continue  # a concurrent upload took the name: pick another
+            else:
+                stats["failed"] += 1
+                log(f"No free sharded name, left in place: {name}")
+                continue
+
+            expected = (
+                DocumentRevision.objects.filter(pdf_file=name).values_list("sha256", flat=True).first()
+                or _sha256(old_path)
+            )
+            if _sha256(new_path) != expected:
+                os.remove(new_path)
+                stats["failed"] += 1
+                log(f"Checksum mismatch, left in place: {name}")
+                continue
+
+            with transaction.atomic():
+                Document.objects.filter(pdf_file=name).update(pdf_file=new_name)
+                DocumentRevision.objects.filter(pdf_file=name).update(pdf_file=new_name)
+            moved.append(old_path)
+            renamed[name] = new_name
+
+        _move_cold_entries(renamed)
+        for old_path in moved:
+            os.remove(old_path)
+        stats["moved"] += len(moved)
+
+        if moved:
+            log(f"Moved {stats['moved']} file(s)")
+        if pause:
+            time.sleep(pause)
+
+    return stats
@@ -0,0 +1,221 @@
+"""
+Slow-query log with call-site attribution.
+
+``record_slow_queries(label)`` installs an ``execute_wrapper`` on every
+connection. A query that takes at least ``QMS_SLOW_QUERY_MS`` is kept as
+a ``SlowQuery`` sample with:
+- its SQL and a fingerprint of the SQL with literals and placeholders
+  removed, so the same statement groups together whatever its values
+- the shape of its parameters (types and list sizes, never values)
+- the database alias and the duration
+- the label (URL name of the request, or the background job)
+- the call site: the innermost project frame before the ORM, e.g.
+  ``core/views.py:120 in quality_center``
+
+Samples are written in one ``bulk_create`` after the block, outside the
+wrappers, so the log never records itself. Rows older than the newest
+``QMS_SLOW_QUERY_MAX_ROWS`` are deleted by id range at the same time.
+
+``SlowQueryMiddleware`` records every request. Set ``QMS_SLOW_QUERY_MS``
+to ``None`` to turn the log off.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import sys
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, transaction
+from django.db.models import Max
+
+from .models import SlowQuery
+
+
+logger = logging.getLogger(__name__)
+
+SQL_LIMIT = 10000
+PARAMS_SHAPE_LIMIT = 255
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# =========================================================
+# Fingerprints
+# =========================================================
+_string_re = re.compile(r"'(?:[^']|'')*'")
+_number_re = re.compile(r"(?<![\w\"])-?\d+(?:\.\d+)?\b")
+_placeholder_re = re.compile(r"%s|\?")
+_list_re = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_repeated_list_re = re.compile(r"\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+")
+_space_re = re.compile(r"\s+")
+
+
+def normalize_sql(sql):
+    """``sql`` with literals as ``?`` and value lists as ``(...)``."""
+    sql = _string_re.sub("?", sql)
+    sql = _number_re.sub("?", sql)
+    sql = _placeholder_re.sub("?", sql)
+    sql = _list_re.sub("(...)", sql)
+    sql = _repeated_list_re.sub("(...)", sql)  # multi-row VALUES
+    return _space_re.sub(" ", sql).strip()
+
+
+def fingerprint(sql):
+    return hashlib.blake2b(normalize_sql(sql).encode(), digest_size=8).hexdigest()
+
+
+def _describe(value):
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__
+
+
+def params_shape(params, many=False):
+    """``(int, str, list[40])``-style summary of the parameters."""
+    if many:
+        try:
+            sets = len(params)
+        except TypeError:  # an iterator: it must not be consumed here
+            return "executemany"
+        first = params[0] if sets and isinstance(params, (list, tuple)) else None
+        inner = f" of {params_shape(first)}" if first is not None else ""
+        return f"executemany[{sets}]{inner}"[:PARAMS_SHAPE_LIMIT]
+
+    if params is None:
+        return ""
+    if isinstance(params, dict):
+        shape = "{" + ", ".join(f"{key}: {_describe(value)}" for key, value in params.items()) + "}"
+    else:
+        # Runs of one type are collapsed: (int, str x 3)
+        runs = []
+        for description in map(_describe, params):
+            if runs and runs[-1][0] == description:
+                runs[-1][1] += 1
+            else:
+                runs.append([description, 1])
+        shape = "(" + ", ".join(d if n == 1 else f"{d} x {n}" for d, n in runs) + ")"
+    return shape[:PARAMS_SHAPE_LIMIT]
+
+
+# =========================================================
+# Call sites
+# =========================================================
+_db_layer = os.path.join("django", "db", "backends", "utils.py")
+_orm = os.sep + os.path.join("django", "db") + os.sep
+_handlers = os.sep + os.path.join("django", "core", "handlers") + os.sep
+_site_packages = "site-packages" + os.sep
+# Middleware ``__call__`` frames only pass the request along
+_middleware = os.path.join(os.path.dirname(os.path.abspath(__file__)), "middleware.py")
+
+
+def _frame_name(frame, path):
+    return f"{path}:{frame.f_lineno} in {frame.f_code.co_name}"
+
+
+def call_site():
+    """
+    ``path:line in function`` of the innermost project frame that led
+    into the ORM while handling the request (execute wrappers past the
+    ORM are ignored). Queries made by libraries alone (e.g. session
+    loading) name the library.
+    """
+    root = str(settings.BASE_DIR) + os.sep
+    frames = []
+    frame = sys._getframe(1)
+    while frame is not None:
+        frames.append(frame)
+        frame = frame.f_back
+
+    project = library = ""
+    for frame in reversed(frames):  # outermost first
+        filename = frame.f_code.co_filename
+        if filename.endswith(_db_layer):
+            break
+        if _orm in filename:
+            continue
+        if _handlers in filename:
+            project = ""  # frames outside the request (server, test client) do not count
+        if filename.startswith(root) and _site_packages not in filename:
+            if not (filename == _middleware and frame.f_code.co_name == "__call__"):
+                project = _frame_name(frame, filename[len(root):])
+        elif _site_packages in filename:
+            library = _frame_name(frame, filename.split(_site_packages, 1)[1])
+    return project or library
+
+
+# =========================================================
+# Recording
+# =========================================================
+class SlowQueryRecorder:
+    """``execute_wrapper`` that keeps queries slower than ``threshold_ms``."""
+
+    def __init__(self, label, threshold_ms):
+        self.label = label
+        self.threshold_ms = threshold_ms
+        self.samples = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            if duration_ms >= self.threshold_ms:
+                self.samples.append(SlowQuery(
+                    sql=sql[:SQL_LIMIT],
+                    params_shape=params_shape(params, many),
+                    duration_ms=duration_ms,
+                    database=context["connection"].alias,
+                    view=(self.label() if callable(self.label) else self.label)[:200],
+                    call_site=call_site()[:255],
+                ))
+
+
+@contextmanager
+def record_slow_queries(label=""):
+    """
+    Log the slow queries run inside the block. ``label`` may be a callable
+    (read when a query is slow, e.g. after URL resolution).
+    """
+    threshold_ms = _setting("QMS_SLOW_QUERY_MS", 200)
+    if threshold_ms is None:
+        yield None
+        return
+
+    recorder = SlowQueryRecorder(label, threshold_ms)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            yield recorder
+    finally:
+        save_samples(recorder.samples)
+
+
+def save_samples(samples):
+    """Store ``samples`` and rotate the log. Never raises."""
+    if not samples:
+        return
+
+    for sample in samples:
+        sample.fingerprint = fingerprint(sample.sql)
+        logger.info(
+            "Slow query (%.0f ms) in %s at %s: %s",
+            sample.duration_ms, sample.view or "-", sample.call_site or "-", sample.sql[:200],
+        )
+
+    try:
+        with transaction.atomic(using=DEFAULT_DB_ALIAS):
+            SlowQuery.objects.bulk_create(samples)
+            newest = SlowQuery.objects.aggregate(newest=Max("id"))["newest"]
+            keep = _setting("QMS_SLOW_QUERY_MAX_ROWS", 10000)
+            SlowQuery.objects.filter(id__lte=newest - keep).delete()
+    except DatabaseError:
+        # The request's own transaction may be unusable; the log is best effort
+        logger.exception("Could not store %d slow query sample(s)", len(samples))
@@ -0,0 +1,119 @@
+"""
+SQLite write-concurrency layer.
+
+- ``configure_connection`` (``connection_created`` receiver) applies the
+  pragmas from ``QMS_SQLITE_PRAGMAS`` (WAL, busy_timeout, ...) and installs
+  the retry wrapper on every new SQLite connection.
+- ``retry_locked_writes`` retries "database is locked" errors with jittered
+  exponential backoff. Only statements that are safe to repeat are retried:
+  writes in autocommit mode and the ``BEGIN`` that opens a transaction.
+- Lock-wait time is reported through ``core.metrics``.
+"""
+
+import random
+import time
+
+from django.conf import settings
+from django.db.utils import OperationalError
+
+from .metrics import registry
+
+
+LOCK_MESSAGES = ("database is locked", "database table is locked", "database is busy")
+WRITE_PREFIXES = ("INSERT", "UPDATE", "DELETE", "REPLACE", "BEGIN")
+
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "busy_timeout": 5000,
+    "synchronous": "NORMAL",
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64000,
+}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def is_lock_error(exc):
+    message = str(exc).lower()
+    return any(text in message for text in LOCK_MESSAGES)
+
+
+def backoff_delays(retries, base_delay, max_delay=2.0, rng=random):
+    """Full-jitter exponential backoff: uniform(0, min(max, base * 2**n))."""
+    for attempt in range(retries):
+        yield rng.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+# =========================================================
+# Pragmas
+# =========================================================
+def apply_pragmas(cursor, pragmas):
+    for name, value in pragmas.items():
+        cursor.execute(f"PRAGMA {name} = {value}")
+
+
+def configure_connection(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+
+    pragmas = _setting("QMS_SQLITE_PRAGMAS", DEFAULT_PRAGMAS)
+    if connection.alias == _setting("QMS_ANALYTICS_DB", None):
+        # Belt and braces next to the router: the replica rejects writes.
+        # It is a standalone snapshot file, so keep its journal mode.
+        pragmas = {k: v for k, v in pragmas.items() if k != "journal_mode"}
+        pragmas["query_only"] = "ON"
+
+    with connection.cursor() as cursor:
+        apply_pragmas(cursor, pragmas)
+
+    if retry_locked_writes not in connection.execute_wrappers:
+        connection.execute_wrappers.append(retry_locked_writes)
+
+
+# =========================================================
+# Retry Wrapper
+# =========================================================
+def retry_locked_writes(execute, sql, params, many, context):
+    """
+    ``execute_wrapper`` that retries lock errors on repeatable statements
+    and records lock-wait time.
+    """
+    connection = context["connection"]
+    statement = sql.lstrip()[:7].upper()
+    is_begin = statement.startswith("BEGIN")
+    retryable = statement.startswith(WRITE_PREFIXES) and (
+        is_begin or not connection.in_atomic_block
+    )
+
+    if not retryable:
+        return execute(sql, params, many, context)
+
+    retries = _setting("QMS_SQLITE_WRITE_RETRIES", 5)
+    base_delay = _setting("QMS_SQLITE_RETRY_BASE_DELAY", 0.05)
+    delays = backoff_delays(retries, base_delay)
+    waited = 0.0
+
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                result = execute(sql, params, many, context)
+                if is_begin:
+                    # BEGIN IMMEDIATE returns once the write lock is held.
+                    waited += time.perf_counter() - start
+                return result
+            except OperationalError as exc:
+                waited += time.perf_counter() - start
+                delay = next(delays, None) if is_lock_error(exc) else None
+                if delay is None:
+                    if is_lock_error(exc):
+                        registry.inc("qms_sqlite_lock_failures_total", {})
+                    raise
+                registry.inc("qms_sqlite_lock_retries_total", {})
+                time.sleep(delay)
+                waited += delay
+    finally:
+        if waited:
+            registry.inc("qms_sqlite_lock_wait_seconds_total", {}, waited)
@@ -0,0 +1,96 @@
+"""
+Fingerprinted, precompressed static files.
+
+``CompressedManifestStaticFilesStorage`` is Django's manifest storage
+(``name.<hash>.ext`` copies plus ``staticfiles.json``) that also writes
+``.gz`` and, when the ``brotli`` package is installed, ``.br`` variants
+of every compressible file at ``collectstatic`` time. Both the hashed
+and the plain names get variants, so pdf.js (which loads its own files
+by plain name) is served compressed too. A variant is only kept if it
+is smaller than the original.
+
+``core.middleware.StaticAssetMiddleware`` serves the result.
+
+Without a manifest (tests, development without ``collectstatic``)
+``{% static %}`` falls back to the plain name instead of raising.
+"""
+
+import gzip
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:  # optional: gzip variants only
+    brotli = None
+
+
+COMPRESSIBLE_EXTENSIONS = (
+    ".css", ".js", ".mjs", ".map", ".json", ".svg", ".html", ".txt", ".ftl", ".ttf", ".otf", ".wasm",
+)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def encodings():
+    """Precompressed variants written and served, in preference order."""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+VARIANT_SUFFIX = {"br": ".br", "gzip": ".gz"}
+
+
+def compress_file(path):
+    """Write the variants of ``path``; returns how many were kept."""
+    with open(path, "rb") as fh:
+        data = fh.read()
+    if len(data) < _setting("QMS_STATIC_COMPRESS_MIN_BYTES", 256):
+        return 0
+
+    kept = 0
+    for coding in encodings():
+        if coding == "br":
+            content = brotli.compress(data, quality=11)
+        else:
+            content = gzip.compress(data, compresslevel=9, mtime=0)
+
+        target = path + VARIANT_SUFFIX[coding]
+        if len(content) < len(data):
+            with open(target, "wb") as fh:
+                fh.write(content)
+            kept += 1
+        elif os.path.exists(target):
+            os.remove(target)  # stale variant of an older, compressible version
+    return kept
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    manifest_strict = False
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+
+        names = set(paths)
+        names.update(self.hashed_files.values())
+        targets = [
+            self.path(name) for name in sorted(names)
+            if name.endswith(COMPRESSIBLE_EXTENSIONS) and self.exists(name)
+        ]
+        # zlib and brotli release the GIL
+        with ThreadPoolExecutor() as pool:
+            for _ in pool.map(compress_file, targets):
+                pass
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            # Not collected yet: the plain name is served by the finders
+            return name
@@ -0,0 +1,30 @@
+"""
+Storage for files that must only be served through a view that checks
+permissions (e.g. controlled print copies). It lives in
+``QMS_PRIVATE_MEDIA_ROOT``, outside ``MEDIA_ROOT``, and has no URL.
+"""
+
+import os
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible(path="core.storage.PrivateStorage")
+class PrivateStorage(FileSystemStorage):
+
+    # Read on every use, so the setting can change (tests)
+    @property
+    def base_location(self):
+        return getattr(settings, "QMS_PRIVATE_MEDIA_ROOT", os.path.join(settings.BASE_DIR, "private_media"))
+
+    @property
+    def location(self):
+        return os.path.abspath(self.base_location)
+
+    def url(self, name):
+        raise ValueError("Private files have no URL; serve them through a view.")
+
+
+private_storage = PrivateStorage()
@@ -1,3 +1,1449 @@
-from django.test import TestCase
+import errno
+import gzip
+import hashlib
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+import zipfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+
+from django.contrib.auth.models import Group
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.models import Count
+from django.db.utils import OperationalError
+from django.templatetags.static import static
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import Department, User
+from accounts.permissions import GROUP_EMPLOYEE, GROUP_MANAGER, GROUP_QUALITY
+from documents.models import Document, DocumentActivity, DocumentRevision
+from documents.revisions import record_revision
+
+from .background import submit
+from .benchmarks import ViewBenchmark, build_scenarios, compare
+from .digests import _next_user_ids, get_run, send_digests
+from .importing import DocumentImporter, prepare_import, run_import
+from .inbox import inbox_page, mark_all_read, mark_read, unread_count
+from .metrics import registry, render_text
+from .middleware import negotiate_encoding
+from .jobs import claim, enqueue, requeue_expired, run_job, run_pending
+from .loadtest import LoadStats, Session, percentile, plan_sessions
+from .models import (
+    DigestRun, DocumentImport, ImportedFile, Job, Notification, NotificationCounter, PrintRequest,
+    SlowQuery,
+)
+from .notifications import fan_out
+from .printing import queue_page, transition
+from .query_plans import capture_plans, plan_problems
+from .routers import AnalyticsReplicaRouter, use_analytics_db
+from .seeding import SEED_PREFIX, QMSSeeder
+from .sharding import _link_or_copy, is_sharded, shard_media
+from .slow_queries import fingerprint, normalize_sql, params_shape, record_slow_queries
+from .sqlite import retry_locked_writes
+from .tiering import _compress, cold_path, footprint, load_manifest, save_manifest, tier_archived
+
+
+TEST_MEDIA_ROOT = tempfile.mkdtemp(prefix="qms-test-media-")
+TEST_PRIVATE_ROOT = tempfile.mkdtemp(prefix="qms-test-private-")
+
+
+def tearDownModule():
+    shutil.rmtree(TEST_MEDIA_ROOT, ignore_errors=True)
+    shutil.rmtree(TEST_PRIVATE_ROOT, ignore_errors=True)
+
+
+# =========================================================
+# Metrics Endpoint
+# =========================================================
+class MetricsEndpointTests(TestCase):
+
+    def setUp(self):
+        registry.clear()
+        self.user = User.objects.create_user("quality", password="pass")
+        self.user.groups.add(Group.objects.create(name=GROUP_QUALITY))
+        self.user.department = Department.objects.create(name="QA")
+        self.user.save()
+
+    def test_records_view_latency_and_queries(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse("core:kpi_enterprise"), {"range": "7"})
+
+        with self.settings(QMS_METRICS_TOKEN="s3cret"):
+            body = self.client.get(
+                reverse("core:metrics"), HTTP_AUTHORIZATION="Bearer s3cret"
+            ).content.decode()
+
+        self.assertIn(
+            'qms_http_requests_total{method="GET",status="200",view="core:kpi_enterprise"} 1',
+            body,
+        )
+        self.assertIn('qms_http_request_duration_seconds_count{view="core:kpi_enterprise"} 1', body)
+        self.assertIn('qms_db_queries_per_request_bucket{view="core:kpi_enterprise",le="+Inf"} 1', body)
+
+    def test_rejects_remote_scrapers(self):
+        response = self.client.get(reverse("core:metrics"), REMOTE_ADDR="10.0.0.9")
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(QMS_METRICS_TOKEN="s3cret")
+    def test_loopback_needs_the_token(self):
+        # Behind a local reverse proxy every client comes from 127.0.0.1
+        url = reverse("core:metrics")
+        self.assertEqual(self.client.get(url, REMOTE_ADDR="127.0.0.1").status_code, 403)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION="Bearer wrong").status_code, 403)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION="Bearer s3cret").status_code, 200)
+
+        with self.settings(QMS_METRICS_TOKEN=None, QMS_METRICS_ALLOWED_IPS=["127.0.0.1"]):
+            self.assertEqual(self.client.get(url, REMOTE_ADDR="127.0.0.1").status_code, 200)
+
+    def test_snapshots_of_dead_workers_are_pruned(self):
+        directory = tempfile.mkdtemp(prefix="qms-test-metrics-")
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        snapshot = {"counters": [["qms_sqlite_lock_retries_total", [], 3]], "histograms": []}
+        live = os.path.join(directory, f"metrics-{os.getppid()}.json")
+        dead = os.path.join(directory, "metrics-999999999.json")
+        for path in (live, dead):
+            with open(path, "w") as fh:
+                json.dump(snapshot, fh)
+
+        with self.settings(QMS_METRICS_DIR=directory):
+            body = render_text()
+
+        self.assertIn("qms_sqlite_lock_retries_total 3\n", body)
+        self.assertTrue(os.path.exists(live))
+        self.assertFalse(os.path.exists(dead))
+
+
+# =========================================================
+# View Benchmarks (smoke run on a tiny seeded dataset)
+# =========================================================
+class ViewBenchmarkTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        QMSSeeder(seed=7).run(
+            departments=3, users=60, documents=40, activities=300, notifications=50,
+        )
+
+    def test_every_scenario_runs(self):
+        scenarios = build_scenarios()
+        results = ViewBenchmark(repeat=1, warmup=0).run(scenarios)
+
+        self.assertEqual(set(results), {s.name for s in scenarios})
+        self.assertIn("kpi_enterprise_api[range=365]", results)
+        for metrics in results.values():
+            self.assertGreater(metrics["queries"], 0)
+
+    def test_seeded_unread_counters_match_the_inbox(self):
+        unread = dict(
+            Notification.objects.filter(is_read=False).values("recipient_id")
+            .annotate(total=Count("id")).values_list("recipient_id", "total")
+        )
+        self.assertTrue(unread)
+        for user in User.objects.filter(username__startswith=SEED_PREFIX):
+            self.assertEqual(unread_count(user), unread.get(user.pk, 0))
+
+    def test_bench_fails_without_a_baseline(self):
+        missing = os.path.join(TEST_MEDIA_ROOT, "no-baseline.json")
+        with self.assertRaisesMessage(CommandError, "No baseline"):
+            call_command("bench_views", "--baseline", missing, stdout=io.StringIO())
+
+    def test_compare_flags_regressions(self):
+        baseline = {"results": {"quality": {"time_ms": 100.0, "queries": 10, "peak_kb": 500.0}}}
+
+        ok = {"quality": {"time_ms": 110.0, "queries": 10, "peak_kb": 520.0}}
+        slow = {"quality": {"time_ms": 200.0, "queries": 11, "peak_kb": 500.0}}
+
+        self.assertEqual(compare(ok, baseline), [])
+        self.assertEqual(len(compare(slow, baseline)), 2)
+
+
+# =========================================================
+# Load Test Helpers
+# =========================================================
+class ClientSession(Session):
+    """``Session`` that sends its requests through the Django test client."""
+
+    def __init__(self, client, role, stats):
+        super().__init__("http://testserver", "", "", role, stats, random.Random(1), 0)
+        self.client = client
+
+    def request(self, endpoint, path, data=None, text=True):
+        response = self.client.get(path)
+        content = b"".join(response.streaming_content) if response.streaming else response.content
+        self.stats.record(self.role, endpoint, 0.0, response.status_code)
+        return response.status_code, content.decode("utf-8", "replace") if text else content
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class LoadTestTests(TestCase):
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile([], 95), 0.0)
+        self.assertEqual(percentile([7.0], 99), 7.0)
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile(values, 100), 100)
+        self.assertEqual(percentile(values, 0), 1)
+
+    def test_plan_sessions_follows_the_mix_and_skips_roles_without_users(self):
+        users = {GROUP_EMPLOYEE: ["emp1", "emp2"], GROUP_MANAGER: ["mgr"], GROUP_QUALITY: []}
+        mix = {GROUP_EMPLOYEE: 0.5, GROUP_MANAGER: 0.3, GROUP_QUALITY: 0.2}
+
+        plan = plan_sessions(users, mix, 10, random.Random(1))
+
+        roles = [role for role, _username in plan]
+        self.assertEqual(roles, [GROUP_EMPLOYEE] * 5 + [GROUP_MANAGER] * 3)
+        self.assertTrue(all(username in users[role] for role, username in plan))
+        self.assertEqual(plan, plan_sessions(users, mix, 10, random.Random(1)))
+
+    def test_opening_a_document_downloads_its_pdf(self):
+        department = Department.objects.create(name="Production")
+        user = User.objects.create_user("operator", department=department)
+        document = Document.objects.create(title="SOP-1", department=department)
+        document.pdf_file.save("sop.pdf", ContentFile(pdf_bytes("sop")))
+        record_revision(document)
+        document.readers.add(user)
+        self.client.force_login(user)
+
+        stats = LoadStats()
+        ClientSession(self.client, GROUP_EMPLOYEE, stats).open_document(
+            reverse("documents:view", args=[document.pk])
+        )
+
+        self.assertEqual(stats.endpoints[GROUP_EMPLOYEE, "documents:view"].statuses, {"200": 1})
+        self.assertEqual(stats.endpoints[GROUP_EMPLOYEE, "documents:pdf"].statuses, {"200": 1})
+
+    def test_browsing_follows_the_list_links(self):
+        department = Department.objects.create(name="Production")
+        user = User.objects.create_user("operator", department=department)
+        user.groups.add(Group.objects.create(name=GROUP_EMPLOYEE))
+        document = Document.objects.create(title="SOP-1", department=department, created_by=user)
+        document.pdf_file.save("sop.pdf", ContentFile(pdf_bytes("sop")))
+        record_revision(document)
+        self.client.force_login(user)
+
+        stats = LoadStats()
+        session = ClientSession(self.client, GROUP_EMPLOYEE, stats)
+        session.rng = mock.Mock(randint=mock.Mock(return_value=1), choice=lambda links: links[0])
+        session.browse_documents()
+
+        self.assertEqual(
+            set(stats.endpoints),
+            {(GROUP_EMPLOYEE, name) for name in ("documents:list", "documents:view", "documents:pdf")},
+        )
+
+    def test_report_is_per_role(self):
+        stats = LoadStats()
+        for latency in (10.0, 20.0):
+            stats.record(GROUP_EMPLOYEE, "documents:list", latency, 200)
+        stats.record(GROUP_MANAGER, "documents:list", 90.0, 200)
+        stats.record(GROUP_QUALITY, "core:quality", 300.0, 500)
+
+        report = stats.report(10.0)
+
+        self.assertEqual(report["requests"], 4)
+        self.assertEqual(report["endpoints"]["documents:list"]["requests"], 3)
+        self.assertEqual(report["roles"][GROUP_EMPLOYEE]["p99_ms"], 20.0)
+        self.assertEqual(report["roles"][GROUP_MANAGER]["endpoints"]["documents:list"]["p50_ms"], 90.0)
+        self.assertEqual(report["roles"][GROUP_QUALITY]["error_rate"], 1.0)
+
+
+# =========================================================
+# SQLite Retry Wrapper
+# =========================================================
+@override_settings(QMS_SQLITE_RETRY_BASE_DELAY=0)
+class RetryLockedWritesTests(TestCase):
+
+    def _flaky(self, failures):
+        calls = []
+
+        def execute(sql, params, many, context):
+            calls.append(sql)
+            if len(calls) <= failures:
+                raise OperationalError("database is locked")
+            return "ok"
+
+        return execute, calls
+
+    def test_autocommit_write_is_retried(self):
+        registry.clear()
+        execute, calls = self._flaky(failures=2)
+        context = {"connection": mock.Mock(in_atomic_block=False)}
+
+        result = retry_locked_writes(execute, "INSERT INTO t VALUES (1)", (), False, context)
+
+        self.assertEqual(result, "ok")
+        self.assertEqual(len(calls), 3)
+        self.assertIn("qms_sqlite_lock_retries_total 2", render_text())
+
+    def test_write_inside_transaction_is_not_retried(self):
+        execute, calls = self._flaky(failures=1)
+        context = {"connection": mock.Mock(in_atomic_block=True)}
+
+        with self.assertRaises(OperationalError):
+            retry_locked_writes(execute, "UPDATE t SET x = 1", (), False, context)
+        self.assertEqual(len(calls), 1)
+
+    def test_wrapper_installed_on_connection(self):
+        with transaction.atomic():
+            self.assertIn(retry_locked_writes, connection.execute_wrappers)
+
+
+# =========================================================
+# Analytics Replica Router
+# =========================================================
+class AnalyticsReplicaRouterTests(TestCase):
+
+    def setUp(self):
+        self.router = AnalyticsReplicaRouter()
+
+    def _read_db(self, model):
+        return use_analytics_db(lambda: self.router.db_for_read(model))()
+
+    @mock.patch("core.routers.replica_lag", return_value=10)
+    def test_fresh_replica_serves_analytics_reads_only(self, _lag):
+        self.assertEqual(self._read_db(DocumentActivity), "replica")
+        self.assertEqual(self.router.db_for_read(DocumentActivity), "default")
+        self.assertEqual(use_analytics_db(lambda: self.router.db_for_write(DocumentActivity))(), "default")
+
+    @mock.patch("core.routers.replica_lag", return_value=10)
+    def test_permission_models_stay_on_primary(self, _lag):
+        self.assertEqual(self._read_db(User), "default")
+        self.assertEqual(self._read_db(Group), "default")
+
+    @mock.patch("core.routers.replica_lag", return_value=3600)
+    def test_lagging_replica_falls_back_to_primary(self, _lag):
+        self.assertEqual(self._read_db(DocumentActivity), "default")
+
+    @mock.patch("core.routers.replica_lag", return_value=None)
+    def test_never_refreshed_replica_is_ignored(self, _lag):
+        self.assertEqual(self._read_db(DocumentActivity), "default")
+
+
+# =========================================================
+# Throttled Session Persistence
+# =========================================================
+class ThrottledSessionTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user("quality", password="pass")
+        self.user.groups.add(Group.objects.create(name=GROUP_QUALITY))
+        self.client.force_login(self.user)
+
+    def _session_writes(self, path, **params):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(path, params)
+        return [
+            q["sql"] for q in queries.captured_queries
+            if "django_session" in q["sql"] and not q["sql"].startswith("SELECT")
+        ]
+
+    def test_read_only_requests_do_not_write_the_session(self):
+        url = reverse("core:kpi_enterprise")
+        self._session_writes(url)  # first request stamps the session
+
+        for range_key in ("1", "7", "30"):
+            self.assertEqual(self._session_writes(url, range=range_key), [])
+
+    def test_stale_session_is_refreshed(self):
+        url = reverse("core:kpi_enterprise")
+        self._session_writes(url)
+
+        later = time.time() + settings.SESSION_COOKIE_AGE * 0.5
+        with mock.patch("core.middleware.time.time", return_value=later):
+            writes = self._session_writes(url)
+
+        self.assertEqual(len(writes), 1)
+        self.assertIn(settings.SESSION_COOKIE_NAME, self.client.cookies)
+
+
+# =========================================================
+# Notification Fan-out
+# =========================================================
+@override_settings(
+    QMS_BACKGROUND_EAGER=True,
+    QMS_NOTIFICATION_CHUNK_SIZE=2,
+    MEDIA_ROOT=TEST_MEDIA_ROOT,
+)
+class NotificationFanOutTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        production = Department.objects.create(name="Production")
+        other = Department.objects.create(name="HR")
+
+        cls.editor = User.objects.create_user("editor", password="pass", department=production)
+        cls.editor.groups.add(Group.objects.create(name=GROUP_QUALITY))
+
+        cls.staff = [
+            User.objects.create_user(f"op{i}", department=production) for i in range(3)
+        ]
+        User.objects.create_user("inactive", department=production, is_active=False)
+        cls.outside_reader = User.objects.create_user("auditor", department=other)
+        User.objects.create_user("unrelated", department=other)
+
+        cls.document = Document(title="SOP-1", department=production)
+        cls.document.pdf_file.save("sop.pdf", ContentFile(b"%PDF-1.4\n%%EOF\n"))
+        cls.document.readers.add(cls.outside_reader, cls.staff[0])
+
+    def _recipients(self):
+        return set(Notification.objects.values_list("recipient__username", flat=True))
+
+    def test_fan_out_reaches_department_and_readers_once(self):
+        fan_out(self.document.pk, Notification.Type.UPDATED, "evt-1", "msg",
+                exclude_user_id=self.editor.pk)
+        fan_out(self.document.pk, Notification.Type.UPDATED, "evt-1", "msg",
+                exclude_user_id=self.editor.pk)
+
+        self.assertEqual(self._recipients(), {"op0", "op1", "op2", "auditor"})
+        self.assertEqual(Notification.objects.count(), 4)
+
+    def test_disabling_in_document_edit_notifies(self):
+        self.client.force_login(self.editor)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("documents:edit", args=[self.document.pk]), {
+                "title": "SOP-1",
+                "department": self.document.department_id,
+                "status": Document.Status.DISABLED,
+                "disabled_reason": "Superseded",
+                "readers": [self.staff[0].pk],
+            })
+
+        self.assertEqual(self._recipients(), {"op0", "op1", "op2"})
+        self.assertEqual(
+            set(Notification.objects.values_list("type", flat=True)),
+            {Notification.Type.DISABLED},
+        )
+
+
+# =========================================================
+# Notification Inbox / Unread Badge
+# =========================================================
+@override_settings(QMS_BACKGROUND_EAGER=True, MEDIA_ROOT=TEST_MEDIA_ROOT)
+class NotificationInboxTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(name="Production")
+        cls.user = User.objects.create_user("op", password="pass", department=department)
+        cls.user.groups.add(Group.objects.create(name=GROUP_QUALITY))
+        cls.other = User.objects.create_user("op2", department=department)
+
+        cls.document = Document(title="SOP-1", department=department)
+        cls.document.pdf_file.save("sop.pdf", ContentFile(b"%PDF-1.4\n%%EOF\n"))
+
+    def setUp(self):
+        cache.clear()
+
+    def _deliver(self, *keys):
+        with self.captureOnCommitCallbacks(execute=True):
+            for key in keys:
+                fan_out(self.document.pk, Notification.Type.UPDATED, key, "msg")
+
+    def test_counter_follows_new_deliveries_only(self):
+        self._deliver("evt-1", "evt-1", "evt-2")
+
+        self.assertEqual(unread_count(self.user), 2)
+        self.assertEqual(NotificationCounter.objects.get(user=self.other).unread, 2)
+
+    def test_badge_is_a_cached_lookup(self):
+        self._deliver("evt-1")
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(unread_count(self.user), 1)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn("COUNT(", queries[0]["sql"].upper())
+
+        with self.assertNumQueries(0):
+            unread_count(self.user)
+
+    def test_mark_read(self):
+        self._deliver("evt-1", "evt-2", "evt-3")
+        first = Notification.objects.filter(recipient=self.user).first()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(mark_read(self.user, [first.pk, first.pk]), 1)
+        self.assertEqual(unread_count(self.user), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(mark_all_read(self.user), 2)
+        self.assertEqual(unread_count(self.user), 0)
+        self.assertEqual(unread_count(self.other), 3)
+
+    def test_keyset_pages_cover_ties_once(self):
+        self._deliver(*[f"evt-{i}" for i in range(5)])
+        # Identical timestamps: the id breaks the tie
+        Notification.objects.update(created_at=timezone.now())
+
+        seen, cursor = [], None
+        while True:
+            rows, cursor = inbox_page(self.user, cursor, limit=2)
+            seen += [n.pk for n in rows]
+            if cursor is None:
+                break
+
+        expected = list(
+            Notification.objects.filter(recipient=self.user)
+            .order_by("-created_at", "-pk").values_list("pk", flat=True)
+        )
+        self.assertEqual(seen, expected)
+
+    def test_inbox_page_uses_recipient_index(self):
+        self._deliver("evt-1", "evt-2", "evt-3")
+        _, cursor = inbox_page(self.user, limit=1)
+
+        for sql, plan in capture_plans(lambda: inbox_page(self.user, cursor, limit=1)):
+            self.assertEqual(plan_problems(plan), [], f"\n{sql}\n" + "\n".join(plan))
+
+    def test_api_and_header_badge(self):
+        self._deliver("evt-1")
+        self.client.force_login(self.user)
+
+        data = self.client.get(reverse("core:notifications")).json()
+        self.assertEqual(data["unread"], 1)
+        self.assertEqual(data["results"][0]["document"], "SOP-1")
+        self.assertIsNone(data["next"])
+
+        self.assertEqual(
+            self.client.get(reverse("core:notifications"), {"cursor": "nope"}).status_code, 400
+        )
+
+        page = self.client.get(reverse("documents:list")).content.decode()
+        self.assertIn('id="bellBadge">1</span>', page)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            data = self.client.post(reverse("core:notifications_mark_read"), {"all": "1"}).json()
+        self.assertEqual(data, {"marked": 1, "unread": 0})
+
+    def test_deleting_document_recounts(self):
+        self._deliver("evt-1")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Document.objects.get(pk=self.document.pk).delete()
+
+        self.assertEqual(unread_count(self.user), 0)
+
+    def test_prune_keeps_unread_and_recent(self):
+        self._deliver("evt-1", "evt-2")
+        old = timezone.now() - timezone.timedelta(days=200)
+        Notification.objects.filter(event_key="evt-1").update(created_at=old, is_read=True)
+        Notification.objects.filter(event_key="evt-2", recipient=self.other).update(created_at=old)
+
+        call_command("prune_notifications", days=90, stdout=io.StringIO())
+
+        self.assertFalse(Notification.objects.filter(event_key="evt-1").exists())
+        self.assertEqual(Notification.objects.filter(event_key="evt-2").count(), 2)
+
+
+# =========================================================
+# Notification Digests
+# =========================================================
+@override_settings(QMS_DIGEST_PERIOD_HOURS=24, MEDIA_ROOT=TEST_MEDIA_ROOT)
+class NotificationDigestTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(name="Production")
+        cls.users = [
+            User.objects.create_user(f"op{i}", email=f"op{i}@example.com", department=department)
+            for i in range(3)
+        ]
+        User.objects.create_user("no_email", department=department)
+
+        cls.document = Document(title="SOP-1", department=department)
+        cls.document.pdf_file.save("sop.pdf", ContentFile(b"%PDF-1.4\n%%EOF\n"))
+
+    def _deliver(self, *keys):
+        for key in keys:
+            fan_out(self.document.pk, Notification.Type.UPDATED, key, f"SOP-1 {key}")
+
+    def _recipients(self):
+        return sorted(address for message in mail.outbox for address in message.to)
+
+    def test_one_email_per_user_per_period(self):
+        self._deliver("evt-1", "evt-2")
+        now = timezone.now()
+
+        run = send_digests(now=now, batch_size=2)
+
+        self.assertEqual(self._recipients(), ["op0@example.com", "op1@example.com", "op2@example.com"])
+        self.assertEqual(run.emails_sent, 3)
+        self.assertIn("SOP-1 evt-1", mail.outbox[0].body)
+        self.assertIn("SOP-1 evt-2", mail.outbox[0].alternatives[0][0])
+
+        # Same period: nothing new. Next period: only newer notifications.
+        self._deliver("evt-3")
+        send_digests(now=now)
+        self.assertEqual(len(mail.outbox), 3)
+
+        send_digests(now=now + timezone.timedelta(days=1))
+        self.assertEqual(len(mail.outbox), 6)
+        self.assertNotIn("evt-1", mail.outbox[-1].body)
+
+    def test_read_notifications_are_not_mailed(self):
+        self._deliver("evt-1")
+        Notification.objects.exclude(recipient=self.users[0]).update(is_read=True)
+
+        send_digests()
+
+        self.assertEqual(self._recipients(), ["op0@example.com"])
+
+    def test_crashed_run_resumes_without_duplicates(self):
+        self._deliver("evt-1")
+        now = timezone.now()
+        backend = "django.core.mail.backends.locmem.EmailBackend.send_messages"
+        original = mail.get_connection().__class__.send_messages
+        calls = []
+
+        def flaky(connection, messages):
+            calls.append(messages)
+            if len(calls) == 2:
+                raise ConnectionError("SMTP down")
+            return original(connection, messages)
+
+        with mock.patch(backend, flaky), self.assertRaises(ConnectionError):
+            send_digests(now=now, batch_size=1)
+
+        self.assertEqual(self._recipients(), ["op0@example.com"])
+        self.assertIsNone(DigestRun.objects.get().finished_at)
+
+        run = send_digests(now=now, batch_size=1)
+
+        # op1 failed mid-run: released for the next period, never duplicated
+        self.assertEqual(self._recipients(), ["op0@example.com", "op2@example.com"])
+        self.assertIsNotNone(run.finished_at)
+        self.assertTrue(
+            Notification.objects.filter(recipient=self.users[1], digested_at__isnull=True).exists()
+        )
+
+    def test_pending_lookup_uses_partial_index(self):
+        self._deliver("evt-1")
+        run = get_run()
+
+        for sql, plan in capture_plans(lambda: _next_user_ids(run, 10)):
+            self.assertEqual(plan_problems(plan), [], f"\n{sql}\n" + "\n".join(plan))
+            self.assertTrue(any("notif_digest_pending_idx" in line for line in plan), plan)
+
+
+# =========================================================
+# Print Request Queue
+# =========================================================
+@override_settings(
+    QMS_BACKGROUND_EAGER=True, MEDIA_ROOT=TEST_MEDIA_ROOT, QMS_PRIVATE_MEDIA_ROOT=TEST_PRIVATE_ROOT,
+)
+class PrintRequestQueueTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(name="Production")
+        cls.quality = User.objects.create_user("quality", password="pass", department=department)
+        cls.quality.groups.add(Group.objects.create(name=GROUP_QUALITY))
+        cls.requester = User.objects.create_user("op", password="pass", department=department)
+        cls.other = User.objects.create_user("op2", password="pass", department=department)
+
+        cls.document = Document(title="SOP 1", department=department)
+        cls.document.pdf_file.save("sop.pdf", ContentFile(b"%PDF-1.4\n%%EOF\n"))
+        cls.document.readers.add(cls.requester)
+
+        cls.requests = [
+            PrintRequest.objects.create(user=cls.requester, document=cls.document, reason=f"line {i}")
+            for i in range(3)
+        ]
+
+    def _ids(self):
+        return [pr.pk for pr in self.requests]
+
+    def test_bulk_approve_is_one_update_and_skips_handled(self):
+        transition([self.requests[0].pk], PrintRequest.Status.REJECTED, self.quality)
+
+        with CaptureQueriesContext(connection) as queries, \
+                self.captureOnCommitCallbacks(execute=False):
+            changed = transition(self._ids(), PrintRequest.Status.APPROVED, self.quality, "ok")
+
+        updates = [q["sql"] for q in queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(sorted(changed), self._ids()[1:])
+
+        approved = PrintRequest.objects.get(pk=self.requests[1].pk)
+        self.assertEqual(approved.handled_by, self.quality)
+        self.assertIsNotNone(approved.handled_at)
+        self.assertEqual(approved.notes, "ok")
+        self.assertEqual(
+            PrintRequest.objects.get(pk=self.requests[0].pk).status, PrintRequest.Status.REJECTED
+        )
+
+    def _approve(self, print_request):
+        self.client.force_login(self.quality)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("core:print_queue_bulk"), {
+                "action": "approve", "ids": [print_request.pk],
+            })
+        return PrintRequest.objects.get(pk=print_request.pk)
+
+    @mock.patch("core.printing.render_package", return_value=b"%PDF-1.4\n% stamped\n%%EOF\n")
+    def test_approval_prepares_package_for_download(self, _render):
+        print_request = self._approve(self.requests[0])
+
+        self.assertTrue(print_request.package.name.startswith("print_packages/PR-"))
+        # Only the view serves it: not under MEDIA_ROOT, and no URL
+        self.assertTrue(os.path.exists(os.path.join(TEST_PRIVATE_ROOT, print_request.package.name)))
+        self.assertFalse(os.path.exists(os.path.join(TEST_MEDIA_ROOT, print_request.package.name)))
+        with self.assertRaises(ValueError):
+            print_request.package.url
+
+        url = reverse("core:print_request_download", args=[print_request.pk])
+
+        self.client.force_login(self.other)
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.force_login(self.requester)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b"".join(response.streaming_content).startswith(b"%PDF"))
+        self.assertIn("attachment", response["Content-Disposition"])
+
+    @mock.patch("core.printing.pypdf", None)
+    def test_no_unstamped_package_without_pypdf(self):
+        print_request = self._approve(self.requests[0])
+
+        self.assertFalse(print_request.package)
+        self.assertIn("pypdf is not installed", print_request.package_error)
+        self.client.force_login(self.requester)
+        url = reverse("core:print_request_download", args=[print_request.pk])
+        self.assertNotEqual(self.client.get(url).status_code, 200)
+
+    def test_reader_can_request_once(self):
+        PrintRequest.objects.all().delete()
+        self.client.force_login(self.requester)
+        url = reverse("core:print_request_create", args=[self.document.pk])
+
+        self.client.post(url, {"reason": "Shop floor copy"})
+        self.client.post(url, {"reason": "Again"})
+
+        self.assertEqual(PrintRequest.objects.filter(user=self.requester).count(), 1)
+
+    def test_queue_is_quality_only_and_paginated(self):
+        self.client.force_login(self.requester)
+        self.assertEqual(self.client.get(reverse("core:print_queue")).status_code, 302)
+
+        rows, cursor = queue_page(limit=2)
+        more, last = queue_page(cursor=cursor, limit=2)
+        self.assertEqual([pr.pk for pr in rows + more], self._ids()[::-1])
+        self.assertIsNone(last)
+
+        self.client.force_login(self.quality)
+        page = self.client.get(reverse("core:print_queue"), {"cursor": cursor})
+        self.assertContains(page, "line 0")
+        self.assertNotContains(page, "line 2")
+
+    def test_queue_page_uses_status_index(self):
+        _, cursor = queue_page(limit=1)
+        for sql, plan in capture_plans(lambda: queue_page(cursor=cursor, limit=1)):
+            self.assertEqual(plan_problems(plan), [], f"\n{sql}\n" + "\n".join(plan))
+
+
+def flaky_job(key):
+    """Fails until called three times for ``key`` (job retry tests)."""
+    calls = flaky_job.calls.setdefault(key, 0) + 1
+    flaky_job.calls[key] = calls
+    if calls < 3:
+        raise RuntimeError(f"attempt {calls}")
+
+
+flaky_job.calls = {}
+
+
+# =========================================================
+# Job Queue
+# =========================================================
+@override_settings(QMS_JOB_RETRY_BASE_DELAY=0, QMS_BACKGROUND_BACKEND="jobs")
+class JobQueueTests(TestCase):
+
+    def test_claim_is_exclusive_and_priority_ordered(self):
+        low = enqueue("core.jobs.noop")
+        high = enqueue("core.jobs.noop", priority=10)
+        enqueue("core.jobs.noop", delay=3600)
+
+        first = claim("w1", limit=5)
+        self.assertEqual([job.pk for job in first], [high.pk, low.pk])
+        self.assertEqual(claim("w2", limit=5), [])
+
+        job = first[0]
+        self.assertEqual((job.status, job.locked_by, job.attempts), (Job.Status.RUNNING, "w1", 1))
+        self.assertTrue(run_job(job, "w1"))
+        self.assertEqual(Job.objects.get(pk=job.pk).status, Job.Status.DONE)
+
+    def test_failures_retry_then_give_up(self):
+        flaky_job.calls.clear()
+        retried = enqueue(flaky_job, ["a"])
+        doomed = enqueue(flaky_job, ["b"], max_attempts=2)
+
+        run_pending()
+
+        retried.refresh_from_db()
+        doomed.refresh_from_db()
+        self.assertEqual((retried.status, retried.attempts), (Job.Status.DONE, 3))
+        self.assertEqual((doomed.status, doomed.attempts), (Job.Status.FAILED, 2))
+        self.assertIn("attempt 2", doomed.last_error)
+
+    def test_expired_lease_is_requeued(self):
+        enqueue("core.jobs.noop")
+        job = claim("dead-worker", lease_seconds=60)[0]
+        Job.objects.filter(pk=job.pk).update(locked_until=timezone.now() - timezone.timedelta(seconds=1))
+
+        self.assertEqual(requeue_expired(), 1)
+        self.assertEqual(claim("w2")[0].pk, job.pk)
+        # The dead worker can no longer record an outcome
+        run_job(job, "dead-worker")
+        self.assertEqual(Job.objects.get(pk=job.pk).status, Job.Status.RUNNING)
+
+    def test_job_that_kills_its_worker_fails_after_max_attempts(self):
+        job = enqueue("core.jobs.noop", max_attempts=3)
+        for attempt in range(1, 4):
+            self.assertEqual([claimed.pk for claimed in claim("doomed-worker")], [job.pk])
+            Job.objects.filter(pk=job.pk).update(
+                locked_until=timezone.now() - timezone.timedelta(seconds=1)
+            )
+            self.assertEqual(requeue_expired(), 1 if attempt < 3 else 0)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.Status.FAILED, 3))
+        self.assertIn("Lease expired", job.last_error)
+        self.assertEqual(claim("w2"), [])
+
+    def test_submit_queues_a_job(self):
+        submit(flaky_job, "c")
+
+        job = Job.objects.get()
+        self.assertEqual((job.task, job.args), ("core.tests.flaky_job", ["c"]))
+
+
+# =========================================================
+# Bulk Document Import
+# =========================================================
+def pdf_bytes(label):
+    return b"%PDF-1.4\n% " + label.encode() + b"\n%%EOF\n"
+
+
+@override_settings(QMS_BACKGROUND_EAGER=True, MEDIA_ROOT=TEST_MEDIA_ROOT)
+class DocumentImportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.production = Department.objects.create(name="Production", code="PROD")
+        cls.logistics = Department.objects.create(name="Logistics", code="LOG")
+        cls.quality = User.objects.create_user("quality", password="pass", department=cls.production)
+        cls.quality.groups.add(Group.objects.create(name=GROUP_QUALITY))
+        cls.alice = User.objects.create_user("alice", department=cls.production)
+        cls.bob = User.objects.create_user("bob", department=cls.production)
+        cls.carl = User.objects.create_user("carl", department=cls.logistics)
+
+    def setUp(self):
+        self.source = tempfile.mkdtemp(prefix="qms-import-")
+        self.addCleanup(shutil.rmtree, self.source, ignore_errors=True)
+
+    def _write(self, name, content):
+        path = os.path.join(self.source, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as fh:
+            fh.write(content)
+
+    def _csv(self, lines):
+        self._write("manifest.csv", (
+            "file,title,department,status,disabled_reason,description,readers\n"
+            + "\n".join(lines) + "\n"
+        ).encode())
+
+    def _library(self, count):
+        for i in range(count):
+            self._write(f"sop/SOP-{i:03d}.pdf", pdf_bytes(f"sop {i}"))
+        self._csv([f"sop/SOP-{i:03d}.pdf,SOP {i},PROD,active,,,alice;bob" for i in range(count)])
+
+    def _run(self, **options):
+        document_import = prepare_import(self.source, self.quality)
+        return DocumentImporter(document_import, **options).run()
+
+    def test_imports_documents_readers_and_activities_in_bulk(self):
+        self._library(5)
+
+        with CaptureQueriesContext(connection) as queries:
+            document_import = self._run(workers=0, chunk_size=50)
+
+        inserts = [q["sql"] for q in queries if q["sql"].startswith('INSERT INTO "documents_document"')]
+        self.assertEqual(len(inserts), 1)
+
+        self.assertEqual((document_import.status, document_import.imported), (DocumentImport.Status.DONE, 5))
+        documents = Document.objects.filter(title__startswith="SOP ")
+        self.assertEqual(documents.count(), 5)
+        document = documents.get(title="SOP 3")
+        self.assertEqual(document.department, self.production)
+        self.assertEqual(document.created_by, self.quality)
+        self.assertEqual(set(document.readers.values_list("username", flat=True)), {"alice", "bob"})
+        with document.pdf_file.open("rb") as fh:
+            self.assertEqual(fh.read(), pdf_bytes("sop 3"))
+        self.assertEqual(document.current_revision.sha256, hashlib.sha256(pdf_bytes("sop 3")).hexdigest())
+        self.assertEqual(document.current_revision.pdf_file.name, document.pdf_file.name)
+        self.assertEqual(
+            DocumentActivity.objects.filter(action=DocumentActivity.Action.CREATE, user=self.quality).count(), 5
+        )
+
+    def test_invalid_entries_are_journaled_not_imported(self):
+        self._write("good.pdf", pdf_bytes("good"))
+        self._write("copy.pdf", pdf_bytes("good"))
+        self._write("fake.pdf", b"MZ not a pdf")
+        self._write("cut.pdf", b"%PDF-1.4\ntruncated")
+        self._write("other.pdf", pdf_bytes("other"))
+        self._csv([
+            "good.pdf,Good,Production,active,,,alice",
+            "copy.pdf,Copy,PROD,active,,,",
+            "fake.pdf,Fake,PROD,active,,,",
+            "cut.pdf,Cut,PROD,active,,,",
+            "other.pdf,Other,Nowhere,active,,,",
+            "good.pdf,Again,PROD,active,,,",
+            "missing.pdf,Missing,PROD,active,,,",
+            "shared.pdf,Shared,PROD,active,,,carl",
+            "off.pdf,Disabled,PROD,disabled,,,",
+        ])
+
+        document_import = self._run(workers=0)
+
+        self.assertEqual(
+            (document_import.imported, document_import.skipped, document_import.failed, document_import.total),
+            (1, 1, 7, 9),
+        )
+        errors = dict(document_import.files.filter(
+            outcome=ImportedFile.Outcome.FAILED
+        ).values_list("path", "error"))
+        self.assertEqual(errors["fake.pdf"], "not a PDF file")
+        self.assertIn("truncated", errors["cut.pdf"])
+        self.assertIn("unknown department", errors["other.pdf"])
+        self.assertIn("listed twice", errors["good.pdf (entry 6)"])
+        self.assertIn("not found", errors["missing.pdf"])
+        self.assertIn("carl", errors["shared.pdf"])
+        self.assertIn("disabled_reason", errors["off.pdf"])
+        self.assertEqual(
+            document_import.files.get(path="copy.pdf").outcome, ImportedFile.Outcome.DUPLICATE
+        )
+        self.assertEqual(list(Document.objects.values_list("title", flat=True)), ["Good"])
+
+    def test_interrupted_import_resumes_without_duplicates(self):
+        self._library(4)
+        original = DocumentImporter._write
+        calls = []
+
+        def crash_on_third_chunk(importer, *args):
+            calls.append(1)
+            if len(calls) == 3:
+                raise RuntimeError("worker killed")
+            return original(importer, *args)
+
+        with mock.patch.object(DocumentImporter, "_write", crash_on_third_chunk):
+            with self.assertRaises(RuntimeError):
+                self._run(workers=0, chunk_size=1)
+
+        document_import = DocumentImport.objects.get()
+        self.assertEqual(document_import.status, DocumentImport.Status.FAILED)
+        # Call 1 is the (empty) metadata failures, calls 2.. one file each
+        self.assertEqual(document_import.imported, 1)
+
+        document_import = self._run(workers=0, chunk_size=1)
+        self.assertEqual((document_import.status, document_import.imported), (DocumentImport.Status.DONE, 4))
+        self.assertEqual(Document.objects.count(), 4)
+        self.assertEqual(DocumentImport.objects.count(), 1)
+
+    def test_zip_with_json_manifest_through_process_pool(self):
+        archive = os.path.join(self.source, "library.zip")
+        with zipfile.ZipFile(archive, "w") as zf:
+            for i in range(6):
+                zf.writestr(f"pdfs/DOC-{i}.pdf", pdf_bytes(f"doc {i}"))
+            zf.writestr("manifest.json", json.dumps([
+                {"file": f"pdfs/DOC-{i}.pdf", "title": f"Doc {i}", "department": "LOG", "readers": ["carl"]}
+                for i in range(6)
+            ]))
+
+        document_import = DocumentImporter(
+            prepare_import(archive, self.quality), workers=2, chunk_size=2
+        ).run()
+
+        self.assertEqual((document_import.imported, document_import.failed), (6, 0))
+        self.assertEqual(Document.readers.through.objects.filter(user=self.carl).count(), 6)
+
+    def test_quality_upload_runs_import_in_background(self):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as zf:
+            zf.writestr("a.pdf", pdf_bytes("a"))
+            zf.writestr("manifest.csv", "file,title,department\na.pdf,Uploaded,PROD\n")
+
+        uploads = os.path.join(self.source, "uploads")
+        self.client.login(username="quality", password="pass")
+        with override_settings(QMS_IMPORT_UPLOAD_ROOT=uploads):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(reverse("core:document_import"), {
+                    "archive": SimpleUploadedFile("library.zip", buffer.getvalue(), "application/zip"),
+                })
+
+        self.assertRedirects(response, reverse("core:document_import"))
+        self.assertTrue(Document.objects.filter(title="Uploaded").exists())
+        document_import = DocumentImport.objects.get()
+        self.assertEqual(document_import.status, DocumentImport.Status.DONE)
+        # Staged outside MEDIA_ROOT, and gone once imported
+        self.assertEqual(os.path.dirname(document_import.source), uploads)
+        self.assertEqual(os.listdir(uploads), [])
+        self.assertFalse(os.path.exists(os.path.join(settings.MEDIA_ROOT, "imports")))
+
+        page = self.client.get(reverse("core:document_import_detail", args=[document_import.pk]))
+        self.assertContains(page, "No failed entries.")
+
+    def test_import_page_is_quality_only(self):
+        User.objects.create_user("reader", password="pass", department=self.production)
+        self.client.login(username="reader", password="pass")
+        self.assertRedirects(
+            self.client.get(reverse("core:document_import")), reverse("core:home"),
+            fetch_redirect_response=False,
+        )
+
+
+# =========================================================
+# Cold-Storage Tiering
+# =========================================================
+class TieringTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = Department.objects.create(name="Production")
+        cls.quality = User.objects.create_user("quality", password="pass", department=cls.department)
+        cls.quality.groups.add(Group.objects.create(name=GROUP_QUALITY))
+
+    def setUp(self):
+        root = tempfile.mkdtemp(prefix="qms-tiering-")
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        override = override_settings(
+            MEDIA_ROOT=os.path.join(root, "media"),
+            QMS_COLD_STORAGE_ROOT=os.path.join(root, "cold"),
+            QMS_TIER_ARCHIVED_AFTER_DAYS=30,
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def _document(self, title, status, days_ago=60):
+        document = Document.objects.create(title=title, department=self.department, status=status)
+        document.pdf_file.save(f"{title}.pdf", ContentFile(b"%PDF-1.4\n" + b"0" * 50000 + b"%%EOF"))
+        record_revision(document, self.quality)
+        Document.objects.filter(pk=document.pk).update(updated_at=timezone.now() - timedelta(days=days_ago))
+        return Document.objects.get(pk=document.pk)
+
+    def test_archived_files_move_to_cold_storage_and_restore_on_open(self):
+        archived = self._document("old", Document.Status.ARCHIVED)
+        recent = self._document("recent", Document.Status.ARCHIVED, days_ago=1)
+        active = self._document("live", Document.Status.ACTIVE)
+        name, hot = archived.pdf_file.name, archived.pdf_file.path
+
+        moved, saved = tier_archived()
+        self.assertEqual(moved, 1)
+        self.assertGreater(saved, 45000)
+        self.assertFalse(os.path.exists(hot))
+        self.assertTrue(os.path.exists(recent.pdf_file.path))
+        self.assertTrue(os.path.exists(active.pdf_file.path))
+        self.assertEqual(load_manifest()[name]["sha256"], archived.current_revision.sha256)
+
+        # Cold names still exist, so new uploads cannot take them
+        self.assertTrue(archived.pdf_file.storage.exists(name))
+        self.assertEqual(archived.pdf_file.size, 50014)
+
+        self.client.login(username="quality", password="pass")
+        response = self.client.get(archived.pdf_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(b"".join(response.streaming_content)), 50014)
+        self.assertTrue(os.path.exists(hot))
+
+        # Still archived: the next run drops the hot copy without recompressing
+        stored_at = cold_path(name).stat().st_mtime_ns
+        self.assertEqual(tier_archived()[0], 1)
+        self.assertFalse(os.path.exists(hot))
+        self.assertEqual(cold_path(name).stat().st_mtime_ns, stored_at)
+
+    def test_corrupt_cold_copy_is_not_restored(self):
+        archived = self._document("old", Document.Status.ARCHIVED)
+        tier_archived()
+        with gzip.open(cold_path(archived.pdf_file.name), "wb") as fh:
+            fh.write(b"%PDF-1.4 tampered %%EOF")
+
+        with self.assertRaises(OSError):
+            archived.pdf_file.open("rb")
+        self.assertFalse(os.path.exists(archived.pdf_file.path))
+
+    def test_command_reports_footprint(self):
+        self._document("old", Document.Status.ARCHIVED)
+        self._document("live", Document.Status.ACTIVE)
+
+        out = io.StringIO()
+        call_command("tier_documents", "--dry-run", stdout=out)
+        self.assertIn("Would tier 1 file(s)", out.getvalue())
+        self.assertEqual(footprint()["cold_files"], 0)
+
+        call_command("tier_documents", stdout=io.StringIO())
+        usage = footprint()
+        self.assertEqual((usage["hot_files"], usage["cold_files"]), (1, 1))
+        self.assertEqual(usage["saved_bytes"], usage["cold_original_bytes"] - usage["cold_stored_bytes"])
+
+        out = io.StringIO()
+        call_command("tier_documents", "--report", stdout=out)
+        self.assertIn("Saved by compression", out.getvalue())
+
+
+# =========================================================
+# Sharded Media Layout
+# =========================================================
+class ShardMediaTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = Department.objects.create(name="Production")
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="qms-shard-")
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        override = override_settings(
+            MEDIA_ROOT=os.path.join(self.root, "media"),
+            QMS_COLD_STORAGE_ROOT=os.path.join(self.root, "cold"),
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def _flat_document(self, name, content):
+        path = os.path.join(self.root, "media", "documents", "pdfs", name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as fh:
+            fh.write(content)
+        document = Document.objects.create(
+            title=name, department=self.department, pdf_file=f"documents/pdfs/{name}"
+        )
+        record_revision(document)
+        return document
+
+    def test_new_uploads_are_sharded(self):
+        document = Document.objects.create(title="new", department=self.department)
+        document.pdf_file.save("SOP-1.pdf", ContentFile(b"%PDF-1.4 %%EOF"))
+        self.assertTrue(is_sharded(document.pdf_file.name))
+        self.assertRegex(document.pdf_file.name, r"^documents/pdfs/[0-9a-f]{2}/[0-9a-f]{2}/SOP-1\.pdf$")
+
+    def test_command_moves_files_and_rewrites_paths(self):
+        documents = [self._flat_document(f"SOP-{i}.pdf", f"%PDF-1.4 {i} %%EOF".encode()) for i in range(5)]
+        # Superseded revision still pointing at a flat file
+        old = documents[0].current_revision
+        self._flat_document("replaced.pdf", b"%PDF-1.4 new %%EOF")
+        DocumentRevision.objects.filter(pk=old.pk).update(document=Document.objects.get(title="replaced.pdf"), number=9)
+        missing = Document.objects.create(title="gone", department=self.department, pdf_file="documents/pdfs/gone.pdf")
+
+        out = io.StringIO()
+        call_command("shard_media", "--batch-size", "2", stdout=out)
+        self.assertIn("Moved 6 file(s); 0 in cold storage, 1 missing, 0 failed", out.getvalue())
+
+        for document in Document.objects.exclude(pk=missing.pk).select_related("current_revision"):
+            self.assertTrue(is_sharded(document.pdf_file.name), document.pdf_file.name)
+            self.assertEqual(document.current_revision.pdf_file.name, document.pdf_file.name)
+            with document.pdf_file.open("rb") as fh:
+                self.assertEqual(hashlib.sha256(fh.read()).hexdigest(), document.current_revision.sha256)
+        self.assertTrue(is_sharded(DocumentRevision.objects.get(pk=old.pk).pdf_file.name))
+        self.assertEqual(os.listdir(os.path.join(self.root, "media", "documents", "pdfs")).count("SOP-0.pdf"), 0)
+
+        # Nothing left to do
+        out = io.StringIO()
+        call_command("shard_media", stdout=out)
+        self.assertIn("Moved 0 file(s)", out.getvalue())
+
+    def test_batches_never_rescan_rows_left_behind(self):
+        for i in range(5):
+            Document.objects.create(title=f"gone {i}", department=self.department, pdf_file=f"documents/pdfs/gone-{i}.pdf")
+        self._flat_document("SOP-1.pdf", b"%PDF-1.4 1 %%EOF")
+
+        with mock.patch("core.sharding.load_manifest", wraps=load_manifest) as manifest, \
+                CaptureQueriesContext(connection) as ctx:
+            stats = shard_media(batch_size=2)
+
+        self.assertEqual(stats, {"moved": 1, "cold": 0, "missing": 5, "failed": 0})
+        self.assertEqual(manifest.call_count, 4)  # once per batch (3) + cold entries once
+        scans = [q["sql"] for q in ctx.captured_queries if '"pdf_file" REGEXP' in q["sql"]]
+        self.assertTrue(all('"id" >' in sql for sql in scans), scans)
+
+    def test_restored_file_moves_its_cold_copy(self):
+        document = self._flat_document("cold.pdf", b"%PDF-1.4 cold %%EOF")
+        name = document.pdf_file.name
+        sha256 = _compress(default_storage.path(name), cold_path(name))
+        save_manifest({name: {"sha256": sha256, "size": 19, "stored": cold_path(name).stat().st_size}})
+
+        call_command("shard_media", stdout=io.StringIO())
+
+        document.refresh_from_db()
+        new_name = document.pdf_file.name
+        self.assertTrue(is_sharded(new_name))
+        self.assertEqual(list(load_manifest()), [new_name])
+        self.assertTrue(cold_path(new_name).exists())
+        self.assertFalse(cold_path(name).exists())
+        self.assertEqual(footprint()["cold_files"], 1)
+
+    def test_link_or_copy_never_replaces_a_file(self):
+        source = os.path.join(self.root, "source.pdf")
+        target = os.path.join(self.root, "taken", "target.pdf")
+        for path, content in ((source, b"moved"), (target, b"someone else's upload")):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as fh:
+                fh.write(content)
+
+        with self.assertRaises(FileExistsError):
+            _link_or_copy(source, target)
+        with mock.patch("core.sharding.os.link", side_effect=OSError(errno.EXDEV, "cross-device")):
+            with self.assertRaises(FileExistsError):
+                _link_or_copy(source, target)
+            _link_or_copy(source, target + ".new")
+        with open(target, "rb") as fh:
+            self.assertEqual(fh.read(), b"someone else's upload")
+        with open(target + ".new", "rb") as fh:
+            self.assertEqual(fh.read(), b"moved")
+
+
+# =========================================================
+# Conditional GET + Compression
+# =========================================================
+class ConditionalGetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = Department.objects.create(name="Production")
+        cls.quality = User.objects.create_user("quality", password="pass", department=cls.department)
+        cls.quality.groups.add(Group.objects.create(name=GROUP_QUALITY))
+        cls.reader = User.objects.create_user("reader", department=cls.department)
+        cls.documents = [
+            Document.objects.create(title=f"SOP {i}", department=cls.department, created_by=cls.quality)
+            for i in range(30)
+        ]
+
+    def setUp(self):
+        self.client.login(username="quality", password="pass")
+
+    def _revalidate(self, url, etag, **headers):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag, **headers)
+        return response, [q["sql"] for q in ctx.captured_queries]
+
+    def test_document_list_304_skips_the_document_queries(self):
+        url = reverse("documents:list")
+        response = self.client.get(url)
+        etag = response["ETag"]
+        self.assertIn("private", response["Cache-Control"])
+        self.assertIn("no-cache", response["Cache-Control"])
+        self.assertIn("Cookie", response["Vary"])
+
+        response, queries = self._revalidate(url, etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse([sql for sql in queries if 'FROM "documents_document"' in sql])
+
+        # Any change to the data behind the page changes the ETag
+        self.documents[0].readers.add(self.reader)
+        response, _queries = self._revalidate(url, etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+
+        document = self.documents[1]
+        document.title = "Renamed"
+        document.save()
+        self.assertEqual(self._revalidate(url, etag)[0].status_code, 200)
+
+    def test_pending_messages_disable_304(self):
+        url = reverse("documents:list")
+        etag = self.client.get(url)["ETag"]
+        # Queues "Select at least one document" for the redirect target
+        self.client.post(reverse("documents:bulk_status"), {"status": "active"})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("ETag", response)
+
+    def test_json_endpoints(self):
+        for url in (
+            reverse("core:quality"),
+            reverse("core:kpi_enterprise") + "?range=7",
+            reverse("core:security_metrics"),
+            reverse("documents:department_users") + f"?department_id={self.department.pk}",
+        ):
+            etag = self.client.get(url)["ETag"]
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304, url)
+
+        url = reverse("core:kpi_enterprise")
+        etag = self.client.get(url)["ETag"]
+        DocumentActivity.objects.create(
+            document=self.documents[0], user=self.reader, action=DocumentActivity.Action.VIEW
+        )
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        url = reverse("documents:department_users") + f"?department_id={self.department.pk}"
+        etag = self.client.get(url)["ETag"]
+        User.objects.create_user("newcomer", department=self.department)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_compression(self):
+        url = reverse("documents:list")
+        plain = self.client.get(url)
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        # Same page (only the masked CSRF token differs per render)
+        self.assertEqual(len(gzip.decompress(response.content)), len(plain.content))
+        self.assertLess(len(response.content), len(plain.content) / 3)
+        self.assertTrue(response["ETag"].startswith("W/"))
+
+        # The weak ETag still revalidates
+        response, _queries = self._revalidate(url, response["ETag"], HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response.status_code, 304)
+
+        self.assertNotIn("Content-Encoding", self.client.get(url, HTTP_ACCEPT_ENCODING="gzip;q=0").headers)
+        self.assertEqual(negotiate_encoding("br;q=1, gzip;q=0.5", ("br", "gzip")), "br")
+        self.assertEqual(negotiate_encoding("gzip;q=0.5, br;q=0.9", ("gzip",)), "gzip")
+        self.assertEqual(negotiate_encoding("*", ("gzip",)), "gzip")
+        self.assertIsNone(negotiate_encoding("identity", ("br", "gzip")))
+
+
+# =========================================================
+# Static Assets
+# =========================================================
+class StaticAssetTests(TestCase):
+
+    def setUp(self):
+        self.source = tempfile.mkdtemp(prefix="qms-static-src-")
+        self.root = tempfile.mkdtemp(prefix="qms-static-root-")
+        self.addCleanup(shutil.rmtree, self.source, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+
+        os.makedirs(os.path.join(self.source, "qms", "css"))
+        self.css = ".qms-header { color: #1f2937; }\n" * 200
+        with open(os.path.join(self.source, "qms", "css", "header.css"), "w") as fh:
+            fh.write(self.css)
+        with open(os.path.join(self.source, "tiny.txt"), "w") as fh:
+            fh.write("ok")
+
+        overrides = override_settings(
+            STATIC_ROOT=self.root,
+            STATICFILES_DIRS=[self.source],
+            STATICFILES_FINDERS=["django.contrib.staticfiles.finders.FileSystemFinder"],
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def test_unhashed_names_without_manifest(self):
+        self.assertEqual(static("qms/css/header.css"), "/static/qms/css/header.css")
+
+    def test_collectstatic_and_serving(self):
+        call_command("collectstatic", interactive=False, verbosity=0)
+        url = static("qms/css/header.css")
+        self.assertRegex(url, r"^/static/qms/css/header\.[0-9a-f]{12}\.css$")
+        hashed = os.path.join(self.root, url[len("/static/"):])
+        self.assertTrue(os.path.exists(hashed + ".gz"))
+        self.assertTrue(os.path.exists(os.path.join(self.root, "qms", "css", "header.css.gz")))
+        self.assertFalse(os.path.exists(os.path.join(self.root, "tiny.txt.gz")))
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertFalse(ctx.captured_queries)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Content-Type"], "text/css")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertEqual(gzip.decompress(b"".join(response.streaming_content)).decode(), self.css)
+
+        response = self.client.get(url)
+        self.assertNotIn("Content-Encoding", response.headers)
+        self.assertEqual(b"".join(response.streaming_content).decode(), self.css)
+
+        # Plain names (pdf.js) are revalidated instead of cached for good
+        response = self.client.get("/static/qms/css/header.css", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertNotIn("immutable", response["Cache-Control"])
+        self.assertIn("max-age=300", response["Cache-Control"])
+        response = self.client.get(
+            "/static/qms/css/header.css",
+            HTTP_ACCEPT_ENCODING="gzip",
+            HTTP_IF_MODIFIED_SINCE=response["Last-Modified"],
+        )
+        self.assertEqual(response.status_code, 304)
+
+        self.assertEqual(self.client.get("/static/../manage.py").status_code, 404)
+        self.assertEqual(self.client.get("/static/missing.css").status_code, 404)
+
+
+# =========================================================
+# Slow Query Log
+# =========================================================
+class SlowQueryLogTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = Department.objects.create(name="Production")
+        cls.quality = User.objects.create_user("quality", password="pass", department=cls.department)
+        cls.quality.groups.add(Group.objects.create(name=GROUP_QUALITY))
+        Document.objects.create(title="SOP", department=cls.department, created_by=cls.quality)
+
+    def test_fingerprint_ignores_literals_and_list_sizes(self):
+        self.assertEqual(
+            normalize_sql("SELECT * FROM t1 WHERE id IN (%s, %s, %s) AND name = 'x''y' LIMIT 21"),
+            "SELECT * FROM t1 WHERE id IN (...) AND name = ? LIMIT ?",
+        )
+        self.assertEqual(
+            fingerprint('INSERT INTO "t" ("a", "b") VALUES (%s, %s), (%s, %s)'),
+            fingerprint('INSERT INTO "t" ("a", "b") VALUES (%s, %s)'),
+        )
+        self.assertNotEqual(fingerprint("SELECT a FROM t"), fingerprint("SELECT b FROM t"))
+
+        self.assertEqual(params_shape([1, 2, "secret", [1, 2]]), "(int x 2, str, list[2])")
+        self.assertEqual(params_shape([(1, "a"), (2, "b")], many=True), "executemany[2] of (int, str)")
+        self.assertEqual(params_shape(iter([(1,)]), many=True), "executemany")
+
+    @override_settings(QMS_SLOW_QUERY_MS=0)
+    def test_request_queries_are_attributed(self):
+        self.client.login(username="quality", password="pass")
+        self.client.get(reverse("documents:list"))
+
+        samples = list(SlowQuery.objects.filter(view="documents:list"))
+        self.assertTrue(samples)
+        self.assertFalse([s for s in samples if "core_slowquery" in s.sql])
+        self.assertFalse([s for s in samples if "quality" in s.params_shape])
+
+        documents = [s for s in samples if 'FROM "documents_document"' in s.sql]
+        self.assertTrue(documents)
+        self.assertTrue(any(s.call_site.startswith("documents/views.py:") for s in documents))
+        sessions = [s for s in samples if s.sql.startswith('SELECT "django_session"')]
+        self.assertTrue(sessions[0].call_site.startswith("django/contrib/sessions/"))
+
+    @override_settings(QMS_SLOW_QUERY_MS=0, QMS_SLOW_QUERY_MAX_ROWS=5)
+    def test_rotation_and_admin(self):
+        for _ in range(3):
+            with record_slow_queries("job:test"):
+                list(Document.objects.filter(title="SOP"))
+                Department.objects.count()
+        self.assertEqual(SlowQuery.objects.count(), 5)
+
+        with override_settings(QMS_SLOW_QUERY_MS=None):
+            admin = User.objects.create_superuser("root", "root@example.com", "pass")
+            self.client.force_login(admin)
+            response = self.client.get(reverse("admin:core_slowquery_fingerprints"))
+        self.assertEqual(response.status_code, 200)
+        groups = response.context["groups"]
+        self.assertEqual(sum(group["count"] for group in groups), 5)
+        self.assertEqual(len(groups), 2)
+        self.assertContains(response, "job:test")
@@ -0,0 +1,255 @@
+"""
+Cold-storage tiering for archived documents.
+
+``tier_archived`` moves the PDFs of documents archived for more than
+``QMS_TIER_ARCHIVED_AFTER_DAYS`` out of ``MEDIA_ROOT``.
+- Each file is gzipped into ``QMS_COLD_STORAGE_ROOT`` under the same
+  relative name plus ``.gz``.
+- ``manifest.json`` in the cold directory maps every storage name to its
+  sha256, original size and stored size.
+- The order is: write the compressed copy, update the manifest, then
+  delete the hot file. An interrupted run leaves both copies, never
+  neither.
+
+``TieredStorage`` (the default storage) makes this transparent. Opening
+a name that is only in cold storage decompresses it back into hot
+storage first and checks its sha256. ``exists`` and ``size`` answer for
+cold names too, so a new upload never takes a cold file's name. Only
+the tiering job writes the manifest; a restore only adds a hot copy.
+The next run deletes that copy again if the document is still archived.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+READ_BLOCK = 1024 * 1024
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def cold_root():
+    return Path(_setting("QMS_COLD_STORAGE_ROOT", Path(settings.BASE_DIR) / "cold_storage"))
+
+
+# =========================================================
+# Manifest
+# =========================================================
+_manifest_cache = {}
+_manifest_lock = threading.Lock()
+
+
+def load_manifest():
+    """``{name: entry}``, re-read only when the file changes."""
+    path = cold_root() / MANIFEST_NAME
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return {}
+
+    key = (str(path), stat.st_mtime_ns, stat.st_size)
+    with _manifest_lock:
+        if _manifest_cache.get("key") != key:
+            with open(path, encoding="utf-8") as fh:
+                _manifest_cache.update(key=key, entries=json.load(fh))
+        return _manifest_cache["entries"]
+
+
+def save_manifest(entries):
+    root = cold_root()
+    root.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=root, prefix=".manifest-")
+    with os.fdopen(fd, "w", encoding="utf-8") as fh:
+        json.dump(entries, fh, indent=1, sort_keys=True)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, root / MANIFEST_NAME)
+
+
+def cold_path(name):
+    return cold_root() / f"{name}.gz"
+
+
+# =========================================================
+# Move files
+# =========================================================
+def _compress(source_path, target):
+    """gzip ``source_path`` into ``target``; returns the sha256 of the input."""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256()
+    fd, tmp = tempfile.mkstemp(dir=target.parent, prefix=".tier-")
+    try:
+        with open(source_path, "rb") as src, os.fdopen(fd, "wb") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=9, mtime=0) as out:
+                for block in iter(lambda: src.read(READ_BLOCK), b""):
+                    digest.update(block)
+                    out.write(block)
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp, target)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return digest.hexdigest()
+
+
+def restore(name, storage=None):
+    """Decompress a cold file back to hot storage. Returns ``True`` if restored."""
+    storage = storage or default_storage
+    entry = load_manifest().get(name)
+    if entry is None:
+        return False
+
+    hot = Path(storage.path(name))
+    hot.parent.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256()
+    fd, tmp = tempfile.mkstemp(dir=hot.parent, prefix=".restore-")
+    try:
+        with gzip.open(cold_path(name), "rb") as src, os.fdopen(fd, "wb") as out:
+            for block in iter(lambda: src.read(READ_BLOCK), b""):
+                digest.update(block)
+                out.write(block)
+        if digest.hexdigest() != entry["sha256"]:
+            raise OSError(f"Cold copy of {name} is corrupt (sha256 mismatch)")
+        # Concurrent restores of one file just replace each other
+        os.replace(tmp, hot)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+    logger.info("Restored %s from cold storage", name)
+    return True
+
+
+class TieredStorage(FileSystemStorage):
+    """``FileSystemStorage`` that restores cold files on first open."""
+
+    def _open(self, name, mode="rb"):
+        if not os.path.exists(self.path(name)) and name in load_manifest():
+            restore(name, self)
+        return super()._open(name, mode)
+
+    def exists(self, name):
+        return super().exists(name) or name in load_manifest()
+
+    def size(self, name):
+        if not os.path.exists(self.path(name)):
+            entry = load_manifest().get(name)
+            if entry is not None:
+                return entry["size"]
+        return super().size(name)
+
+
+# =========================================================
+# Tiering job
+# =========================================================
+def archived_names(older_than_days=None):
+    """Storage names used only by documents archived before the cutoff."""
+    # Not at module level: the storage backend is imported before the apps
+    from documents.models import Document, DocumentRevision
+
+    days = _setting("QMS_TIER_ARCHIVED_AFTER_DAYS", 30) if older_than_days is None else older_than_days
+    archived = Document.objects.filter(
+        status=Document.Status.ARCHIVED, updated_at__lt=timezone.now() - timedelta(days=days)
+    )
+
+    names = set(archived.exclude(pdf_file="").values_list("pdf_file", flat=True))
+    names.update(
+        DocumentRevision.objects.filter(document__in=archived).values_list("pdf_file", flat=True)
+    )
+    # A file shared with a live document stays hot
+    names.difference_update(
+        Document.objects.exclude(status=Document.Status.ARCHIVED).values_list("pdf_file", flat=True)
+    )
+    return sorted(names)
+
+
+def tier_archived(older_than_days=None, dry_run=False, batch_size=None, log=None):
+    """Move archived PDFs to cold storage; returns ``(files, bytes_saved)``."""
+    log = log or logger.info
+    storage = default_storage
+    batch_size = batch_size or _setting("QMS_TIER_BATCH_SIZE", 200)
+    manifest = dict(load_manifest())
+
+    moved = saved = 0
+    pending = []  # compressed, deleted once the manifest lists them
+
+    def flush():
+        save_manifest(manifest)
+        for path in pending:
+            os.remove(path)
+        pending.clear()
+
+    for name in archived_names(older_than_days):
+        hot = storage.path(name)
+        if not os.path.exists(hot):
+            continue  # already cold, or missing
+
+        size = os.path.getsize(hot)
+        if dry_run:
+            log(f"Would tier {name} ({size} bytes)")
+            moved += 1
+            continue
+
+        entry = manifest.get(name)
+        if entry is None or entry["size"] != size or not cold_path(name).exists():
+            entry = manifest[name] = {
+                "sha256": _compress(hot, cold_path(name)),
+                "size": size,
+                "stored": cold_path(name).stat().st_size,
+                "tiered_at": timezone.now().isoformat(),
+            }
+        # else: restored earlier and still archived, the cold copy is current
+
+        pending.append(hot)
+        moved += 1
+        saved += entry["size"] - entry["stored"]
+        if len(pending) >= batch_size:
+            flush()
+
+    if pending:
+        flush()
+    return moved, saved
+
+
+# =========================================================
+# Report
+# =========================================================
+def footprint():
+    """Bytes in hot and cold storage, and what compression saved."""
+    hot_files = hot_bytes = 0
+    for directory, _dirs, files in os.walk(settings.MEDIA_ROOT):
+        for filename in files:
+            hot_files += 1
+            hot_bytes += os.path.getsize(os.path.join(directory, filename))
+
+    entries = load_manifest().values()
+    original = sum(entry["size"] for entry in entries)
+    stored = sum(entry["stored"] for entry in entries)
+    return {
+        "hot_files": hot_files,
+        "hot_bytes": hot_bytes,
+        "cold_files": len(entries),
+        "cold_original_bytes": original,
+        "cold_stored_bytes": stored,
+        "saved_bytes": original - stored,
+    }
+
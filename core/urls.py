@@ -14,4 +14,23 @@ urlpatterns = [
     # Real-Time Security Counter
     path("security-metrics/", views.security_metrics_api, name="security_metrics"),
     path("kpi-enterprise/", views.kpi_enterprise_api, name="kpi_enterprise"),
+
+    # Print requests
+    path("print-requests/", views.my_print_requests, name="print_requests"),
+    path("print-requests/new/<int:document_pk>/", views.print_request_create, name="print_request_create"),
+    path("print-requests/<int:pk>/download/", views.print_request_download, name="print_request_download"),
+    path("print-requests/queue/", views.print_queue, name="print_queue"),
+    path("print-requests/queue/bulk/", views.print_queue_bulk, name="print_queue_bulk"),
+
+    # Bulk document import
+    path("imports/", views.document_import, name="document_import"),
+    path("imports/<int:pk>/", views.document_import_detail, name="document_import_detail"),
+
+    # Notification inbox (header bell)
+    path("notifications/", views.notifications_api, name="notifications"),
+    path("notifications/unread/", views.notifications_unread_api, name="notifications_unread"),
+    path("notifications/read/", views.notifications_mark_read, name="notifications_mark_read"),
+
+    # Prometheus scrape target
+    path("metrics/", views.metrics_view, name="metrics"),
 ]
\ No newline at end of file
@@ -0,0 +1,170 @@
+"""
+Conditional GET for views built from slowly changing data.
+
+- ``DataVersion`` rows count changes per data set. ``bump`` runs in the
+  writer's transaction (signal receivers below, plus explicit calls from
+  bulk writers that skip signals). A version read is one primary-key
+  lookup.
+- Activities are only ever inserted, so ``activity_mark`` (their
+  ``MAX(id)``) serves as their version. It is read wherever the view
+  reads, so it matches the replica when one is used.
+- ``@conditional(validator)`` computes the ETag from the validator's
+  parts before the view runs. If it matches ``If-None-Match`` the
+  answer is 304 and the view's queries never run.
+  - ``Cache-Control: private, no-cache``: browsers keep the page but
+    always revalidate.
+  - ``Vary: Cookie``: shared caches never serve one user's page to
+    another.
+  - A validator returns ``None`` to skip conditional handling (e.g.
+    pending flash messages).
+
+ETags include ``release()`` so a deploy invalidates every page, and
+per-user parts (user id, CSRF cookie, unread count) so a cached page
+never shows someone else's header or an outdated form token.
+"""
+
+import hashlib
+import os
+from functools import wraps
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F, Max
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+
+from documents.models import DocumentActivity
+
+from .models import DataVersion
+
+
+DOCUMENTS = "documents"
+DEPARTMENTS = "departments"
+USERS = "users"
+
+
+# =========================================================
+# Versions
+# =========================================================
+def bump(*keys):
+    """+1 on each data set in ``keys`` (inside the caller's transaction)."""
+    updated = DataVersion.objects.filter(key__in=keys).update(version=F("version") + 1)
+    if updated < len(keys):
+        DataVersion.objects.bulk_create(
+            [DataVersion(key=key, version=1) for key in keys], ignore_conflicts=True
+        )
+
+
+def versions(*keys):
+    """
+    ``{key: version}`` for ``keys`` (0 when never bumped). Always from the
+    primary; replica-backed views add ``routers.read_source()``.
+    """
+    found = dict(
+        DataVersion.objects.using(DEFAULT_DB_ALIAS).filter(key__in=keys).values_list("key", "version")
+    )
+    return {key: found.get(key, 0) for key in keys}
+
+
+def activity_mark():
+    return DocumentActivity.objects.aggregate(mark=Max("id"))["mark"] or 0
+
+
+# Receivers (connected in CoreConfig.ready): post_save, post_delete,
+# m2m_changed and documents_changed
+def _committed(action):
+    return action in (None, "post_add", "post_remove", "post_clear")
+
+
+def bump_documents(action=None, **kwargs):
+    if _committed(action):
+        bump(DOCUMENTS)
+
+
+def bump_departments(**kwargs):
+    bump(DEPARTMENTS)
+
+
+def bump_users(action=None, **kwargs):
+    if _committed(action):
+        bump(USERS)
+
+
+# =========================================================
+# ETags
+# =========================================================
+_release = {}
+
+
+def release():
+    """
+    ``QMS_RELEASE``, or the newest template/code mtime of the project, so
+    a deploy changes every ETag.
+    """
+    configured = getattr(settings, "QMS_RELEASE", None)
+    if configured:
+        return str(configured)
+
+    if "value" not in _release:
+        roots = [str(settings.BASE_DIR / "templates")] + [
+            app.path for app in apps.get_app_configs()
+            if app.path.startswith(str(settings.BASE_DIR))
+        ]
+        newest = 0
+        for root in roots:
+            for directory, dirs, files in os.walk(root):
+                dirs[:] = [d for d in dirs if d not in ("__pycache__", "migrations")]
+                for name in files:
+                    if name.endswith((".py", ".html")):
+                        newest = max(newest, os.stat(os.path.join(directory, name)).st_mtime_ns)
+        _release["value"] = str(newest)
+    return _release["value"]
+
+
+def make_etag(*parts):
+    digest = hashlib.blake2b(repr((release(),) + parts).encode(), digest_size=16)
+    return f'"{digest.hexdigest()}"'
+
+
+def page_parts(request):
+    """
+    Per-user parts of an HTML page: user, CSRF token, the header bell.
+    ``None`` while flash messages are pending (they render once).
+    """
+    from .inbox import unread_count
+
+    if len(get_messages(request)):
+        return None
+    get_token(request)  # the page embeds a token: make sure the cookie is set
+    return (request.user.pk, request.META.get("CSRF_COOKIE"), unread_count(request.user))
+
+
+def conditional(validator):
+    """304 when ``validator(request, ...)`` (an ETag or ``None``) matches."""
+
+    def decorator(view):
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view(request, *args, **kwargs)
+
+            etag = validator(request, *args, **kwargs)
+            if etag is None:
+                return view(request, *args, **kwargs)
+
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+
+            response.headers.setdefault("ETag", etag)
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ("Cookie",))
+            return response
+
+        return inner
+
+    return decorator
@@ -1,3 +1,5 @@
+import hmac
+import os
 from datetime import timedelta
 
 from django.contrib import messages
@@ -5,15 +7,27 @@ from django.contrib.auth import logout, get_user_model
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.views import LoginView
 from django.db.models import Count, Q
-from django.shortcuts import redirect, render
-from django.urls import reverse_lazy
+from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse, reverse_lazy
 from django.utils import timezone
 from django.views.decorators.http import require_POST
-from django.http import JsonResponse
+from django.http import FileResponse, JsonResponse, HttpResponse
 from django.core.cache import cache
+from django.conf import settings
+from django.utils.text import slugify
 
 from documents.models import Document, DocumentActivity
+from documents.views import _can_view_document
 from accounts.models import Department
+from .background import submit
+from .importing import prepare_import, run_import, upload_storage
+from .inbox import inbox_page, mark_all_read, mark_read, unread_count
+from .keyset import keyset_page
+from .metrics import render_text as render_metrics
+from .models import DocumentImport, ImportedFile, PrintRequest
+from .printing import queue_page, request_print, transition
+from .routers import read_source, use_analytics_db
+from .versions import DEPARTMENTS, DOCUMENTS, USERS, activity_mark, conditional, make_etag, page_parts, versions
 from accounts.permissions import (
     is_quality,
     is_admin_role,
@@ -115,7 +129,35 @@ def home(request):
 # =========================================================
 # Quality Dashboard
 # =========================================================
+def _analytics_etag(request, *parts):
+    """Documents, departments, users and activities as seen by this view."""
+    return make_etag(
+        request.resolver_match.view_name, request.user.pk, *parts,
+        versions(DOCUMENTS, DEPARTMENTS, USERS), read_source(), activity_mark(),
+    )
+
+
+def _quality_etag(request):
+    parts = page_parts(request)
+    if parts is None:
+        return None
+    # The 7-day trend is per calendar day
+    return _analytics_etag(request, parts, timezone.localdate())
+
+
+def _kpi_etag(request):
+    # Ranges are relative to now: let them slide once per bucket
+    bucket = int(timezone.now().timestamp()) // getattr(settings, "QMS_KPI_ETAG_SECONDS", 60)
+    return _analytics_etag(request, request.GET.get("range", "30"), bucket)
+
+
+def _security_etag(request):
+    return _analytics_etag(request)
+
+
 @login_required
+@use_analytics_db
+@conditional(_quality_etag)
 def quality(request):
 
     if not can_add_document(request.user):
@@ -280,6 +322,8 @@ def quality(request):
 # 🔐 Security Metrics API
 # =========================================================
 @login_required
+@use_analytics_db
+@conditional(_security_etag)
 def security_metrics_api(request):
 
     if not can_add_document(request.user):
@@ -321,6 +365,8 @@ def security_metrics_api(request):
 # 📊 Enterprise KPI Range API (Clean + Structured Version)
 # =========================================================
 @login_required
+@use_analytics_db
+@conditional(_kpi_etag)
 def kpi_enterprise_api(request):
 
     if not can_add_document(request.user):
@@ -478,4 +524,283 @@ def kpi_enterprise_api(request):
     }
 
     return JsonResponse(data)
-  
\ No newline at end of file
+  
+
+
+# =========================================================
+# 🖨️ Print Requests
+# =========================================================
+@require_POST
+@login_required
+def print_request_create(request, document_pk):
+    document = get_object_or_404(Document, pk=document_pk)
+
+    if document.status != Document.Status.ACTIVE or not _can_view_document(request.user, document):
+        messages.error(request, "You cannot request a print of this document.")
+        return redirect("documents:list")
+
+    reason = request.POST.get("reason", "").strip()
+    if not reason:
+        messages.error(request, "Please give a reason for the print request.")
+        return redirect("documents:view", pk=document.pk)
+
+    _, created = request_print(request.user, document, reason)
+    if created:
+        messages.success(request, "Print request sent to Quality for approval.")
+    else:
+        messages.info(request, "You already have a pending print request for this document.")
+
+    return redirect("core:print_requests")
+
+
+@login_required
+def my_print_requests(request):
+    qs = (
+        PrintRequest.objects
+        .filter(user=request.user)
+        .select_related("document", "handled_by")
+    )
+    try:
+        print_requests, next_cursor = keyset_page(qs, request.GET.get("cursor"), 25)
+    except ValueError:
+        return redirect("core:print_requests")
+
+    return render(request, "qms-templates/print_requests.html", {
+        "print_requests": print_requests,
+        "next_cursor": next_cursor,
+        "can_add_document": can_add_document(request.user),
+    })
+
+
+@login_required
+def print_queue(request):
+    """
+    Quality approval queue: filter by status / department / title,
+    keyset-paginated (``cursor``).
+    """
+    if not can_add_document(request.user):
+        messages.error(request, "Only Quality can review print requests.")
+        return redirect("core:home")
+
+    status = request.GET.get("status", PrintRequest.Status.PENDING)
+    if status not in PrintRequest.Status.values:
+        status = ""
+    department_id = request.GET.get("department") or None
+    search = request.GET.get("q", "").strip()
+
+    try:
+        print_requests, next_cursor = queue_page(
+            status=status,
+            department_id=department_id,
+            search=search,
+            cursor=request.GET.get("cursor"),
+        )
+    except ValueError:
+        return redirect("core:print_queue")
+
+    filters = request.GET.copy()
+    filters.pop("cursor", None)
+
+    return render(request, "qms-templates/print_queue.html", {
+        "print_requests": print_requests,
+        "next_cursor": next_cursor,
+        "filters": filters.urlencode(),
+        "status": status,
+        "department_id": department_id,
+        "search": search,
+        "statuses": PrintRequest.Status.choices,
+        "departments": Department.objects.filter(is_active=True),
+        "can_add_document": True,
+    })
+
+
+@require_POST
+@login_required
+def print_queue_bulk(request):
+    if not can_add_document(request.user):
+        messages.error(request, "Only Quality can review print requests.")
+        return redirect("core:home")
+
+    target = {
+        "approve": PrintRequest.Status.APPROVED,
+        "reject": PrintRequest.Status.REJECTED,
+    }.get(request.POST.get("action"))
+
+    try:
+        ids = [int(pk) for pk in request.POST.getlist("ids")]
+    except ValueError:
+        ids = []
+
+    if target is None or not ids:
+        messages.error(request, "Select at least one request and an action.")
+    else:
+        changed = transition(ids, target, request.user, request.POST.get("notes", "").strip())
+        messages.success(request, f"{len(changed)} request(s) {target}.")
+        if len(changed) < len(ids):
+            messages.info(request, f"{len(ids) - len(changed)} request(s) were already handled.")
+
+    query = request.POST.get("filters", "")
+    return redirect(f"{reverse('core:print_queue')}?{query}" if query else reverse("core:print_queue"))
+
+
+@login_required
+def print_request_download(request, pk):
+    print_request = get_object_or_404(PrintRequest.objects.select_related("document"), pk=pk)
+
+    if print_request.user_id != request.user.pk and not can_add_document(request.user):
+        messages.error(request, "Access denied.")
+        return redirect("core:print_requests")
+
+    if print_request.status != PrintRequest.Status.APPROVED or not print_request.package:
+        messages.info(request, "The print package is not ready yet.")
+        return redirect("core:print_requests")
+
+    filename = f"{slugify(print_request.document.title) or 'document'}-PR-{print_request.pk}.pdf"
+    return FileResponse(print_request.package.open("rb"), as_attachment=True, filename=filename)
+
+
+# =========================================================
+# 📦 Bulk Document Import
+# =========================================================
+@login_required
+def document_import(request):
+    """
+    Quality uploads a ZIP (PDFs + manifest); the import runs in the
+    background and this page shows its progress.
+    """
+    if not can_add_document(request.user):
+        messages.error(request, "Only Quality can import documents.")
+        return redirect("core:home")
+
+    if request.method == "POST":
+        archive = request.FILES.get("archive")
+        if not archive or not archive.name.lower().endswith(".zip"):
+            messages.error(request, "Upload a ZIP archive with the PDFs and a manifest.")
+            return redirect("core:document_import")
+
+        uploads = upload_storage()
+        name = uploads.save(os.path.basename(archive.name), archive)
+        try:
+            imported = prepare_import(uploads.path(name), request.user)
+        except (OSError, ValueError) as exc:
+            uploads.delete(name)
+            messages.error(request, f"Import rejected: {exc}")
+            return redirect("core:document_import")
+
+        submit(run_import, imported.pk)
+        messages.success(request, f"Import #{imported.pk} queued.")
+        return redirect("core:document_import")
+
+    imports = list(DocumentImport.objects.select_related("created_by")[:20])
+    return render(request, "qms-templates/document_import.html", {
+        "imports": imports,
+        "running": any(i.status in (DocumentImport.Status.PENDING, DocumentImport.Status.RUNNING) for i in imports),
+        "can_add_document": True,
+    })
+
+
+@login_required
+def document_import_detail(request, pk):
+    if not can_add_document(request.user):
+        messages.error(request, "Only Quality can import documents.")
+        return redirect("core:home")
+
+    document_import = get_object_or_404(DocumentImport, pk=pk)
+    failures = document_import.files.filter(
+        outcome=ImportedFile.Outcome.FAILED
+    ).order_by("pk")[:500]
+
+    return render(request, "qms-templates/document_import_detail.html", {
+        "document_import": document_import,
+        "failures": failures,
+        "can_add_document": True,
+    })
+
+
+# =========================================================
+# 🔔 Notification Inbox API
+# =========================================================
+@login_required
+def notifications_api(request):
+    """
+    Inbox page, newest first. Pass ``cursor`` from the previous response
+    to get the next page.
+    """
+    try:
+        limit = int(request.GET.get("limit", 20))
+        rows, next_cursor = inbox_page(request.user, request.GET.get("cursor"), limit)
+    except ValueError:
+        return JsonResponse({"error": "Invalid cursor or limit"}, status=400)
+
+    return JsonResponse({
+        "results": [
+            {
+                "id": n.pk,
+                "type": n.type,
+                "message": n.message,
+                "document": n.document.title,
+                "url": reverse("documents:view", args=[n.document_id]),
+                "is_read": n.is_read,
+                "created_at": n.created_at.isoformat(),
+            }
+            for n in rows
+        ],
+        "next": next_cursor,
+        "unread": unread_count(request.user),
+    })
+
+
+@login_required
+def notifications_unread_api(request):
+    return JsonResponse({"unread": unread_count(request.user)})
+
+
+@require_POST
+@login_required
+def notifications_mark_read(request):
+    """
+    ``all=1`` marks the whole inbox read (one UPDATE); otherwise the
+    notifications listed in ``ids``.
+    """
+    if request.POST.get("all"):
+        marked = mark_all_read(request.user)
+    else:
+        try:
+            ids = [int(pk) for pk in request.POST.getlist("ids")]
+        except ValueError:
+            return JsonResponse({"error": "Invalid ids"}, status=400)
+        marked = mark_read(request.user, ids)
+
+    return JsonResponse({"marked": marked, "unread": unread_count(request.user)})
+
+
+# =========================================================
+# 📈 Prometheus Metrics Endpoint
+# =========================================================
+def _metrics_token_ok(request):
+    token = getattr(settings, "QMS_METRICS_TOKEN", None)
+    if not token:
+        return False
+    scheme, _, value = request.META.get("HTTP_AUTHORIZATION", "").partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(value.strip().encode(), token.encode())
+
+
+def metrics_view(request):
+    """
+    Text exposition for a scraper holding ``QMS_METRICS_TOKEN``, an
+    explicitly allowed IP, or a superuser.
+    """
+    remote_addr = request.META.get("REMOTE_ADDR")
+    allowed_ips = getattr(settings, "QMS_METRICS_ALLOWED_IPS", [])
+
+    if not (
+        _metrics_token_ok(request)
+        or remote_addr in allowed_ips
+        or request.user.is_superuser
+    ):
+        return HttpResponse("Forbidden", status=403, content_type="text/plain")
+
+    return HttpResponse(
+        render_metrics(),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
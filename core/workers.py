@@ -0,0 +1,202 @@
+"""
+Process pool for ``manage.py run_workers``.
+
+The supervisor forks ``processes`` workers and restarts any that die. It
+also returns jobs with expired leases to the queue and purges old
+finished jobs. SIGTERM/SIGINT start a graceful shutdown: each worker
+finishes its current job, gives back the jobs it claimed but did not
+start, and exits. Workers that are still busy after ``grace`` seconds are
+killed, and their leases expire normally.
+
+Successful jobs of a claimed batch are marked done together at the end
+of the batch (one write instead of one per job); a worker that dies
+mid-batch gets those jobs re-run, which is the usual at-least-once
+contract.
+"""
+
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+
+from django.db import close_old_connections, connections
+
+from . import jobs
+
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerOptions:
+    def __init__(self, batch=10, lease=60, poll=1.0, burst=False):
+        self.batch = batch
+        self.lease = lease
+        self.poll = poll
+        self.burst = burst
+
+
+# =========================================================
+# Worker Process
+# =========================================================
+class LeaseKeeper(threading.Thread):
+    """Extends the lease of the jobs a worker holds, every lease / 3."""
+
+    def __init__(self, worker_id, lease):
+        super().__init__(name="qms-lease", daemon=True)
+        self.worker_id = worker_id
+        self.lease = lease
+        self.held = set()
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+
+    def hold(self, job_ids):
+        with self.lock:
+            self.held = set(job_ids)
+
+    def drop(self, job_id):
+        with self.lock:
+            self.held.discard(job_id)
+
+    def run(self):
+        try:
+            while not self.stopped.wait(self.lease / 3):
+                with self.lock:
+                    held = list(self.held)
+                if held:
+                    jobs.extend_leases(held, self.worker_id, self.lease)
+        finally:
+            connections.close_all()
+
+
+def worker_main(stop, options, counter=None):
+    # Shutdown is driven by the supervisor through ``stop``. Ctrl-C reaches
+    # the whole process group, so ignore it here.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    keeper = LeaseKeeper(worker_id, options.lease)
+    keeper.start()
+
+    try:
+        while not stop.is_set():
+            close_old_connections()
+            claimed = jobs.claim(worker_id, options.batch, options.lease)
+            if not claimed:
+                if options.burst:
+                    break
+                stop.wait(options.poll)
+                continue
+
+            keeper.hold(job.pk for job in claimed)
+            pending = list(claimed)
+            succeeded = []
+            while pending and not stop.is_set():
+                job = pending.pop(0)
+                if jobs.run_job(job, worker_id, record_success=False):
+                    # Still leased (and kept alive) until mark_done below
+                    succeeded.append(job.pk)
+                else:
+                    keeper.drop(job.pk)
+
+            # One write per batch instead of one per job
+            jobs.mark_done(succeeded, worker_id)
+            # Shutdown mid-batch: hand the unstarted jobs back
+            jobs.release([job.pk for job in pending], worker_id)
+            keeper.hold(())
+
+            if counter is not None:
+                with counter.get_lock():
+                    counter.value += len(claimed) - len(pending)
+    finally:
+        keeper.stopped.set()
+        keeper.join(timeout=5)
+        connections.close_all()
+
+
+# =========================================================
+# Supervisor
+# =========================================================
+class WorkerPool:
+
+    def __init__(self, processes, options, grace=30, maintenance_interval=None, log=None):
+        self.processes = processes
+        self.options = options
+        self.grace = grace
+        self.maintenance_interval = maintenance_interval or max(1.0, options.lease / 2)
+        self.log = log or logger.info
+
+        self.context = multiprocessing.get_context("fork")
+        self.stop = self.context.Event()
+        self.stopping = False
+        self.counter = self.context.Value("l", 0)
+        self.workers = []
+
+    def _spawn(self):
+        process = self.context.Process(
+            target=worker_main, args=(self.stop, self.options, self.counter), daemon=False
+        )
+        process.start()
+        return process
+
+    def _handle_signal(self, signum, frame):
+        # Only a flag: the Event's lock may be held by the interrupted code
+        self.stopping = True
+
+    def _maintain(self):
+        requeued = jobs.requeue_expired()
+        if requeued:
+            self.log(f"Requeued {requeued} job(s) with expired leases")
+        jobs.purge_finished()
+
+    def run(self):
+        """Run until stopped (or, in burst mode, until the queue is empty)."""
+        signal.signal(signal.SIGTERM, self._handle_signal)
+        signal.signal(signal.SIGINT, self._handle_signal)
+
+        # Children must not inherit open database connections
+        connections.close_all()
+        self.workers = [self._spawn() for _ in range(self.processes)]
+        self.log(f"Started {self.processes} worker process(es)")
+
+        last_maintenance = 0.0
+        try:
+            while not self.stopping:
+                if time.monotonic() - last_maintenance >= self.maintenance_interval:
+                    self._maintain()
+                    connections.close_all()
+                    last_maintenance = time.monotonic()
+
+                alive = []
+                for process in self.workers:
+                    if process.is_alive():
+                        alive.append(process)
+                    elif not self.options.burst and process.exitcode != 0:
+                        self.log(f"Worker {process.pid} died ({process.exitcode}); restarting")
+                        alive.append(self._spawn())
+                self.workers = alive
+
+                if self.options.burst and not self.workers:
+                    break
+                time.sleep(0.2)
+        finally:
+            if self.stopping:
+                self.log("Stopping: finishing current jobs...")
+            self.shutdown()
+
+        return self.counter.value
+
+    def shutdown(self):
+        self.stop.set()
+        deadline = time.monotonic() + self.grace
+        for process in self.workers:
+            process.join(max(0.0, deadline - time.monotonic()))
+        for process in self.workers:
+            if process.is_alive():
+                self.log(f"Worker {process.pid} still busy after {self.grace}s; killing")
+                process.kill()
+                process.join()
+        self.workers = []
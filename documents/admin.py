@@ -1,4 +1,6 @@
 from django.contrib import admin
+
+from core.changelists import ScalableAdminMixin, month_filter
 from .models import Document, DocumentActivity
 
 
@@ -6,7 +8,7 @@ from .models import Document, DocumentActivity
 # Document Admin
 # =========================================================
 @admin.register(Document)
-class DocumentAdmin(admin.ModelAdmin):
+class DocumentAdmin(ScalableAdminMixin, admin.ModelAdmin):
     list_display = (
         "title",
         "department",
@@ -32,12 +34,21 @@ class DocumentAdmin(admin.ModelAdmin):
         "updated_at",
     )
 
+    # __str__ and the list columns read both
+    list_select_related = (
+        "department",
+        "created_by",
+    )
+
+    autocomplete_fields = ("department",)
+    raw_id_fields = ("created_by", "readers")
+
 
 # =========================================================
 # Activity Log Admin
 # =========================================================
 @admin.register(DocumentActivity)
-class DocumentActivityAdmin(admin.ModelAdmin):
+class DocumentActivityAdmin(ScalableAdminMixin, admin.ModelAdmin):
     list_display = (
         "document",
         "user",
@@ -50,6 +61,7 @@ class DocumentActivityAdmin(admin.ModelAdmin):
         "action",
         "department",
         "timestamp",
+        month_filter("timestamp"),
     )
 
     search_fields = (
@@ -66,4 +78,14 @@ class DocumentActivityAdmin(admin.ModelAdmin):
         "timestamp",
     )
 
-    ordering = ("-timestamp",)
\ No newline at end of file
+    ordering = ("-timestamp",)
+
+    # Document.__str__ reads its department
+    list_select_related = (
+        "document__department",
+        "user",
+        "department",
+    )
+
+    # Only the indexed column: other sorts scan the whole table
+    sortable_by = ("timestamp",)
@@ -0,0 +1,199 @@
+"""
+Bulk document operations (Quality).
+
+Each operation changes the whole set in a few statements. Status changes
+are one UPDATE, and reader links are one ``bulk_create`` or one DELETE on
+the through table, which skips the per-row ``m2m_changed`` handling. The
+activity log is written with ``bulk_create``. A single
+``documents_changed`` event is then sent for the set, so side effects run
+once per operation instead of once per document.
+"""
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Document, DocumentActivity
+from .signals import documents_changed
+
+
+User = get_user_model()
+
+
+def select_users(user_ids=None, usernames=None, department_id=None, group_id=None):
+    """
+    Active users picked explicitly and/or by department or group (the
+    criteria add up).
+    """
+    if not (user_ids or usernames or department_id or group_id):
+        raise ValueError("Select readers by user, department or group.")
+
+    criteria = Q()
+    if user_ids:
+        criteria |= Q(pk__in=user_ids)
+    if usernames:
+        criteria |= Q(username__in=usernames)
+    if department_id:
+        criteria |= Q(department_id=department_id)
+    if group_id:
+        criteria |= Q(groups__pk=group_id)
+    return User.objects.filter(criteria, is_active=True).distinct()
+
+
+def select_documents(ids=None, department_id=None, status=None):
+    """
+    Documents picked explicitly (``ids``) or by filter. An empty selection
+    raises ``ValueError`` rather than meaning "everything".
+    """
+    if not ids and not department_id and not status:
+        raise ValueError("Select documents by id, department or status.")
+
+    documents = Document.objects.all()
+    if ids:
+        documents = documents.filter(pk__in=ids)
+    if department_id:
+        documents = documents.filter(department_id=department_id)
+    if status:
+        documents = documents.filter(status=status)
+    return documents
+
+
+def _log(document_ids, actor, action):
+    DocumentActivity.objects.bulk_create([
+        DocumentActivity(
+            document_id=document_id,
+            user=actor,
+            department_id=getattr(actor, "department_id", None),
+            action=action,
+        )
+        for document_id in document_ids
+    ])
+
+
+# =========================================================
+# Status
+# =========================================================
+def bulk_set_status(documents, status, actor, disabled_reason=""):
+    """
+    Move ``documents`` (a queryset) to ``status``. Documents already in
+    that status are left alone. Returns the ids that changed.
+    """
+    if status not in Document.Status.values:
+        raise ValueError(f"Invalid status: {status}")
+    disabled_reason = disabled_reason.strip()
+    if status == Document.Status.DISABLED and not disabled_reason:
+        raise ValueError("Disabled reason is required when status is Disabled.")
+
+    fields = {
+        "status": status,
+        "updated_at": timezone.now(),
+        # As in the edit form: a reason only belongs to a disabled document
+        "disabled_reason": disabled_reason[:255] if status == Document.Status.DISABLED else "",
+    }
+
+    with transaction.atomic():
+        # Write lock is held (BEGIN IMMEDIATE): the rows read here are
+        # exactly the rows the UPDATE changes.
+        pending = documents.exclude(status=status)
+        old_statuses = dict(pending.values_list("pk", "status"))
+        changed = list(old_statuses)
+        if not changed:
+            return []
+
+        # Filtered like the read, not by id: no bound parameter per document
+        pending.update(**fields)
+        _log(changed, actor, DocumentActivity.Action.EDIT)
+
+        documents_changed.send(
+            sender=Document,
+            document_ids=changed,
+            change="status",
+            actor=actor,
+            new_status=status,
+            old_statuses=old_statuses,
+        )
+
+    return changed
+
+
+# =========================================================
+# Readers
+# =========================================================
+def bulk_add_readers(documents, users, actor):
+    """
+    Share ``documents`` with ``users``. As in the document form, a reader
+    must belong to the document's department; other pairs are skipped.
+    Returns ``(links_added, skipped_pairs)``.
+    """
+    through = Document.readers.through
+    document_rows = list(documents.values_list("pk", "department_id"))
+    members = {}
+    for user_id, department_id in users.values_list("pk", "department_id"):
+        members.setdefault(department_id, []).append(user_id)
+    total_users = sum(len(ids) for ids in members.values())
+
+    with transaction.atomic():
+        existing = set(
+            through.objects.filter(
+                document_id__in=documents.values("pk"),
+                user_id__in=users.values("pk"),
+            ).values_list("document_id", "user_id")
+        )
+        links = [
+            through(document_id=document_id, user_id=user_id)
+            for document_id, department_id in document_rows
+            for user_id in members.get(department_id, ())
+            if (document_id, user_id) not in existing
+        ]
+        eligible = sum(len(members.get(department_id, ())) for _pk, department_id in document_rows)
+        skipped = len(document_rows) * total_users - eligible
+
+        # No per-row m2m_changed signals; conflicts (a concurrent add) are ignored
+        through.objects.bulk_create(links, batch_size=1000, ignore_conflicts=True)
+
+        affected = sorted({link.document_id for link in links})
+        if affected:
+            _log(affected, actor, DocumentActivity.Action.EDIT)
+            documents_changed.send(
+                sender=Document,
+                document_ids=affected,
+                change="readers",
+                actor=actor,
+                added=sorted({link.user_id for link in links}),
+                removed=[],
+            )
+
+    return len(links), skipped
+
+
+def bulk_remove_readers(documents, users, actor):
+    """
+    Stop sharing ``documents`` with ``users``: one DELETE. Returns the
+    number of links removed.
+    """
+    through = Document.readers.through
+
+    with transaction.atomic():
+        links = through.objects.filter(
+            document_id__in=documents.values("pk"), user_id__in=users.values("pk")
+        )
+        removed_pairs = list(links.values_list("document_id", "user_id"))
+        if not removed_pairs:
+            return 0
+
+        # Through rows have no cascades or signals: a single DELETE
+        links.delete()
+
+        affected = sorted({document_id for document_id, _user in removed_pairs})
+        _log(affected, actor, DocumentActivity.Action.EDIT)
+        documents_changed.send(
+            sender=Document,
+            document_ids=affected,
+            change="readers",
+            actor=actor,
+            added=[],
+            removed=sorted({user_id for _document, user_id in removed_pairs}),
+        )
+
+    return len(removed_pairs)
@@ -1,13 +1,33 @@
 from django import forms
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import UploadedFile
+
+from accounts.search import reader_label
 
 from .models import Document
+from .uploads import check_uploaded_pdf
 
 User = get_user_model()
 
 
+class ReaderPickerWidget(forms.SelectMultiple):
+    """
+    Renders only the selected readers (one query); other users are found
+    through the autocomplete endpoint and added client-side.
+    """
+
+    def optgroups(self, name, value, attrs=None):
+        ids = [v for v in value if str(v).isdigit()]
+        users = self.choices.queryset.filter(pk__in=ids) if ids else []
+        return [
+            (None, [self.create_option(name, user.pk, reader_label(user), True, index, attrs=attrs)], index)
+            for index, user in enumerate(users)
+        ]
+
+
 class DocumentForm(forms.ModelForm):
     """
     Enterprise Professional Form for creating & editing documents.
@@ -20,7 +40,8 @@ class DocumentForm(forms.ModelForm):
     - Explicit Readers support (NEW)
     """
 
-    MAX_FILE_SIZE_MB = 10
+    # Uploads stream to disk and are parsed out of process (documents.uploads)
+    MAX_FILE_SIZE_MB = getattr(settings, "QMS_PDF_MAX_UPLOAD_MB", 50)
     ALLOWED_CONTENT_TYPES = ["application/pdf"]
 
     class Meta:
@@ -66,9 +87,10 @@ class DocumentForm(forms.ModelForm):
                 "placeholder": "Required if status = Disabled"
             }),
 
-            # 👑 Multiple User Select
-            "readers": forms.SelectMultiple(attrs={
+            # 👑 Selected readers only (search via documents:department_users)
+            "readers": ReaderPickerWidget(attrs={
                 "class": "form-select",
+                "id": "readersSelect",
                 "size": 6,
             }),
         }
@@ -86,6 +108,14 @@ class DocumentForm(forms.ModelForm):
         else:
             department = self.initial.get("department")
 
+        # A submitted department wins, so readers are validated (one
+        # pk__in query) against the department actually being saved.
+        if self.is_bound and self.data.get("department"):
+            try:
+                department = int(self.data.get("department"))
+            except (TypeError, ValueError):
+                pass  # reported as an invalid choice by the department field
+
         if department:
             self.fields["readers"].queryset = User.objects.filter(
                 department=department,
@@ -128,6 +158,10 @@ class DocumentForm(forms.ModelForm):
                 return file
             raise ValidationError(_("PDF file is required."))
 
+        # Rejected while streaming (documents.uploads.PDFUploadHandler)
+        if getattr(file, "upload_error", ""):
+            raise ValidationError(_("Invalid PDF: %(problem)s."), params={"problem": file.upload_error})
+
         if not file.name.lower().endswith(".pdf"):
             raise ValidationError(_("Only PDF files are allowed."))
 
@@ -140,6 +174,12 @@ class DocumentForm(forms.ModelForm):
                 _(f"File too large. Max size is {self.MAX_FILE_SIZE_MB}MB.")
             )
 
+        # Magic bytes / structure (encryption, corruption, decompression bombs)
+        if isinstance(file, UploadedFile):
+            problem = check_uploaded_pdf(file)
+            if problem:
+                raise ValidationError(_("Invalid PDF: %(problem)s."), params={"problem": problem})
+
         return file
 
     # =========================================================
@@ -0,0 +1,32 @@
+# Generated by Django 6.0.2 on 2026-10-19 10:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('documents', '0005_document_readers'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['status', '-updated_at'], name='doc_status_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['department', 'status', '-updated_at'], name='doc_dept_status_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='documentactivity',
+            index=models.Index(fields=['action', 'timestamp', 'user'], name='activity_action_ts_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='documentactivity',
+            index=models.Index(fields=['document', 'action'], name='activity_doc_action_idx'),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 6.0.2 on 2026-10-19 10:46
+
+import hashlib
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_revisions(apps, schema_editor):
+    """Revision 1 for every document whose file is present."""
+    Document = apps.get_model('documents', 'Document')
+    DocumentRevision = apps.get_model('documents', 'DocumentRevision')
+
+    for document in Document.objects.filter(current_revision__isnull=True).exclude(pdf_file='').iterator():
+        storage = document.pdf_file.storage
+        if not storage.exists(document.pdf_file.name):
+            continue
+        digest = hashlib.sha256()
+        with storage.open(document.pdf_file.name, 'rb') as fh:
+            for block in iter(lambda: fh.read(1024 * 1024), b''):
+                digest.update(block)
+        revision = DocumentRevision.objects.create(
+            document=document,
+            number=1,
+            pdf_file=document.pdf_file.name,
+            sha256=digest.hexdigest(),
+            size=storage.size(document.pdf_file.name),
+            uploaded_by_id=document.created_by_id,
+        )
+        Document.objects.filter(pk=document.pk).update(current_revision=revision)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0006_query_plan_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField()),
+                ('pdf_file', models.FileField(max_length=255, upload_to='')),
+                ('sha256', models.CharField(max_length=64)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='documents.document')),
+                ('uploaded_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['document', '-number'],
+            },
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='current_revision',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='documents.documentrevision'),
+        ),
+        migrations.AddIndex(
+            model_name='documentrevision',
+            index=models.Index(fields=['document', 'sha256'], name='revision_doc_sha_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='documentrevision',
+            constraint=models.UniqueConstraint(fields=('document', 'number'), name='unique_revision_number'),
+        ),
+        migrations.RunPython(backfill_revisions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0.2 on 2026-10-19 10:49
+
+import documents.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0007_document_revisions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='document',
+            name='pdf_file',
+            field=models.FileField(max_length=255, upload_to=documents.models.sharded_pdf_path),
+        ),
+    ]
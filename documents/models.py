@@ -1,9 +1,28 @@
+import hashlib
+import os
+
 from django.conf import settings
 from django.db import models
 from django.db.models import Count
+from django.urls import reverse
 from accounts.models import Department
 
 
+PDF_DIR = "documents/pdfs"
+
+
+def shard_prefix(filename):
+    """Two directory levels from the name's hash: ``ab/cd``."""
+    digest = hashlib.sha256(os.path.basename(filename).encode()).hexdigest()
+    return f"{digest[:2]}/{digest[2:4]}"
+
+
+def sharded_pdf_path(instance, filename):
+    # 65,536 directories instead of one flat one (manage.py shard_media
+    # moves files uploaded before this layout)
+    return f"{PDF_DIR}/{shard_prefix(filename)}/{os.path.basename(filename)}"
+
+
 # =========================================================
 # Document Model
 # =========================================================
@@ -25,7 +44,7 @@ class Document(models.Model):
         help_text="Target department for this document"
     )
 
-    pdf_file = models.FileField(upload_to="documents/pdfs/")
+    pdf_file = models.FileField(upload_to=sharded_pdf_path, max_length=255)
 
     status = models.CharField(
         max_length=20,
@@ -53,6 +72,15 @@ class Document(models.Model):
         help_text="Specific users allowed to read this document."
     )
 
+    # Revision whose file is in pdf_file (see DocumentRevision)
+    current_revision = models.ForeignKey(
+        "DocumentRevision",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -61,6 +89,12 @@ class Document(models.Model):
         indexes = [
             models.Index(fields=["status"]),
             models.Index(fields=["department"]),
+            # document_list: order_by("status", "-updated_at"), optionally per department
+            models.Index(fields=["status", "-updated_at"], name="doc_status_updated_idx"),
+            models.Index(
+                fields=["department", "status", "-updated_at"],
+                name="doc_dept_status_updated_idx",
+            ),
         ]
 
     # =====================================================
@@ -79,10 +113,66 @@ class Document(models.Model):
             action=DocumentActivity.Action.ATTEMPT_DISABLED
         ).count()
 
+    @property
+    def pdf_url(self):
+        """Content-addressed URL of the current PDF (cacheable forever)."""
+        if self.current_revision_id:
+            return self.current_revision.url
+        return self.pdf_file.url
+
     def __str__(self):
         return f"{self.title} - {self.department.name}"
 
 
+# =========================================================
+# Document Revisions (immutable uploads)
+# =========================================================
+class DocumentRevision(models.Model):
+    """
+    One uploaded version of a document's PDF. The file is never written
+    again (storage picks a new name for every upload), so it is served
+    from a URL containing its sha256 with an immutable Cache-Control.
+    """
+
+    document = models.ForeignKey(
+        Document,
+        on_delete=models.CASCADE,
+        related_name="revisions"
+    )
+
+    number = models.PositiveIntegerField()
+    pdf_file = models.FileField(max_length=255)
+    sha256 = models.CharField(max_length=64)
+    size = models.PositiveBigIntegerField(default=0)
+
+    uploaded_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+"
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["document", "-number"]
+        constraints = [
+            models.UniqueConstraint(fields=["document", "number"], name="unique_revision_number"),
+        ]
+        indexes = [
+            # document_pdf: WHERE document_id = ? AND sha256 = ?
+            models.Index(fields=["document", "sha256"], name="revision_doc_sha_idx"),
+        ]
+
+    @property
+    def url(self):
+        return reverse("documents:pdf", args=[self.document_id, self.sha256])
+
+    def __str__(self):
+        return f"{self.document_id} r{self.number} ({self.sha256[:12]})"
+
+
 # =========================================================
 # Document Activity Log
 # =========================================================
@@ -131,6 +221,10 @@ class DocumentActivity(models.Model):
         indexes = [
             models.Index(fields=["action"]),
             models.Index(fields=["timestamp"]),
+            # Risk queries: action + timestamp range (+ user NOT NULL), index-only
+            models.Index(fields=["action", "timestamp", "user"], name="activity_action_ts_user_idx"),
+            # Document.disabled_attempts_count
+            models.Index(fields=["document", "action"], name="activity_doc_action_idx"),
         ]
 
     def __str__(self):
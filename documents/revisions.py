@@ -0,0 +1,62 @@
+"""
+Immutable document revisions.
+
+Every PDF upload becomes a ``DocumentRevision``. The document's
+``pdf_file`` and ``current_revision`` point at the newest one. A stored
+file is never written again, because storage gives each upload a new
+name. So ``document_pdf`` can serve a revision from
+``/documents/pdf/<pk>/<sha256>.pdf`` with ``Cache-Control: immutable``.
+A reopened document then costs no network transfer, and a new upload
+changes the URL.
+"""
+
+import hashlib
+
+from django.db import transaction
+from django.db.models import Max
+
+from .models import DocumentRevision
+
+
+READ_BLOCK = 1024 * 1024
+
+
+def file_sha256(field_file):
+    digest = hashlib.sha256()
+    with field_file.open("rb") as fh:
+        for block in iter(lambda: fh.read(READ_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def record_revision(document, user=None, sha256=None):
+    """
+    Make ``document.pdf_file`` (already saved) its newest revision.
+    Pass ``sha256`` when known (``PDFUploadHandler`` computes it while
+    streaming). Uploading the current content again adds no revision.
+    """
+    if not sha256:
+        sha256 = file_sha256(document.pdf_file)
+
+    current = document.current_revision
+    if current is not None and current.sha256 == sha256:
+        if current.pdf_file.name != document.pdf_file.name:
+            # Same bytes under a new name: keep serving the old one
+            document.pdf_file.delete(save=False)
+            document.pdf_file.name = current.pdf_file.name
+            document.save(update_fields=["pdf_file"])
+        return current
+
+    with transaction.atomic():
+        last = document.revisions.aggregate(last=Max("number"))["last"] or 0
+        revision = DocumentRevision.objects.create(
+            document=document,
+            number=last + 1,
+            pdf_file=document.pdf_file.name,
+            sha256=sha256,
+            size=document.pdf_file.size,
+            uploaded_by=user,
+        )
+        document.current_revision = revision
+        document.save(update_fields=["current_revision"])
+    return revision
@@ -0,0 +1,19 @@
+"""
+Document change events.
+
+``documents_changed`` is sent once per bulk operation (not once per row),
+inside the transaction that made the change, with every affected
+document id. Receivers batch their own side effects (notifications,
+caches, access lookups).
+
+Arguments: ``document_ids``, ``change`` (``"status"`` or ``"readers"``),
+``actor`` and change-specific data:
+
+- ``"status"``: ``new_status`` and ``old_statuses`` (``{id: status}``).
+- ``"readers"``: ``added`` and ``removed`` user ids.
+"""
+
+from django.dispatch import Signal
+
+
+documents_changed = Signal()
@@ -1,3 +1,823 @@
-from django.test import TestCase
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zlib
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import Group
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import StopFutureHandlers
+from django.db import connection
+from django.db.models import Count, Q
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import Department, User
+from accounts.permissions import GROUP_MANAGER, GROUP_QUALITY
+from accounts.search import search_users
+from core.changelists import refresh_estimate
+from core.inbox import unread_count
+from core.models import Notification
+from core.notifications import fan_out_many
+from core import pdfcheck
+from core.pdfcheck import MB, check_pdf, inspect_bytes
+from core.query_plans import capture_plans, plan_problems
+
+from .admin import DocumentActivityAdmin
+from .bulk import bulk_add_readers, bulk_remove_readers, bulk_set_status, select_documents, select_users
+from .forms import DocumentForm
+from .models import Document, DocumentActivity, DocumentRevision
+from .signals import documents_changed
+from .uploads import PDFUploadHandler
+from .views import _shared_with
+
+
+# =========================================================
+# Query Plan Regression Checks (EXPLAIN QUERY PLAN)
+# =========================================================
+class HotQueryPlanTests(TestCase):
+    """
+    Every hot query must be index-driven: no full table scan and no temp
+    B-tree sort unless it is inherent to the query (top-N of an aggregate).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = Department.objects.create(name="Production")
+        cls.user = User.objects.create_user("manager", department=cls.department)
+        cls.user.groups.add(Group.objects.create(name=GROUP_MANAGER))
+
+        cls.document = Document.objects.create(
+            title="Procedure", department=cls.department,
+            pdf_file="documents/pdfs/p.pdf", created_by=cls.user,
+        )
+        DocumentActivity.objects.create(
+            document=cls.document, user=cls.user, department=cls.department,
+            action=DocumentActivity.Action.ATTEMPT_DISABLED,
+        )
+        cls.since = timezone.now() - timedelta(days=30)
+
+    def assertPlansClean(self, func, **options):
+        plans = capture_plans(func)
+        self.assertTrue(plans, "hot path issued no SELECT")
+        for sql, plan in plans:
+            problems = plan_problems(plan, **options)
+            self.assertEqual(problems, [], f"\n{sql}\n" + "\n".join(plan))
+
+    def _risk_qs(self):
+        return DocumentActivity.objects.filter(
+            action=DocumentActivity.Action.ATTEMPT_DISABLED,
+            timestamp__gte=self.since,
+            user__isnull=False,
+        )
+
+    # =====================================================
+    # document_list
+    # =====================================================
+    def test_document_list_all_ordered_by_status_updated(self):
+        self.assertPlansClean(lambda: list(
+            Document.objects.select_related("department", "created_by")
+            .order_by("status", "-updated_at")
+        ))
+
+    def test_document_list_department_filter(self):
+        self.assertPlansClean(lambda: list(
+            Document.objects.filter(department_id=self.department.pk)
+            .select_related("department", "created_by")
+            .order_by("status", "-updated_at")
+        ))
+
+    def _shared_list(self, own):
+        # document_list for managers (own = department) and employees
+        # (own = created_by): own documents OR explicit reader (subquery)
+        return lambda: list(
+            Document.objects.filter(own | Q(pk__in=_shared_with(self.user)))
+            .exclude(status=Document.Status.ARCHIVED)
+            .select_related("department", "created_by")
+            .order_by("status", "-updated_at")
+        )
+
+    def assertIndexUnion(self, func, own_index):
+        # Both branches of the OR are index lookups (no scan). Sorting the
+        # union, which is one user's documents, is inherent.
+        self.assertPlansClean(func, allow_temp_btree=("ORDER BY",))
+        (_sql, plan), = capture_plans(func)
+        self.assertTrue(any("MULTI-INDEX OR" in line for line in plan), plan)
+        self.assertTrue(any(own_index in line for line in plan), plan)
+        self.assertTrue(any("documents_document_readers_user_id" in line for line in plan), plan)
+
+    def test_document_list_manager_department_or_shared(self):
+        self.assertIndexUnion(self._shared_list(Q(department=self.user.department)), "(department_id=?)")
+
+    def test_document_list_employee_own_or_shared(self):
+        self.assertIndexUnion(self._shared_list(Q(created_by=self.user)), "(created_by_id=?)")
+
+    # =====================================================
+    # Risk queries (action + timestamp)
+    # =====================================================
+    def test_risk_attempt_count_is_index_only(self):
+        self.assertPlansClean(lambda: self._risk_qs().count(), require_covering=True)
+
+    def test_disabled_today_count_is_index_only(self):
+        self.assertPlansClean(
+            lambda: DocumentActivity.objects.filter(
+                action=DocumentActivity.Action.ATTEMPT_DISABLED,
+                timestamp__gte=timezone.localtime().replace(hour=0, minute=0),
+            ).count(),
+            require_covering=True,
+        )
+
+    def test_risk_top_user_uses_index(self):
+        self.assertPlansClean(
+            lambda: self._risk_qs()
+            .values("user__username")
+            .annotate(total=Count("id"))
+            .order_by("-total")
+            .first(),
+            allow_temp_btree=("GROUP BY", "ORDER BY"),
+        )
+
+    # =====================================================
+    # Document.disabled_attempts_count (document + action)
+    # =====================================================
+    def test_disabled_attempts_count_is_index_only(self):
+        document = Document.objects.get(pk=self.document.pk)
+        self.assertPlansClean(lambda: document.disabled_attempts_count, require_covering=True)
+
+    # =====================================================
+    # Reader picker search
+    # =====================================================
+    def test_reader_search_uses_lower_indexes(self):
+        # Sorting the (prefix-limited) matches of an OR is inherent
+        self.assertPlansClean(lambda: search_users("ma"), allow_temp_btree=("ORDER BY",))
+
+    def test_reader_search_in_department_needs_no_sort(self):
+        self.assertPlansClean(lambda: search_users("ma", department_id=self.department.pk))
+
+    # =====================================================
+    # audit_dashboard page
+    # =====================================================
+    def test_audit_log_page(self):
+        self.assertPlansClean(lambda: list(
+            DocumentActivity.objects.select_related("document", "user", "department")
+            .order_by("-timestamp")[50:75]
+        ))
+
+
+# =========================================================
+# Reader Picker (search-as-you-type)
+# =========================================================
+class ReaderPickerTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = Department.objects.create(name="Production")
+        cls.other = Department.objects.create(name="Logistics")
+        cls.manager = User.objects.create_user("manager", department=cls.department)
+        cls.manager.groups.add(Group.objects.create(name=GROUP_MANAGER))
+
+        cls.alice = User.objects.create_user(
+            "alice", first_name="Alice", last_name="Martin", department=cls.department
+        )
+        cls.bob = User.objects.create_user(
+            "Bob", first_name="Robert", last_name="Mayer", department=cls.department
+        )
+        cls.carol = User.objects.create_user(
+            "carol", first_name="Carol", last_name="Smith", department=cls.department
+        )
+        cls.outsider = User.objects.create_user("mallory", department=cls.other)
+        User.objects.create_user("maggie", department=cls.department, is_active=False)
+
+    def setUp(self):
+        self.client.force_login(self.manager)
+
+    def _search(self, **params):
+        params.setdefault("department_id", self.department.pk)
+        return self.client.get(reverse("documents:department_users"), params)
+
+    def test_prefix_matches_username_first_and_last_name(self):
+        users, _ = search_users("ma", department_id=self.department.pk, exclude_id=self.manager.pk)
+        # last names Martin / Mayer; inactive "maggie" and other departments excluded
+        self.assertEqual([u.username for u in users], ["alice", "Bob"])
+
+    def test_search_is_case_insensitive(self):
+        users, _ = search_users("BO", department_id=self.department.pk)
+        self.assertEqual([u.username for u in users], ["Bob"])
+
+    def test_prefix_does_not_match_inside_names(self):
+        users, _ = search_users("lice", department_id=self.department.pk)
+        self.assertEqual(users, [])
+
+    def test_cursor_pages_without_gaps(self):
+        first = self._search(limit=2).json()
+        self.assertEqual([u["username"] for u in first["users"]], ["alice", "Bob"])
+        self.assertIsNotNone(first["next"])
+
+        second = self._search(limit=2, cursor=first["next"]).json()
+        # The requesting user is never offered as a reader
+        self.assertEqual([u["username"] for u in second["users"]], ["carol"])
+        self.assertIsNone(second["next"])
+
+    def test_response_has_labels(self):
+        users = self._search(q="car").json()["users"]
+        self.assertEqual(users, [{"id": self.carol.pk, "username": "carol", "label": "carol — Carol Smith"}])
+
+    def test_bad_cursor_is_rejected(self):
+        self.assertEqual(self._search(cursor="not-a-cursor").status_code, 400)
+
+    def test_no_department_returns_nothing(self):
+        response = self.client.get(reverse("documents:department_users"))
+        self.assertEqual(response.json(), {"users": [], "next": None})
+
+    def test_edit_form_renders_only_selected_readers(self):
+        document = Document.objects.create(
+            title="Procedure", department=self.department,
+            pdf_file="documents/pdfs/p.pdf", created_by=self.manager,
+        )
+        document.readers.add(self.carol)
+
+        html = str(DocumentForm(instance=document, user=self.manager)["readers"])
+        self.assertIn("carol — Carol Smith", html)
+        self.assertIn("selected", html)
+        self.assertNotIn("alice", html)
+
+    def test_reader_from_other_department_is_invalid(self):
+        form = DocumentForm(
+            data={
+                "title": "Procedure", "department": self.department.pk,
+                "status": Document.Status.ACTIVE,
+                "readers": [self.outsider.pk],
+            },
+            user=self.manager,
+        )
+        form.is_valid()
+        self.assertIn("readers", form.errors)
+
+    def test_non_numeric_department_is_a_form_error(self):
+        form = DocumentForm(
+            data={"title": "Procedure", "department": "abc", "status": Document.Status.ACTIVE},
+            user=self.manager,
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn("department", form.errors)
+
+
+# =========================================================
+# Bulk Status Change
+# =========================================================
+@override_settings(QMS_BACKGROUND_EAGER=True)
+class BulkStatusTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = Department.objects.create(name="Production")
+        cls.other = Department.objects.create(name="Logistics")
+        cls.quality = User.objects.create_user("quality", password="pass", department=cls.other)
+        cls.quality.groups.add(Group.objects.create(name=GROUP_QUALITY))
+        cls.operator = User.objects.create_user("op", password="pass", department=cls.department)
+        cls.guest = User.objects.create_user("guest", password="pass", department=cls.other)
+
+        cls.documents = [
+            Document.objects.create(
+                title=f"SOP {i}", department=cls.department, pdf_file=f"documents/pdfs/{i}.pdf",
+            )
+            for i in range(4)
+        ]
+        cls.documents[0].readers.add(cls.guest)
+        Document.objects.filter(pk=cls.documents[3].pk).update(status=Document.Status.DISABLED)
+        cls.elsewhere = Document.objects.create(
+            title="Other", department=cls.other, pdf_file="documents/pdfs/o.pdf",
+        )
+
+    def test_one_update_and_bulk_activities(self):
+        with CaptureQueriesContext(connection) as queries, \
+                self.captureOnCommitCallbacks(execute=False):
+            changed = bulk_set_status(
+                select_documents(department_id=self.department.pk),
+                Document.Status.DISABLED, self.quality, "Superseded by rev B",
+            )
+
+        sql = [q["sql"] for q in queries]
+        updates = [q for q in sql if q.startswith('UPDATE "documents_document"')]
+        self.assertEqual(len(updates), 1)
+        # Filtered like the selection, not one parameter per document
+        self.assertNotIn('"id" IN', updates[0])
+        self.assertEqual(len([q for q in sql if q.startswith('INSERT INTO "documents_documentactivity"')]), 1)
+
+        # The already-disabled document is skipped
+        self.assertEqual(sorted(changed), [d.pk for d in self.documents[:3]])
+        document = Document.objects.get(pk=self.documents[0].pk)
+        self.assertEqual((document.status, document.disabled_reason), ("disabled", "Superseded by rev B"))
+        self.assertEqual(
+            DocumentActivity.objects.filter(action=DocumentActivity.Action.EDIT, user=self.quality).count(), 3
+        )
+        self.assertEqual(Document.objects.get(pk=self.elsewhere.pk).status, Document.Status.ACTIVE)
+
+    def test_reactivating_clears_the_disabled_reason(self):
+        disabled = self.documents[3]
+        Document.objects.filter(pk=disabled.pk).update(disabled_reason="Recalled")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_set_status(select_documents(ids=[disabled.pk]), Document.Status.ACTIVE, self.quality)
+
+        disabled.refresh_from_db()
+        self.assertEqual((disabled.status, disabled.disabled_reason), (Document.Status.ACTIVE, ""))
+
+    def test_disabled_requires_reason_and_selection_is_required(self):
+        with self.assertRaises(ValueError):
+            bulk_set_status(select_documents(ids=[self.documents[0].pk]), Document.Status.DISABLED, self.quality)
+        with self.assertRaises(ValueError):
+            select_documents()
+
+    def test_one_event_and_batched_notifications(self):
+        receiver = mock.Mock()
+        documents_changed.connect(receiver, sender=Document)
+        self.addCleanup(documents_changed.disconnect, receiver, sender=Document)
+
+        with mock.patch("core.notifications.fan_out_many", wraps=fan_out_many) as fan_out, \
+                self.captureOnCommitCallbacks(execute=True):
+            changed = bulk_set_status(
+                select_documents(ids=[d.pk for d in self.documents]),
+                Document.Status.DISABLED, self.quality, "Retired",
+            )
+
+        receiver.assert_called_once()
+        self.assertEqual(sorted(receiver.call_args.kwargs["document_ids"]), sorted(changed))
+        # One background fan-out for the whole set
+        fan_out.assert_called_once()
+
+    def test_large_selections_fan_out_in_chunks(self):
+        with mock.patch("core.notifications.DOCUMENT_ID_CHUNK_SIZE", 2), \
+                mock.patch("core.notifications.fan_out_many", wraps=fan_out_many) as fan_out, \
+                self.captureOnCommitCallbacks(execute=True):
+            bulk_set_status(
+                select_documents(department_id=self.department.pk),
+                Document.Status.DISABLED, self.quality, "Retired",
+            )
+
+        self.assertEqual([len(call.args[0]) for call in fan_out.call_args_list], [2, 1])
+        self.assertEqual(Notification.objects.filter(recipient=self.operator).count(), 3)
+
+        # Department member: every changed document; explicit reader: one
+        self.assertEqual(Notification.objects.filter(recipient=self.operator).count(), 3)
+        self.assertEqual(unread_count(self.operator), 3)
+        self.assertEqual(Notification.objects.filter(recipient=self.guest).count(), 1)
+        self.assertFalse(Notification.objects.filter(recipient=self.quality).exists())
+
+    def test_bulk_bar_and_api(self):
+        self.client.login(username="quality", password="pass")
+
+        response = self.client.post(reverse("documents:bulk_status"), {
+            "ids": [self.documents[0].pk, self.documents[1].pk],
+            "status": Document.Status.ARCHIVED,
+        })
+        self.assertRedirects(response, reverse("documents:list"), fetch_redirect_response=False)
+        self.assertEqual(
+            Document.objects.filter(status=Document.Status.ARCHIVED).count(), 2
+        )
+
+        response = self.client.post(
+            reverse("documents:bulk_status_api"),
+            json.dumps({"department": self.department.pk, "filter_status": "archived", "status": "active"}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.json()["updated"], 2)
+
+        response = self.client.post(
+            reverse("documents:bulk_status_api"), json.dumps({"status": "active"}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_api_requires_quality(self):
+        self.client.login(username="op", password="pass")
+        response = self.client.post(
+            reverse("documents:bulk_status_api"),
+            json.dumps({"ids": [self.documents[0].pk], "status": "archived"}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 403)
+
+
+# =========================================================
+# Bulk Reader Assignment
+# =========================================================
+class BulkReadersTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = Department.objects.create(name="Production")
+        cls.other = Department.objects.create(name="Logistics")
+        cls.quality = User.objects.create_user("quality", password="pass", department=cls.other)
+        cls.quality.groups.add(Group.objects.create(name=GROUP_QUALITY))
+        cls.shift = Group.objects.create(name="Shift A")
+
+        cls.operators = [
+            User.objects.create_user(f"op{i}", department=cls.department) for i in range(3)
+        ]
+        for operator in cls.operators[:2]:
+            operator.groups.add(cls.shift)
+        cls.outsider = User.objects.create_user("driver", department=cls.other)
+        cls.outsider.groups.add(cls.shift)
+
+        cls.documents = [
+            Document.objects.create(
+                title=f"SOP {i}", department=cls.department, pdf_file=f"documents/pdfs/{i}.pdf",
+            )
+            for i in range(3)
+        ]
+        cls.documents[0].readers.add(cls.operators[0])
+
+    def _documents(self):
+        return select_documents(department_id=self.department.pk)
+
+    def test_add_by_group_is_one_insert_and_skips_other_departments(self):
+        receiver = mock.Mock()
+        documents_changed.connect(receiver, sender=Document)
+        self.addCleanup(documents_changed.disconnect, receiver, sender=Document)
+
+        with CaptureQueriesContext(connection) as queries:
+            added, skipped = bulk_add_readers(
+                self._documents(), select_users(group_id=self.shift.pk), self.quality
+            )
+
+        inserts = [
+            q["sql"] for q in queries
+            if q["sql"].startswith("INSERT") and '"documents_document_readers"' in q["sql"]
+        ]
+        self.assertEqual(len(inserts), 1)
+        # Existing links are looked up with a subquery, not an id list
+        lookup = next(
+            q["sql"] for q in queries
+            if q["sql"].startswith("SELECT") and 'FROM "documents_document_readers"' in q["sql"]
+        )
+        self.assertIn('"document_id" IN (SELECT', lookup)
+        # 3 documents x 2 shift operators, minus the existing link; driver skipped
+        self.assertEqual((added, skipped), (5, 3))
+        self.assertFalse(self.outsider.shared_documents.exists())
+        self.assertEqual(self.operators[1].shared_documents.count(), 3)
+
+        receiver.assert_called_once()
+        self.assertEqual(receiver.call_args.kwargs["change"], "readers")
+        self.assertEqual(receiver.call_args.kwargs["added"], sorted(u.pk for u in self.operators[:2]))
+
+    def test_adding_twice_adds_nothing(self):
+        users = select_users(department_id=self.department.pk)
+        bulk_add_readers(self._documents(), users, self.quality)
+        self.assertEqual(bulk_add_readers(self._documents(), users, self.quality), (0, 0))
+
+    def test_remove_is_one_delete(self):
+        bulk_add_readers(self._documents(), select_users(department_id=self.department.pk), self.quality)
+
+        with CaptureQueriesContext(connection) as queries:
+            removed = bulk_remove_readers(
+                select_documents(ids=[d.pk for d in self.documents[:2]]),
+                select_users(usernames=["op0", "op2"]),
+                self.quality,
+            )
+
+        deletes = [q["sql"] for q in queries if q["sql"].startswith("DELETE")]
+        self.assertEqual(len(deletes), 1)
+        self.assertEqual(removed, 4)
+        self.assertEqual(
+            list(self.documents[0].readers.values_list("username", flat=True)), ["op1"]
+        )
+        self.assertEqual(self.documents[2].readers.count(), 3)
+
+    def test_api_and_bulk_bar(self):
+        self.client.login(username="quality", password="pass")
+
+        response = self.client.post(
+            reverse("documents:bulk_readers_api"),
+            json.dumps({
+                "department": self.department.pk,
+                "mode": "add",
+                "readers": {"user_ids": [self.operators[2].pk, self.outsider.pk]},
+            }),
+            content_type="application/json",
+        )
+        self.assertEqual(response.json(), {"added": 3, "skipped": 3})
+
+        response = self.client.post(reverse("documents:bulk_readers"), {
+            "ids": [self.documents[1].pk],
+            "reader_usernames": "op2",
+            "mode": "remove",
+        })
+        self.assertRedirects(response, reverse("documents:list"), fetch_redirect_response=False)
+        self.assertFalse(self.documents[1].readers.filter(username="op2").exists())
+
+        response = self.client.post(
+            reverse("documents:bulk_readers_api"),
+            json.dumps({"ids": [self.documents[0].pk], "mode": "add", "readers": {}}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+# =========================================================
+# PDF Upload Validation
+# =========================================================
+def build_pdf(content=b"BT /F1 12 Tf (Hello) Tj ET", trailer=b""):
+    stream = zlib.compress(content)
+    return (
+        b"%PDF-1.7\n"
+        b"1 0 obj << /Type /Catalog /Pages 2 0 R >> endobj\n"
+        b"2 0 obj << /Type /Pages /Kids [3 0 R] /Count 1 >> endobj\n"
+        b"3 0 obj << /Type /Page /Parent 2 0 R /Contents 4 0 R >> endobj\n"
+        b"4 0 obj << /Length " + str(len(stream)).encode() + b" /Filter /FlateDecode >>\n"
+        b"stream\n" + stream + b"\nendstream endobj\n"
+        b"trailer << /Root 1 0 R " + trailer + b">>\n%%EOF\n"
+    )
+
+
+@override_settings(QMS_PDF_MAX_INFLATED_MB=1)
+class PDFUploadValidationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = Department.objects.create(name="Production")
+        cls.quality = User.objects.create_user("quality", password="pass", department=cls.department)
+        cls.quality.groups.add(Group.objects.create(name=GROUP_QUALITY))
+
+    def test_structure_checks(self):
+        self.assertEqual(inspect_bytes(build_pdf(), MB), "")
+        self.assertEqual(inspect_bytes(b"MZ\x90\x00", MB), "not a PDF file")
+        self.assertIn("%%EOF", inspect_bytes(build_pdf()[:-7], MB))
+        self.assertIn("encrypted", inspect_bytes(build_pdf(trailer=b"/Encrypt 9 0 R "), MB))
+        # ~5 MB of zeros compress to a few KB
+        self.assertIn("decompresses to more than 1MB", inspect_bytes(build_pdf(b"\0" * 5 * MB), MB))
+
+    def test_pool_check_and_recovery(self):
+        with open(self._tmp(build_pdf(b"\0" * 5 * MB)), "rb") as fh:
+            self.assertIn("decompresses", check_pdf(fh.name))
+
+        # A worker killed mid-check (as by RLIMIT_CPU) breaks the pool;
+        # the check is retried once on a fresh pool
+        pool = pdfcheck._pool
+        for process in list(pool._processes.values()):
+            process.kill()
+            process.join()
+        self.assertEqual(check_pdf(self._tmp(build_pdf())), "")
+        self.assertIsNot(pdfcheck._pool, pool)
+
+        # A file that breaks the pool again is rejected
+        self.assertEqual(pdfcheck._run_in_pool(os._exit, 1), "PDF is too complex to verify")
+        self.assertEqual(check_pdf(self._tmp(build_pdf())), "")
+
+    @override_settings(QMS_PDF_CHECK_TIMEOUT=2)
+    def test_timeout_discards_pool_without_failing_concurrent_checks(self):
+        pool = pdfcheck._get_pool(2, 512 * MB)
+        results = {}
+
+        def victim():
+            time.sleep(1)  # starts while the hanging check runs, ends after it is killed
+            results["victim"] = pdfcheck._run_in_pool(time.sleep, 1.5)
+
+        thread = threading.Thread(target=victim)
+        with mock.patch.object(pdfcheck, "_discard_pool", wraps=pdfcheck._discard_pool) as discard:
+            thread.start()
+            self.assertEqual(pdfcheck._run_in_pool(time.sleep, 30), "PDF took too long to verify")
+            thread.join()
+
+        # The victim's check broke with the pool and was retried, not rejected
+        self.assertEqual(discard.call_count, 2)
+        self.assertIsNone(results["victim"])
+        self.assertIsNot(pdfcheck._pool, pool)
+
+    def _tmp(self, data):
+        handle = tempfile.NamedTemporaryFile(suffix=".pdf", delete=False)
+        handle.write(data)
+        handle.close()
+        self.addCleanup(os.remove, handle.name)
+        return handle.name
+
+    def test_handler_stops_writing_at_bad_magic(self):
+        handler = PDFUploadHandler()
+        with self.assertRaises(StopFutureHandlers):
+            handler.new_file("pdf_file", "evil.pdf", "application/pdf", None)
+
+        self.assertIsNone(handler.receive_data_chunk(b"MZ\x90\x00\x03" + b"A" * 100, 0))
+        self.assertIsNone(handler.receive_data_chunk(b"B" * 100, 105))
+        self.assertTrue(handler.file.closed)
+
+        rejected = handler.file_complete(205)
+        self.assertEqual(rejected.upload_error, "not a PDF file")
+
+    def test_handler_hashes_and_passes_other_fields(self):
+        handler = PDFUploadHandler()
+        handler.new_file("archive", "a.zip", "application/zip", None)
+        self.assertEqual(handler.receive_data_chunk(b"PK", 0), b"PK")
+        self.assertIsNone(handler.file_complete(2))
+
+        data = build_pdf()
+        with self.assertRaises(StopFutureHandlers):
+            handler.new_file("pdf_file", "ok.pdf", "application/pdf", len(data))
+        handler.receive_data_chunk(data[:10], 0)
+        handler.receive_data_chunk(data[10:], 10)
+        uploaded = handler.file_complete(len(data))
+        self.assertEqual(uploaded.sha256, hashlib.sha256(data).hexdigest())
+        self.assertEqual(uploaded.read(), data)
+        uploaded.close()
+
+    def test_upload_rejects_fake_and_accepts_real_pdf(self):
+        self.client.login(username="quality", password="pass")
+        fields = {"title": "SOP", "department": self.department.pk, "status": "active"}
+
+        response = self.client.post(reverse("documents:create"), {
+            **fields, "pdf_file": SimpleUploadedFile("fake.pdf", b"<html>", "application/pdf"),
+        })
+        self.assertFormError(response.context["form"], "pdf_file", "Invalid PDF: not a PDF file.")
+        self.assertFalse(Document.objects.exists())
+
+        with override_settings(MEDIA_ROOT=self._tmpdir()):
+            response = self.client.post(reverse("documents:create"), {
+                **fields, "pdf_file": SimpleUploadedFile("ok.pdf", build_pdf(), "application/pdf"),
+            })
+        self.assertRedirects(response, reverse("documents:list"), fetch_redirect_response=False)
+        self.assertTrue(Document.objects.filter(title="SOP").exists())
+
+    def _tmpdir(self):
+        path = tempfile.mkdtemp(prefix="qms-upload-")
+        self.addCleanup(shutil.rmtree, path, ignore_errors=True)
+        return path
+
+
+# =========================================================
+# Admin Changelists
+# =========================================================
+@override_settings(QMS_ADMIN_COUNT_LIMIT=5)
+class AdminChangelistTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser("root", "root@example.com", "pass")
+        cls.groups = [Group.objects.create(name=f"Group {i}") for i in range(3)]
+        cls.departments = [Department.objects.create(name=f"Dept {i}") for i in range(3)]
+
+    def setUp(self):
+        self.client.login(username="root", password="pass")
+
+    def _add_rows(self, count):
+        start = User.objects.count()
+        for i in range(start, start + count):
+            department = self.departments[i % 3]
+            user = User.objects.create_user(f"user{i}", department=department)
+            user.groups.add(*self.groups[:i % 3 + 1])
+            document = Document.objects.create(
+                title=f"Doc {i}", department=department, pdf_file="documents/pdfs/x.pdf", created_by=user,
+            )
+            DocumentActivity.objects.create(
+                document=document, user=user, department=department, action=DocumentActivity.Action.VIEW,
+            )
+            Notification.objects.create(recipient=user, document=document, message="m")
+
+    def _queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return [query["sql"] for query in ctx.captured_queries]
+
+    def test_query_count_does_not_grow_with_rows(self):
+        urls = [
+            reverse("admin:documents_documentactivity_changelist"),
+            reverse("admin:documents_document_changelist"),
+            reverse("admin:accounts_user_changelist"),
+            reverse("admin:core_notification_changelist"),
+        ]
+        self._add_rows(6)
+        for url in urls:
+            self._queries(url)  # warm up (session, content types)
+        small = {url: len(self._queries(url)) for url in urls}
+        self._add_rows(18)
+        large = {url: len(self._queries(url)) for url in urls}
+        self.assertEqual(small, large)
+
+    def test_big_unfiltered_changelist_is_not_counted(self):
+        self._add_rows(8)
+        refresh_estimate(DocumentActivity)
+        url = reverse("admin:documents_documentactivity_changelist")
+
+        queries = self._queries(url)
+        self.assertFalse([sql for sql in queries if "COUNT(" in sql and "documentactivity" in sql])
+
+        # Filtered: counted, but at most QMS_ADMIN_COUNT_LIMIT rows
+        queries = self._queries(f"{url}?action__exact=view")
+        counts = [sql for sql in queries if "COUNT(" in sql and "documentactivity" in sql]
+        self.assertEqual(len(counts), 1)
+        self.assertIn("LIMIT 6", counts[0])
+
+    def test_capped_count_shows_a_lower_bound_and_later_pages_work(self):
+        self._add_rows(8)
+        url = reverse("admin:documents_documentactivity_changelist")
+
+        response = self.client.get(url, {"action__exact": "view"})
+        self.assertEqual(str(response.context["cl"].result_count), "5+")
+        self.assertContains(response, "5+ Document Activities")
+
+        with mock.patch.object(DocumentActivityAdmin, "list_per_page", 3):
+            response = self.client.get(url, {"action__exact": "view", "p": 3})
+            self.assertEqual(len(response.context["cl"].result_list), 2)
+            self.assertEqual(self.client.get(url, {"action__exact": "view", "p": 4}).status_code, 302)
+
+    def test_total_follows_deletes(self):
+        self._add_rows(8)
+        refresh_estimate(DocumentActivity)
+        url = reverse("admin:documents_documentactivity_changelist")
+        self.assertEqual(self.client.get(url).context["cl"].result_count, 8)
+
+        DocumentActivity.objects.filter(pk__in=DocumentActivity.objects.values("pk")[:6]).delete()
+        refresh_estimate(DocumentActivity)
+        response = self.client.get(url)
+        self.assertEqual(response.context["cl"].result_count, 2)
+        self.assertContains(response, "2 Document Activities")
+
+    def test_month_filter(self):
+        self._add_rows(2)
+        old = DocumentActivity.objects.first()
+        DocumentActivity.objects.filter(pk=old.pk).update(timestamp=timezone.now() - timedelta(days=400))
+        month = timezone.localtime().strftime("%Y-%m")
+
+        response = self.client.get(
+            reverse("admin:documents_documentactivity_changelist"), {"timestamp__month": month}
+        )
+        self.assertEqual(len(response.context["cl"].result_list), 1)
+
+
+# =========================================================
+# Document Revisions
+# =========================================================
+class DocumentRevisionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = Department.objects.create(name="Production")
+        cls.quality = User.objects.create_user("quality", password="pass", department=cls.department)
+        cls.quality.groups.add(Group.objects.create(name=GROUP_QUALITY))
+        cls.manager = User.objects.create_user("manager", password="pass", department=cls.department)
+        cls.manager.groups.add(Group.objects.create(name=GROUP_MANAGER))
+        cls.outsider = User.objects.create_user("outsider", password="pass")
+
+    def setUp(self):
+        media = tempfile.mkdtemp(prefix="qms-revisions-")
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.client.login(username="quality", password="pass")
+
+    def _upload(self, data, document=None):
+        fields = {
+            "title": "SOP", "department": self.department.pk, "status": "active",
+            "pdf_file": SimpleUploadedFile("sop.pdf", data, "application/pdf"),
+        }
+        url = reverse("documents:edit", args=[document.pk]) if document else reverse("documents:create")
+        response = self.client.post(url, fields)
+        self.assertEqual(response.status_code, 302)
+        return Document.objects.select_related("current_revision").get(title="SOP")
+
+    def test_each_upload_is_an_immutable_revision(self):
+        first = build_pdf(b"first")
+        document = self._upload(first)
+        revision = document.current_revision
+        self.assertEqual((revision.number, revision.sha256), (1, hashlib.sha256(first).hexdigest()))
+        self.assertEqual(document.pdf_url, f"/documents/pdf/{document.pk}/{revision.sha256}.pdf")
+
+        response = self.client.get(document.pdf_url)
+        self.assertEqual(b"".join(response.streaming_content), first)
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertIn("max-age=31536000", response["Cache-Control"])
+        self.assertEqual(
+            self.client.get(document.pdf_url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304
+        )
+
+        # Same bytes again: no new revision, same URL
+        self.assertEqual(self._upload(first, document).current_revision, revision)
+
+        document = self._upload(build_pdf(b"second"), document)
+        self.assertEqual(document.current_revision.number, 2)
+        self.assertNotEqual(document.pdf_url, revision.url)
+        self.assertEqual(DocumentRevision.objects.filter(document=document).count(), 2)
+        # The old file is kept for its revision
+        self.assertEqual(b"".join(self.client.get(revision.url).streaming_content), first)
+
+        viewer = self.client.get(reverse("documents:view", args=[document.pk]))
+        self.assertIn(document.pdf_url, viewer.context["pdf_absolute_url"])
+
+    def test_access(self):
+        document = self._upload(build_pdf(b"first"))
+        old_url = document.pdf_url
+        document = self._upload(build_pdf(b"second"), document)
+
+        self.client.login(username="manager", password="pass")
+        self.assertEqual(self.client.get(document.pdf_url).status_code, 200)
+        self.assertEqual(self.client.get(old_url).status_code, 410)
+        self.assertEqual(self.client.get(f"/documents/pdf/{document.pk}/{'0' * 64}.pdf").status_code, 404)
+
+        self.client.login(username="outsider", password="pass")
+        self.assertEqual(self.client.get(document.pdf_url).status_code, 403)
@@ -0,0 +1,118 @@
+"""
+Streaming validation of uploaded PDFs.
+
+``PDFUploadHandler`` (first in ``FILE_UPLOAD_HANDLERS``) takes over the
+``pdf_file`` field of any multipart request. Chunks go straight to a
+temporary file, never to memory. The ``%PDF-`` magic bytes are checked on
+the first chunk and the size limit on every chunk. A rejected upload stops
+being written at once, and the form reports its ``upload_error``. The
+sha256 is computed as the chunks arrive. Other file fields are passed on
+to Django's default handlers.
+"""
+
+import hashlib
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile, TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopFutureHandlers
+
+from core.pdfcheck import MAGIC, MB, check_pdf
+
+
+def max_upload_bytes():
+    return getattr(settings, "QMS_PDF_MAX_UPLOAD_MB", 50) * MB
+
+
+class PDFUploadHandler(FileUploadHandler):
+
+    def new_file(self, field_name, file_name, content_type, content_length,
+                 charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length,
+                         charset, content_type_extra)
+
+        self.active = field_name in getattr(settings, "QMS_PDF_UPLOAD_FIELDS", ("pdf_file",))
+        if not self.active:
+            return
+
+        self.limit = max_upload_bytes()
+        self.digest = hashlib.sha256()
+        self.head = b""
+        self.error = ""
+        self.file = TemporaryUploadedFile(file_name, content_type, 0, charset, content_type_extra)
+        if content_length and content_length > self.limit:
+            self._reject(f"larger than {self.limit // MB}MB")
+
+        # This handler owns the file: the default handlers never see it
+        raise StopFutureHandlers()
+
+    def _reject(self, error):
+        self.error = error
+        self.file.close()  # deletes the temporary file
+
+    def receive_data_chunk(self, raw_data, start):
+        if not self.active:
+            return raw_data
+        if self.error:
+            return None
+
+        if len(self.head) < len(MAGIC):
+            self.head += raw_data[:len(MAGIC) - len(self.head)]
+            if len(self.head) == len(MAGIC) and self.head != MAGIC:
+                self._reject("not a PDF file")
+                return None
+
+        if start + len(raw_data) > self.limit:
+            self._reject(f"larger than {self.limit // MB}MB")
+            return None
+
+        self.digest.update(raw_data)
+        self.file.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if not self.active:
+            return None
+
+        if not self.error and self.head != MAGIC:
+            self._reject("not a PDF file")
+        if self.error:
+            rejected = SimpleUploadedFile(self.file_name, b"", self.content_type)
+            rejected.upload_error = self.error
+            rejected.size = file_size or 1  # not "empty": the form reports upload_error
+            return rejected
+
+        self.file.seek(0)
+        self.file.size = file_size
+        self.file.sha256 = self.digest.hexdigest()
+        return self.file
+
+    def upload_interrupted(self):
+        if getattr(self, "active", False) and not self.error:
+            self.file.close()
+
+
+def check_uploaded_pdf(file):
+    """
+    Return ``""`` if ``file`` (an ``UploadedFile``) is an acceptable PDF,
+    else the reason. Files that bypassed ``PDFUploadHandler`` (tests,
+    programmatic uploads) get the same checks.
+    """
+    error = getattr(file, "upload_error", "")
+    if error:
+        return error
+
+    file.seek(0)
+    if file.read(len(MAGIC)) != MAGIC:
+        return "not a PDF file"
+    file.seek(0)
+
+    if hasattr(file, "temporary_file_path"):
+        return check_pdf(file.temporary_file_path())
+
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as copy:
+        shutil.copyfileobj(file, copy)
+        copy.flush()
+        file.seek(0)
+        return check_pdf(copy.name)
@@ -14,6 +14,7 @@ urlpatterns = [
     # View Document (open PDF + Activity Log)
     # =====================================================
     path("view/<int:pk>/", views.document_view, name="view"),
+    path("pdf/<int:pk>/<str:sha256>.pdf", views.document_pdf, name="pdf"),
 
     # =====================================================
     # Create / Upload Document
@@ -29,6 +30,14 @@ urlpatterns = [
     # Delete Document
     # =====================================================
     path("delete/<int:pk>/", views.document_delete, name="delete"),
+    # =====================================================
+    # Bulk Actions (Quality)
+    # =====================================================
+    path("bulk/status/", views.document_bulk_status, name="bulk_status"),
+    path("api/bulk/status/", views.document_bulk_status_api, name="bulk_status_api"),
+    path("bulk/readers/", views.document_bulk_readers, name="bulk_readers"),
+    path("api/bulk/readers/", views.document_bulk_readers_api, name="bulk_readers_api"),
+
     path("ajax/department-users/", views.get_department_users, name="department_users"),
     path("audit/", views.audit_dashboard, name="audit_dashboard"),
     path(
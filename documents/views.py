@@ -1,16 +1,31 @@
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib import messages
-from .models import Document, DocumentActivity
+from .models import Document, DocumentActivity, DocumentRevision
+from .revisions import record_revision
 from .forms import DocumentForm
 from django.http import JsonResponse
 from django.contrib.auth import get_user_model
 from django.core.paginator import Paginator
-from django.db.models import Count
+from django.db.models import Count, Q
 from django.utils import timezone
 from datetime import timedelta
 from accounts.models import Department
-from django.http import HttpResponse
+from accounts.search import reader_label, search_users
+from core.notifications import event_for_change, notify_document_change
+from django.views.decorators.http import require_POST
+from django.contrib.auth.models import Group
+from .bulk import (
+    bulk_add_readers,
+    bulk_remove_readers,
+    bulk_set_status,
+    select_documents,
+    select_users,
+)
+from core.routers import use_analytics_db
+from core.versions import DEPARTMENTS, DOCUMENTS, USERS, conditional, make_etag, page_parts, versions
+from django.http import FileResponse, HttpResponse
 import csv
 import json
 from accounts.permissions import (
@@ -23,19 +38,40 @@ from accounts.permissions import (
 User = get_user_model()
 
 
+def _department_users_etag(request):
+    return make_etag("department_users", request.user.pk, versions(USERS))
+
+
 @login_required
+@conditional(_department_users_etag)
 def get_department_users(request):
+    """
+    Reader picker autocomplete: active users of ``department_id`` whose
+    username / first / last name starts with ``q``. Paged with ``cursor``.
+    """
     department_id = request.GET.get("department_id")
 
     if not department_id:
-        return JsonResponse({"users": []})
-
-    users = User.objects.filter(
-        department_id=department_id,
-        is_active=True
-    ).values("id", "username")
+        return JsonResponse({"users": [], "next": None})
+
+    try:
+        users, next_cursor = search_users(
+            query=request.GET.get("q", ""),
+            department_id=department_id,
+            exclude_id=request.user.pk,
+            cursor=request.GET.get("cursor"),
+            limit=int(request.GET.get("limit", 20)),
+        )
+    except ValueError:
+        return JsonResponse({"error": "Invalid cursor or limit"}, status=400)
 
-    return JsonResponse({"users": list(users)})
+    return JsonResponse({
+        "users": [
+            {"id": u.pk, "username": u.username, "label": reader_label(u)}
+            for u in users
+        ],
+        "next": next_cursor,
+    })
 
 # =========================================================
 # Helpers
@@ -51,6 +87,11 @@ def _can_manage_docs(user) -> bool:
 def _department_of(user):
     return getattr(user, "department", None)
 
+
+def _shared_with(user):
+    """Ids of documents where ``user`` is an explicit reader (subquery)."""
+    return Document.readers.through.objects.filter(user=user).values("document_id")
+
 def _can_view_document(user, document: Document) -> bool:
     """
     Enterprise Permission Logic (Fixed Version):
@@ -93,7 +134,15 @@ def _can_view_document(user, document: Document) -> bool:
 # =========================================================
 # Document List (With Department Filter + Disabled Last)
 # =========================================================
+def _document_list_etag(request):
+    parts = page_parts(request)
+    if parts is None:
+        return None
+    return make_etag("document_list", parts, versions(DOCUMENTS, DEPARTMENTS, USERS))
+
+
 @login_required
+@conditional(_document_list_etag)
 def document_list(request):
 
     user = request.user
@@ -118,17 +167,15 @@ def document_list(request):
         )
 
     elif is_manager(user):
-        documents = (
-            Document.objects.filter(department=user.department)
-            | Document.objects.filter(readers=user)
+        documents = Document.objects.filter(
+            Q(department=user.department) | Q(pk__in=_shared_with(user))
         ).exclude(status=Document.Status.ARCHIVED)
 
         department_name = getattr(user.department, "name", None)
 
     elif is_employee(user):
-        documents = (
-            Document.objects.filter(created_by=user)
-            | Document.objects.filter(readers=user)
+        documents = Document.objects.filter(
+            Q(created_by=user) | Q(pk__in=_shared_with(user))
         ).exclude(status=Document.Status.ARCHIVED)
 
         department_name = getattr(user.department, "name", None)
@@ -140,11 +187,14 @@ def document_list(request):
     # Disabled Always Last
     # ==========================
 
+    # Readers are matched through a subquery, so no JOIN duplicates and
+    # no DISTINCT. The all-documents order is served by
+    # doc_status_updated_idx; a manager's/employee's OR is an index union
+    # (department or creator + readers) whose few rows are sorted.
     documents = (
         documents
         .select_related("department", "created_by")
         .order_by("status", "-updated_at")   # 👈 مهم
-        .distinct()
     )
 
     context = {
@@ -153,6 +203,8 @@ def document_list(request):
         "can_manage": _can_manage_docs(user),
         "context_department": department_name,
         "departments": Department.objects.filter(is_active=True),
+        "statuses": Document.Status.choices,
+        "groups": Group.objects.order_by("name") if _can_manage_docs(user) else [],
     }
 
     return render(
@@ -167,7 +219,7 @@ def document_list(request):
 def document_view(request, pk):
 
     user = request.user
-    document = get_object_or_404(Document, pk=pk)
+    document = get_object_or_404(Document.objects.select_related("current_revision"), pk=pk)
 
     # 🔐 Permission Check
     if not _can_view_document(user, document):
@@ -198,7 +250,7 @@ def document_view(request, pk):
     # ==========================================
     # Build Secure PDF URL
     # ==========================================
-    base_pdf_url = request.build_absolute_uri(document.pdf_file.url)
+    base_pdf_url = request.build_absolute_uri(document.pdf_url)
 
     username = user.username
     department_name = getattr(user.department, "name", "")
@@ -230,6 +282,38 @@ def document_view(request, pk):
     )
 
 
+# =========================================================
+# Serve PDF Revision (content-addressed, cached forever)
+# =========================================================
+REVISION_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+
+@login_required
+def document_pdf(request, pk, sha256):
+    """
+    The bytes behind a revision URL never change, so the browser keeps
+    them for a year without revalidating. ``private``: access is per
+    user, so shared caches must not store them.
+    """
+    document = get_object_or_404(Document, pk=pk)
+    if not _can_view_document(request.user, document):
+        return HttpResponse("Access denied.", status=403, content_type="text/plain")
+
+    revision = get_object_or_404(DocumentRevision, document=document, sha256=sha256)
+    # Superseded revisions are for document managers only
+    if revision.pk != document.current_revision_id and not _can_manage_docs(request.user):
+        return HttpResponse("This revision has been superseded.", status=410, content_type="text/plain")
+
+    etag = f'"{revision.sha256}"'
+    if etag in request.headers.get("If-None-Match", ""):
+        response = HttpResponse(status=304)
+    else:
+        response = FileResponse(revision.pdf_file.open("rb"), content_type="application/pdf")
+    response["ETag"] = etag
+    response["Cache-Control"] = REVISION_CACHE_CONTROL
+    return response
+
+
 # =========================================================
 # Create Document
 # =========================================================
@@ -249,6 +333,7 @@ def document_create(request):
             document = form.save(commit=False)
             document.created_by = user
             document.save()
+            record_revision(document, user, getattr(form.cleaned_data["pdf_file"], "sha256", None))
 
             DocumentActivity.objects.create(
                 document=document,
@@ -279,12 +364,15 @@ def document_edit(request, pk):
         return redirect("documents:list")
 
     document = get_object_or_404(Document, pk=pk)
+    old_status = document.status  # before the form touches the instance
 
     if request.method == "POST":
         form = DocumentForm(request.POST, request.FILES, instance=document, user=request.user)
 
         if form.is_valid():
             form.save()
+            if "pdf_file" in form.changed_data:
+                record_revision(document, user, getattr(form.cleaned_data["pdf_file"], "sha256", None))
 
             DocumentActivity.objects.create(
                 document=document,
@@ -293,6 +381,13 @@ def document_edit(request, pk):
                 action=DocumentActivity.Action.EDIT,
             )
 
+            # 🔔 Fan-out runs after commit, off the request thread
+            notification_type = event_for_change(
+                old_status, document.status, "pdf_file" in form.changed_data
+            )
+            if notification_type:
+                notify_document_change(document, notification_type, actor=user)
+
             messages.success(request, "Document updated successfully.")
             return redirect("documents:list")
 
@@ -338,12 +433,160 @@ def document_delete(request, pk):
         "qms-templates/document_delete.html",
         {"document": document},
     )
+# =========================================================
+# Bulk Status Change (Quality)
+# =========================================================
+def _bulk_selection(ids, department_id=None, status=None):
+    return select_documents(
+        ids=[int(pk) for pk in ids],
+        department_id=department_id or None,
+        status=status or None,
+    )
+
+
+@require_POST
+@login_required
+def document_bulk_status(request):
+    """
+    Document list bulk bar: the checked documents, or (``scope=department``)
+    every document of the filtered department.
+    """
+    if not _can_manage_docs(request.user):
+        messages.error(request, "You are not allowed to edit documents.")
+        return redirect("documents:list")
+
+    department_id = request.POST.get("department")
+    try:
+        if request.POST.get("scope") == "department":
+            documents = _bulk_selection([], department_id=department_id)
+        else:
+            documents = _bulk_selection(request.POST.getlist("ids"))
+        changed = bulk_set_status(
+            documents,
+            request.POST.get("status", ""),
+            request.user,
+            request.POST.get("disabled_reason", ""),
+        )
+    except ValueError as exc:
+        messages.error(request, str(exc))
+    else:
+        messages.success(request, f"{len(changed)} document(s) updated.")
+
+    url = reverse("documents:list")
+    return redirect(f"{url}?department={department_id}" if department_id else url)
+
+
+@require_POST
+@login_required
+def document_bulk_status_api(request):
+    """
+    JSON: ``{"ids": [...]}`` and/or ``{"department": id, "filter_status": s}``
+    select the documents; ``status`` / ``disabled_reason`` are the change.
+    """
+    if not _can_manage_docs(request.user):
+        return JsonResponse({"error": "Unauthorized"}, status=403)
+
+    try:
+        data = json.loads(request.body or b"{}")
+        documents = _bulk_selection(
+            data.get("ids") or [], data.get("department"), data.get("filter_status")
+        )
+        changed = bulk_set_status(
+            documents, data.get("status", ""), request.user, data.get("disabled_reason", "")
+        )
+    except (AttributeError, TypeError, ValueError) as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    return JsonResponse({"updated": len(changed), "ids": changed})
+
+
+# =========================================================
+# Bulk Reader Assignment (Quality)
+# =========================================================
+def _apply_readers(documents, users, mode, actor):
+    if mode == "add":
+        added, skipped = bulk_add_readers(documents, users, actor)
+        return {"added": added, "skipped": skipped}
+    if mode == "remove":
+        return {"removed": bulk_remove_readers(documents, users, actor)}
+    raise ValueError("mode must be 'add' or 'remove'.")
+
+
+@require_POST
+@login_required
+def document_bulk_readers(request):
+    """
+    Document list bulk bar: add/remove readers (by department, group or
+    usernames) on the checked documents.
+    """
+    if not _can_manage_docs(request.user):
+        messages.error(request, "You are not allowed to edit documents.")
+        return redirect("documents:list")
+
+    try:
+        users = select_users(
+            usernames=request.POST.get("reader_usernames", "").replace(",", " ").split(),
+            department_id=request.POST.get("reader_department") or None,
+            group_id=request.POST.get("reader_group") or None,
+        )
+        result = _apply_readers(
+            _bulk_selection(request.POST.getlist("ids")),
+            users, request.POST.get("mode"), request.user,
+        )
+    except ValueError as exc:
+        messages.error(request, str(exc))
+    else:
+        if "removed" in result:
+            messages.success(request, f"{result['removed']} reader link(s) removed.")
+        else:
+            messages.success(request, f"{result['added']} reader link(s) added.")
+            if result["skipped"]:
+                messages.info(
+                    request,
+                    f"{result['skipped']} pair(s) skipped: readers must belong to the document's department.",
+                )
+
+    department_id = request.POST.get("department")
+    url = reverse("documents:list")
+    return redirect(f"{url}?department={department_id}" if department_id else url)
+
+
+@require_POST
+@login_required
+def document_bulk_readers_api(request):
+    """
+    JSON: documents as for the status API, ``mode`` (``add``/``remove``)
+    and ``readers``: ``{"user_ids", "usernames", "department", "group"}``.
+    """
+    if not _can_manage_docs(request.user):
+        return JsonResponse({"error": "Unauthorized"}, status=403)
+
+    try:
+        data = json.loads(request.body or b"{}")
+        readers = data.get("readers") or {}
+        users = select_users(
+            user_ids=[int(pk) for pk in readers.get("user_ids") or []],
+            usernames=readers.get("usernames") or [],
+            department_id=readers.get("department"),
+            group_id=readers.get("group"),
+        )
+        documents = _bulk_selection(
+            data.get("ids") or [], data.get("department"), data.get("filter_status")
+        )
+        result = _apply_readers(documents, users, data.get("mode"), request.user)
+    except (AttributeError, TypeError, ValueError) as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    return JsonResponse(result)
+
+
 # =========================================================
 # AUDIT MONITORING DASHBOARD
 # =========================================================
 
 
 @login_required
+@use_analytics_db
 def audit_dashboard(request):
 
     # 🔐 Only Quality/Admin/Superuser
@@ -365,17 +608,18 @@ def audit_dashboard(request):
     # =============================
     # KPIs
     # =============================
-    today = timezone.now().date()
+    # Range on the raw column (not __date) so the timestamp indexes apply
+    today_start = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
 
     total_logs = DocumentActivity.objects.count()
 
     today_logs = DocumentActivity.objects.filter(
-        timestamp__date=today
+        timestamp__gte=today_start
     ).count()
 
     disabled_today = DocumentActivity.objects.filter(
         action=DocumentActivity.Action.ATTEMPT_DISABLED,
-        timestamp__date=today
+        timestamp__gte=today_start
     ).count()
 
     most_active_user = (
@@ -446,6 +690,7 @@ def audit_dashboard(request):
 # =========================================================
 
 @login_required
+@use_analytics_db
 def quality_center(request):
 
     # 🔐 Only Quality/Admin/Superuser
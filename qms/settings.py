@@ -36,8 +36,18 @@ INSTALLED_APPS = [
 # MIDDLEWARE
 # ================================
 MIDDLEWARE = [
+    # Outermost: its log writes stay out of the request metrics
+    "core.middleware.SlowQueryMiddleware",
+    # Before sessions/auth so their queries are counted per view
+    "core.middleware.MetricsMiddleware",
+    # Brotli/gzip for text and JSON (after Metrics: it records sent bytes)
+    "core.middleware.CompressionMiddleware",
+
     "django.middleware.security.SecurityMiddleware",
-    "django.contrib.sessions.middleware.SessionMiddleware",
+    # STATIC_ROOT files, precompressed, before sessions/auth run
+    "core.middleware.StaticAssetMiddleware",
+    # SessionMiddleware that only writes when data changed / expiry is stale
+    "core.middleware.ThrottledSessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
@@ -80,6 +90,7 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "core.context_processors.notifications",
             ],
         },
     },
@@ -99,9 +110,41 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "OPTIONS": {
+            # Take the write lock at BEGIN so busy_timeout/retries apply,
+            # instead of failing on a read->write lock upgrade.
+            "transaction_mode": "IMMEDIATE",
+        },
     }
 }
 
+# Read-only analytics copy, refreshed with `manage.py refresh_replica`
+# (SQLite backup API). Tests mirror it onto the default test database.
+DATABASES["replica"] = {
+    "ENGINE": "django.db.backends.sqlite3",
+    "NAME": BASE_DIR / "db-replica.sqlite3",
+    "TEST": {"MIRROR": "default"},
+}
+
+DATABASE_ROUTERS = ["core.routers.AnalyticsReplicaRouter"]
+
+# Heavy dashboards read from this alias while its snapshot is fresh enough
+QMS_ANALYTICS_DB = "replica"
+QMS_REPLICA_MAX_LAG = 300  # seconds; older snapshot -> fall back to primary
+
+# Applied on every new SQLite connection (core.sqlite.configure_connection)
+QMS_SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",          # readers no longer block the writer
+    "busy_timeout": 5000,           # ms to wait for the write lock
+    "synchronous": "NORMAL",        # safe with WAL, far fewer fsyncs
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64000,           # negative = KiB (~64 MB)
+}
+
+# Retries for "database is locked" on autocommit writes / BEGIN
+QMS_SQLITE_WRITE_RETRIES = 5
+QMS_SQLITE_RETRY_BASE_DELAY = 0.05  # seconds, doubled per attempt + jitter
+
 
 # ================================
 # PASSWORD VALIDATION
@@ -143,6 +186,10 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Served only by permission-checked views (print packages); keep it
+# outside MEDIA_ROOT
+QMS_PRIVATE_MEDIA_ROOT = BASE_DIR / "private_media"
+
 
 # ================================
 # DEFAULT PK
@@ -168,4 +215,134 @@ LOGOUT_REDIRECT_URL = "/login/"
 # SESSION SETTINGS
 # ================================
 SESSION_COOKIE_AGE = 60 * 60 * 8  # 8 hours
-SESSION_SAVE_EVERY_REQUEST = True
\ No newline at end of file
+
+# Sliding expiry is handled by core.middleware.ThrottledSessionMiddleware:
+# an unchanged session is re-saved only once QMS_SESSION_REFRESH_FRACTION
+# of its age has passed (0.1 * 8h = 48 min), not on every request.
+SESSION_SAVE_EVERY_REQUEST = False
+QMS_SESSION_REFRESH_FRACTION = 0.1
+
+# "django.contrib.sessions.backends.cached_db" or ".cache" work too, as
+# long as CACHES["default"] is shared by all workers (e.g. Redis/Memcached/
+# a file cache) - a per-process locmem cache would serve stale sessions.
+SESSION_ENGINE = "django.contrib.sessions.backends.db"
+
+
+# ================================
+# METRICS (/metrics endpoint)
+# ================================
+# Shared directory for per-process snapshots (set it when running
+# several worker processes, e.g. gunicorn -w 4). None = single process.
+QMS_METRICS_DIR = None
+QMS_METRICS_FLUSH_INTERVAL = 5  # seconds
+
+# Scrapers read /metrics/ without logging in by sending
+# "Authorization: Bearer <QMS_METRICS_TOKEN>". None = superusers only.
+QMS_METRICS_TOKEN = None
+# Explicit opt-in by client address. Only safe when nothing proxies to
+# Django: behind a local reverse proxy every client is 127.0.0.1.
+QMS_METRICS_ALLOWED_IPS = []
+
+
+# ================================
+# BACKGROUND WORK / NOTIFICATIONS
+# ================================
+# "jobs": core.background.submit queues a Job for `manage.py run_workers`
+# (keep one running next to the web server). "threads": in-process pool.
+QMS_BACKGROUND_BACKEND = "jobs"
+QMS_BACKGROUND_WORKERS = 2          # threads for the "threads" backend
+QMS_NOTIFICATION_CHUNK_SIZE = 1000  # rows per bulk_create in fan-out
+
+# Job queue (core.jobs / run_workers)
+QMS_JOB_WORKERS = 2                 # worker processes
+QMS_JOB_LEASE_SECONDS = 60          # extended every lease/3 while running
+QMS_JOB_MAX_ATTEMPTS = 5
+QMS_JOB_RETRY_BASE_DELAY = 5        # seconds, doubled per attempt (jittered)
+QMS_JOB_RETRY_MAX_DELAY = 3600
+QMS_JOB_RETENTION_HOURS = 72        # finished jobs kept this long
+
+# Header bell: per-user unread counter cache (seconds). With a per-process
+# cache (locmem) other workers may show a stale badge for this long.
+QMS_UNREAD_CACHE_SECONDS = 30
+QMS_NOTIFICATION_RETENTION_DAYS = 90  # prune_notifications: read rows older than this
+
+
+# ================================
+# EMAIL / NOTIFICATION DIGESTS
+# ================================
+# Development: print emails to the console. Configure SMTP in production.
+EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
+DEFAULT_FROM_EMAIL = "qms@localhost"
+
+QMS_SITE_URL = "http://127.0.0.1:8000"  # absolute links in emails
+QMS_DIGEST_PERIOD_HOURS = 24            # one digest per user per period
+QMS_DIGEST_BATCH_SIZE = 200             # users per claim / email connection
+QMS_DIGEST_MAX_ITEMS = 20               # notifications listed per email
+
+# ================================
+# PDF UPLOADS
+# ================================
+# pdf_file uploads stream to a temp file with magic-byte, size and sha256
+# checks; the structure is then checked in a process pool (core.pdfcheck).
+FILE_UPLOAD_HANDLERS = [
+    "documents.uploads.PDFUploadHandler",
+    "django.core.files.uploadhandler.MemoryFileUploadHandler",
+    "django.core.files.uploadhandler.TemporaryFileUploadHandler",
+]
+QMS_PDF_MAX_UPLOAD_MB = 50
+QMS_PDF_CHECK_WORKERS = 2
+QMS_PDF_CHECK_CPU_SECONDS = 5           # per file, enforced with RLIMIT_CPU
+QMS_PDF_CHECK_TIMEOUT = 15              # wall clock; the worker is killed after this
+QMS_PDF_CHECK_MEMORY_MB = 512           # RLIMIT_AS of each checker process
+QMS_PDF_MAX_INFLATED_MB = 256           # total decompressed stream size (bomb guard)
+
+# ================================
+# BULK DOCUMENT IMPORT
+# ================================
+QMS_IMPORT_WORKERS = None               # processes checking PDFs; None = CPU count
+QMS_IMPORT_CHUNK_SIZE = 200             # files per bulk insert / transaction
+QMS_IMPORT_UPLOAD_ROOT = BASE_DIR / "import_uploads"  # uploaded ZIPs until imported (not served)
+
+
+# ================================
+# ADMIN CHANGELISTS
+# ================================
+QMS_ADMIN_COUNT_LIMIT = 10000           # above this, changelists show an estimated count
+QMS_ADMIN_MONTHS = 12                   # months offered by the month drill-down filter
+
+
+# ================================
+# COLD STORAGE (archived documents)
+# ================================
+# Files missing from MEDIA_ROOT are restored from cold storage on open
+STORAGES = {
+    "default": {"BACKEND": "core.tiering.TieredStorage"},
+    # Fingerprinted names + .gz/.br variants (core.staticfiles)
+    "staticfiles": {"BACKEND": "core.staticfiles.CompressedManifestStaticFilesStorage"},
+}
+QMS_COLD_STORAGE_ROOT = BASE_DIR / "cold_storage"
+QMS_TIER_ARCHIVED_AFTER_DAYS = 30       # manage.py tier_documents
+QMS_TIER_BATCH_SIZE = 200               # files per manifest write
+
+
+# ================================
+# CONDITIONAL GET / COMPRESSION
+# ================================
+QMS_RELEASE = None                      # part of every ETag; None = newest code/template mtime
+QMS_KPI_ETAG_SECONDS = 60               # KPI ranges slide at most this stale
+QMS_COMPRESS_MIN_BYTES = 1024           # smaller responses are sent as is
+QMS_BROTLI_QUALITY = 5                  # used when the brotli package is installed
+
+
+# ================================
+# STATIC ASSETS
+# ================================
+QMS_STATIC_MAX_AGE = 300                # seconds for unhashed names (pdf.js); hashed ones are immutable
+QMS_STATIC_COMPRESS_MIN_BYTES = 256     # smaller files get no .gz/.br variant
+
+
+# ================================
+# SLOW QUERY LOG (admin: Core > Slow queries)
+# ================================
+QMS_SLOW_QUERY_MS = 200                 # queries at least this slow are logged; None = off
+QMS_SLOW_QUERY_MAX_ROWS = 10000         # newest samples kept, older ones are deleted
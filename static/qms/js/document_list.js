@@ -0,0 +1,39 @@
+/* Document list: bulk bar, live title filter */
+// Enter in a bulk bar field must not trigger the first action (status change)
+document.querySelectorAll("#bulkForm input[type=text]").forEach(field => {
+  field.addEventListener("keydown", e => { if(e.key === "Enter") e.preventDefault(); });
+});
+
+(function(){
+  const input = document.getElementById("docSearch");
+  const items = document.querySelectorAll(".doc-item");
+  const counter = document.getElementById("docCount");
+
+  if(!input || !items.length || !counter) return;
+
+  function updateCounter(){
+    let visible = 0;
+
+    items.forEach(el=>{
+      if(el.style.display !== "none"){
+        visible++;
+      }
+    });
+
+    counter.textContent = visible;
+  }
+
+  input.addEventListener("input", function(){
+    const q = (input.value || "").toLowerCase().trim();
+
+    items.forEach(el=>{
+      const t = el.getAttribute("data-title") || "";
+      el.style.display = t.includes(q) ? "" : "none";
+    });
+
+    updateCounter();
+  });
+
+  // تحديث أولي عند تحميل الصفحة
+  updateCounter();
+})();
@@ -0,0 +1,132 @@
+/* Site header: burger menu, user popup, notification bell */
+// URLs and the CSRF token come from data-* attributes of the header
+const header = document.querySelector(".qms-header");
+
+// ===== Burger Menu =====
+const burgerBtn = document.getElementById("burgerBtn");
+const burgerMenu = document.getElementById("burgerMenu");
+
+function closeBurger(){
+  burgerMenu.style.display = "none";
+  burgerBtn.setAttribute("aria-expanded","false");
+}
+
+burgerBtn.addEventListener("click", function(e){
+  e.stopPropagation();
+  const isOpen = burgerMenu.style.display === "flex";
+  if(isOpen){
+    closeBurger();
+  }else{
+    burgerMenu.style.display = "flex";
+    burgerBtn.setAttribute("aria-expanded","true");
+  }
+});
+
+// ===== User Popup =====
+const userBtn = document.getElementById("userBtn");
+const userMenu = document.getElementById("userMenu");
+
+function closeUser(){
+  userMenu.classList.remove("is-open");
+  userBtn.setAttribute("aria-expanded","false");
+}
+
+userBtn.addEventListener("click", function(e){
+  e.stopPropagation();
+  const open = userMenu.classList.contains("is-open");
+  if(open){
+    closeUser();
+  }else{
+    userMenu.classList.add("is-open");
+    userBtn.setAttribute("aria-expanded","true");
+  }
+});
+
+// ===== Notification Bell =====
+const bellBtn = document.getElementById("bellBtn");
+
+if(bellBtn){
+  const bellMenu = document.getElementById("bellMenu");
+  const bellList = document.getElementById("bellList");
+  const bellBadge = document.getElementById("bellBadge");
+  const bellMore = document.getElementById("bellMore");
+  let bellCursor = null;
+
+  function setBadge(count){
+    bellBadge.textContent = count > 99 ? "99+" : count;
+    bellBadge.hidden = !count;
+  }
+
+  function loadNotifications(reset){
+    const url = new URL(header.dataset.notificationsUrl, window.location.origin);
+    if(!reset && bellCursor){ url.searchParams.set("cursor", bellCursor); }
+
+    fetch(url, {credentials:"same-origin"})
+      .then(r => r.json())
+      .then(data => {
+        if(reset){ bellList.innerHTML = ""; }
+        data.results.forEach(n => {
+          const a = document.createElement("a");
+          a.className = "bell-item" + (n.is_read ? "" : " unread");
+          a.href = n.url;
+          a.textContent = n.message || n.document;
+          const when = document.createElement("small");
+          when.textContent = new Date(n.created_at).toLocaleString();
+          a.appendChild(when);
+          bellList.appendChild(a);
+        });
+        if(reset && !data.results.length){
+          bellList.innerHTML = '<div class="bell-empty">No notifications yet.</div>';
+        }
+        bellCursor = data.next;
+        bellMore.hidden = !data.next;
+        setBadge(data.unread);
+      });
+  }
+
+  bellMenu.addEventListener("click", function(e){ e.stopPropagation(); });
+
+  bellBtn.addEventListener("click", function(e){
+    e.stopPropagation();
+    const open = bellMenu.classList.toggle("is-open");
+    bellBtn.setAttribute("aria-expanded", open ? "true" : "false");
+    if(open){ loadNotifications(true); }
+  });
+
+  bellMore.addEventListener("click", function(){ loadNotifications(false); });
+
+  document.getElementById("bellReadAll").addEventListener("click", function(){
+    const body = new FormData();
+    body.append("all", "1");
+    fetch(header.dataset.markReadUrl, {
+      method:"POST",
+      credentials:"same-origin",
+      headers:{"X-CSRFToken":header.dataset.csrfToken},
+      body:body
+    })
+      .then(r => r.json())
+      .then(data => {
+        setBadge(data.unread);
+        bellList.querySelectorAll(".bell-item.unread").forEach(el => el.classList.remove("unread"));
+      });
+  });
+
+  document.addEventListener("click", function(){
+    bellMenu.classList.remove("is-open");
+    bellBtn.setAttribute("aria-expanded","false");
+  });
+}
+
+// Close on outside click
+document.addEventListener("click", function(){
+  closeBurger();
+  closeUser();
+});
+
+// Close on ESC
+document.addEventListener("keydown", function(e){
+  if(e.key === "Escape"){
+    closeBurger();
+    closeUser();
+  }
+});
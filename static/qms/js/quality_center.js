@@ -0,0 +1,274 @@
+/* Quality control center: charts and KPI ranges (needs KPI_URL, Chart.js) */
+const weeklyLabels = JSON.parse(
+  document.getElementById('weekly-labels-data').textContent
+);
+const weeklyValues = JSON.parse(
+  document.getElementById('weekly-values-data').textContent
+);
+
+const actionLabels = JSON.parse(
+  document.getElementById('action-labels-data').textContent
+);
+const actionValues = JSON.parse(
+  document.getElementById('action-values-data').textContent
+);
+
+const deptLabels = JSON.parse(
+  document.getElementById('dept-labels-data').textContent
+);
+const deptValues = JSON.parse(
+  document.getElementById('dept-values-data').textContent
+);
+
+
+// Weekly Chart
+// Weekly Chart (Safe Init)
+const weeklyCanvas = document.getElementById('weeklyChart');
+if (weeklyCanvas) {
+  new Chart(weeklyCanvas,{
+    type:'line',
+    data:{
+      labels: weeklyLabels,
+      datasets:[{
+        label:'Activity',
+        data: weeklyValues,
+        borderColor:'#006EB3',
+        backgroundColor:'rgba(0,110,179,.1)',
+        fill:true,
+        tension:.4
+      }]
+    }
+  });
+}
+
+// Action Chart
+/* ==========================
+   Advanced Action Chart
+==========================*/
+
+const actionColors = ['#006EB3','#5BC500','#F5A524','#E11D48'];
+
+const totalActions = actionValues.reduce((a,b)=>a+b,0);
+document.getElementById("donutTotal").innerText = totalActions;
+
+const actionChartInstance = new Chart(
+  document.getElementById('actionChart'),
+  {
+    type:'doughnut',
+    data:{
+      labels: actionLabels,
+      datasets:[{
+        data: actionValues,
+        backgroundColor: actionColors,
+        borderWidth:0,
+        hoverOffset:20
+      }]
+    },
+    options:{
+      cutout:'75%',
+      animation:{
+        animateScale:true,
+        animateRotate:true
+      },
+      plugins:{
+        legend:{ display:false }
+      }
+    }
+  }
+);
+
+/* ===== Modern Interactive Legend ===== */
+
+const legendContainer = document.getElementById("actionLegend");
+
+actionLabels.forEach((label,index)=>{
+
+  const value = actionValues[index];
+  const percent = totalActions ? ((value/totalActions)*100) : 0;
+
+  const item = document.createElement("div");
+  item.className = "legend-item";
+
+  item.innerHTML = `
+    <div class="legend-top">
+      <div class="legend-left">
+        <div class="legend-color" style="background:${actionColors[index]}"></div>
+        ${label}
+      </div>
+      <div class="legend-value">${value}</div>
+    </div>
+    <div class="legend-progress">
+      <div class="legend-progress-bar"
+           style="width:${percent}%; background:${actionColors[index]}">
+      </div>
+    </div>
+  `;
+
+  item.addEventListener("mouseenter", () => {
+    actionChartInstance.setActiveElements([{datasetIndex:0,index:index}]);
+    actionChartInstance.update();
+  });
+
+  item.addEventListener("mouseleave", () => {
+    actionChartInstance.setActiveElements([]);
+    actionChartInstance.update();
+  });
+
+  legendContainer.appendChild(item);
+});
+
+// Department Chart
+new Chart(document.getElementById('deptChart'),{
+  type:'bar',
+  data:{
+    labels: deptLabels,
+    datasets:[{
+      label:'Documents',
+      data: deptValues,
+      backgroundColor:'#5BC500'
+    }]
+  }
+});
+
+lucide.createIcons();
+
+// ==========================
+// Enterprise KPI Engine
+// ==========================
+
+function animateValue(element, start, end, duration) {
+    let startTime = null;
+
+    function step(currentTime) {
+        if (!startTime) startTime = currentTime;
+        const progress = Math.min((currentTime - startTime) / duration, 1);
+        element.innerText = Math.floor(progress * (end - start) + start);
+
+        if (progress < 1) {
+            window.requestAnimationFrame(step);
+        }
+    }
+
+    window.requestAnimationFrame(step);
+}
+
+function loadEnterpriseKPI(rangeValue){
+
+    fetch(`${KPI_URL}?range=${rangeValue}`)
+    .then(res => res.json())
+    .then(data => {
+
+        if(data.error) return;
+
+        // ================= Documents =================
+        const docEl = document.querySelector(".kpi.blue .kpi-value");
+        const trendEl = document.getElementById("kpi-documents-trend");
+
+        if(docEl) docEl.textContent = data.documents.toLocaleString();
+
+        if(trendEl){
+            if(data.documents_change >= 0){
+                trendEl.innerHTML =
+                  `<span style="color:#1F9D55;">▲ ${data.documents_change}% vs previous</span>`;
+            }else{
+                trendEl.innerHTML =
+                  `<span style="color:#E11D48;">▼ ${Math.abs(data.documents_change)}% vs previous</span>`;
+            }
+        }
+
+        // ================= KPI Updates =================
+        const activeEl = document.querySelector(".kpi.green .kpi-value");
+        const archivedEl = document.querySelector(".kpi.gray .kpi-value");
+        const activitiesEl = document.querySelector(".kpi.orange .kpi-value");
+        const usersEl = document.querySelector(".kpi.cyan .kpi-value");
+        const deptEl = document.querySelector(".kpi.purple .kpi-value");
+
+        if(activeEl) activeEl.textContent = data.active_docs.toLocaleString();
+        if(archivedEl) archivedEl.textContent = data.archived_docs.toLocaleString();
+        if(activitiesEl) activitiesEl.textContent = data.activities.toLocaleString();
+        if(usersEl) usersEl.textContent = data.users.toLocaleString();
+        if(deptEl) deptEl.textContent = data.departments.toLocaleString();
+
+        if(deptEl) deptEl.textContent = data.departments.toLocaleString();
+
+        // ================= Disabled Documents =================
+        const disabledEl = document.getElementById("disabledCount");
+        if(disabledEl && data.disabled_docs !== undefined){
+            disabledEl.textContent = data.disabled_docs.toLocaleString();
+      }
+
+        // ================= 🛡 Risk Update =================
+        if(data.risk_attempts !== undefined){
+
+            const riskAttemptsEl = document.querySelector(".risk-attempts");
+            const riskLevelEl = document.querySelector(".risk-level");
+            const riskUserEl = document.querySelector(".risk-user");
+            const riskDocEl = document.querySelector(".risk-doc");
+
+            if(riskAttemptsEl)
+                riskAttemptsEl.textContent = data.risk_attempts.toLocaleString();
+
+            if(riskLevelEl)
+                riskLevelEl.textContent = data.risk_level;
+
+            if(riskUserEl)
+                riskUserEl.textContent = data.risk_top_user;
+
+            if(riskDocEl)
+                riskDocEl.textContent = data.risk_top_document;
+        }
+
+    })
+    .catch(err => console.error("KPI Load Error:", err));
+}
+
+// ==========================
+// Range Button Controller
+// ==========================
+
+document.querySelectorAll(".range-segment button")
+.forEach(btn => {
+
+    btn.addEventListener("click", function(){
+
+        document.querySelectorAll(".range-segment button")
+        .forEach(b => b.classList.remove("active"));
+
+        this.classList.add("active");
+
+        const range = this.getAttribute("data-range");
+
+        loadEnterpriseKPI(range);
+    });
+
+});
+
+function animateCounter(el, duration = 800) {
+
+    const target = parseInt(el.getAttribute("data-value")) || 0;
+    const startTime = performance.now();
+
+    function update(currentTime) {
+        const progress = Math.min((currentTime - startTime) / duration, 1);
+        const value = Math.floor(progress * target);
+        el.textContent = value.toLocaleString();
+
+        if (progress < 1) {
+            requestAnimationFrame(update);
+        } else {
+            el.textContent = target.toLocaleString();
+        }
+    }
+
+    requestAnimationFrame(update);
+}
+
+document.addEventListener("DOMContentLoaded", function(){
+    document.querySelectorAll(".count-up").forEach(el => {
+        animateCounter(el);
+    });
+});
+
+document.querySelector('[data-range="30"]').classList.add("active");
+// Initial load
+loadEnterpriseKPI(30);